@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+class BackupConfig(AppConfig):
+    name = 'backup'
+
+    def ready(self):
+        # Record tombstones for deleted rows and keep the sync digests current
+        from . import signals
+        post_migrate.connect(signals.reset_digests, sender=self)
+        # Register the background export/import handlers
+        from . import jobs  # noqa: F401
@@ -0,0 +1,111 @@
+"""
+Background job handlers for backup exports and imports.
+Registered with the job runner when the app is ready.
+"""
+import json
+import os
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from services import backup_service, backup_archive, jobs_service
+from services.jobs_service import JobContext
+
+
+class _ProgressReader:
+    """Wraps a backup reader, reporting progress as rows are consumed."""
+
+    REPORT_EVERY = 1000
+
+    def __init__(self, reader, ctx: JobContext, upload):
+        self.reader = reader
+        self.ctx = ctx
+        self.upload = upload
+        # Archives know their row counts up front; JSON progress follows the file position
+        tables = getattr(reader, 'tables', None)
+        self.total_rows = sum(info.get('rows', 0) for info in tables.values()) if tables else 0
+        self.total_bytes = os.fstat(upload.fileno()).st_size
+
+    @property
+    def meta(self):
+        return self.reader.meta
+
+    def _percent(self, count: int) -> float:
+        if self.total_rows:
+            return 100 * count / self.total_rows
+        if self.total_bytes:
+            return 100 * self.upload.tell() / self.total_bytes
+        return 0
+
+    def iter_rows(self):
+        count = 0
+        for key, row in self.reader.iter_rows():
+            count += 1
+            if count % self.REPORT_EVERY == 0:
+                self.ctx.progress(self._percent(count), f'Importing {key} ({count} rows read)')
+            yield key, row
+
+
+@jobs_service.register('backup_export')
+def export_backup(ctx: JobContext):
+    """
+    Write a backup to a result file.
+    Params: since (ISO watermark or null), archive (bool), compression, scope (table keys or null).
+    """
+    since = parse_datetime(ctx.params['since']) if ctx.params.get('since') else None
+    archive = ctx.params.get('archive', False)
+    scope = ctx.params.get('scope')
+    kind = 'delta' if since else 'backup'
+    if scope:
+        kind += '-partial'
+    filename = f"second-brain-{kind}-{datetime.now().strftime('%Y-%m-%d')}.{'zip' if archive else 'json'}"
+    keys = [key for key, _ in backup_service.TABLES if scope is None or key in scope]
+
+    def tables():
+        for index, key in enumerate(keys):
+            ctx.progress(100 * index / len(keys), f'Exporting {key}')
+            yield key, backup_service.iter_table(key, since)
+
+    # One transaction, as in export_all: every table is read from the same state of the database
+    with transaction.atomic(), open(ctx.result_path(filename), 'wb') as f:
+        header = backup_service.export_header(since, scope)
+        if archive:
+            compression = ctx.params.get('compression', backup_archive.DEFAULT_COMPRESSION)
+            for chunk in backup_archive.write_archive(header, tables(), compression=compression):
+                f.write(chunk)
+        else:
+            data = {**header, 'data': {key: list(rows) for key, rows in tables()}}
+            f.write(json.dumps(data, indent=2, ensure_ascii=False, cls=DjangoJSONEncoder).encode('utf-8'))
+
+    return {'filename': filename, 'type': header['type'], 'watermark': header['watermark']}
+
+
+@jobs_service.register('backup_import')
+def import_backup(ctx: JobContext):
+    """
+    Import a spooled upload.
+    Params: upload (spooled file name), content_type, mode (replace|merge|delta), dry_run, scope.
+    """
+    mode = ctx.params.get('mode', 'replace')
+    dry_run = ctx.params.get('dry_run', False)
+    scope = ctx.params.get('scope')
+    upload_path = jobs_service.get_result_dir() / ctx.params['upload']
+    try:
+        with open(upload_path, 'rb') as upload:
+            ctx.progress(0, 'Reading backup')
+            with backup_archive.open_backup(upload, ctx.params.get('content_type')) as reader:
+                reader = _ProgressReader(reader, ctx, upload)
+                if mode == 'merge':
+                    stats = backup_service.merge_backup(reader, dry_run=dry_run, scope=scope)
+                elif mode == 'delta':
+                    stats = backup_service.apply_delta(reader, dry_run=dry_run, scope=scope)
+                else:
+                    stats = backup_service.import_backup(reader, scope=scope)
+    except json.JSONDecodeError:
+        raise ValueError('Invalid JSON format')
+    finally:
+        jobs_service.remove_file(ctx.params['upload'])
+
+    return {'mode': mode, 'dry_run': dry_run and mode != 'replace', 'stats': stats}
@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from services import chunk_store
+from services.backup_stream import BackupFormatError
+
+
+class Command(BaseCommand):
+    help = (
+        'Take a deduplicated snapshot into the chunk store, apply the retention policy '
+        'and collect unreferenced chunks. Meant to run from cron, e.g. daily.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep', type=int, default=settings.BACKUP_CHUNK_STORE_KEEP,
+            help='Number of newest snapshots to keep (default: BACKUP_CHUNK_STORE_KEEP)'
+        )
+        parser.add_argument('--list', action='store_true', help='List existing snapshots and exit')
+        parser.add_argument('--gc', action='store_true', help='Only prune and collect garbage, take no snapshot')
+        parser.add_argument('--restore', metavar='NAME', help='Replace all data with a stored snapshot')
+
+    def handle(self, *args, **options):
+        try:
+            if options['list']:
+                for info in chunk_store.list_snapshots():
+                    self.stdout.write(f"{info['name']}  {info['rows']} rows  {info['chunks']} chunks  {info['export_date']}")
+                return
+
+            if options['restore']:
+                stats = chunk_store.restore_snapshot(options['restore'])
+                for key, count in stats.items():
+                    self.stdout.write(f"{key}: {count}")
+                self.stdout.write(self.style.SUCCESS(f"Restored {options['restore']}"))
+                return
+
+            if not options['gc']:
+                info = chunk_store.create_snapshot()
+                self.stdout.write(self.style.SUCCESS(
+                    f"Snapshot {info['name']}: {info['chunks']} chunks, "
+                    f"{info['new_chunks']} new ({info['new_bytes']} bytes)"
+                ))
+            for name in chunk_store.prune_snapshots(options['keep']):
+                self.stdout.write(f"Pruned {name}")
+            gc = chunk_store.collect_garbage()
+            self.stdout.write(f"Removed {gc['removed_chunks']} unreferenced chunks ({gc['freed_bytes']} bytes)")
+        except BackupFormatError as e:
+            raise CommandError(str(e))
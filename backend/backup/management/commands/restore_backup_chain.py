@@ -0,0 +1,32 @@
+from contextlib import ExitStack
+
+from django.core.management.base import BaseCommand, CommandError
+
+from services import backup_service, backup_archive
+from services.backup_stream import BackupFormatError
+
+
+class Command(BaseCommand):
+    help = 'Restore a full backup and apply a chain of delta backups on top of it, in order.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('base', help='Full backup file (JSON or archive)')
+        parser.add_argument('deltas', nargs='*', help='Delta backup files (JSON or archive), oldest first')
+
+    def handle(self, *args, **options):
+        with ExitStack() as stack:
+            try:
+                readers = [
+                    stack.enter_context(backup_archive.open_backup(stack.enter_context(open(path, 'rb'))))
+                    for path in [options['base'], *options['deltas']]
+                ]
+                stats = backup_service.restore_chain(readers[0], readers[1:])
+            except BackupFormatError as e:
+                raise CommandError(str(e))
+
+        self.stdout.write(f"Base: {sum(stats['base'].values())} rows")
+        for position, delta_stats in enumerate(stats['deltas'], start=1):
+            changed = sum(t['inserted'] + t['updated'] for t in delta_stats.values())
+            deleted = sum(t.get('deleted', 0) for t in delta_stats.values())
+            self.stdout.write(f"Delta {position}: {changed} rows changed, {deleted} deleted")
+        self.stdout.write(self.style.SUCCESS(f"Restored up to watermark {stats['watermark']}"))
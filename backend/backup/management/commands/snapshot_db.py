@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from services import snapshot_service
+from services.snapshot_service import SnapshotError
+
+
+class Command(BaseCommand):
+    help = (
+        'Take a physical snapshot of the SQLite database with the online backup API '
+        'and apply the retention policy. Meant to run from cron, e.g. daily.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep', type=int, default=settings.BACKUP_SNAPSHOT_KEEP,
+            help='Number of newest snapshots to keep (default: BACKUP_SNAPSHOT_KEEP)'
+        )
+        parser.add_argument('--list', action='store_true', help='List existing snapshots and exit')
+        parser.add_argument(
+            '--restore', metavar='NAME',
+            help='Verify a snapshot and swap it in as the live database (stop the server first)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            if options['list']:
+                for info in snapshot_service.list_snapshots():
+                    self.stdout.write(f"{info['name']}  {info['size']} bytes  {info['created_at']}")
+                return
+
+            if options['restore']:
+                result = snapshot_service.restore_snapshot(options['restore'])
+                self.stdout.write(f"Previous database saved as {result['pre_restore_snapshot']}")
+                if result['pending_migrations']:
+                    self.stdout.write(self.style.WARNING(
+                        f"Snapshot predates {len(result['pending_migrations'])} migration(s): run manage.py migrate"
+                    ))
+                self.stdout.write(self.style.SUCCESS(f"Restored {result['restored']}"))
+                return
+
+            info = snapshot_service.create_snapshot()
+            self.stdout.write(self.style.SUCCESS(f"Snapshot {info['name']} ({info['size']} bytes)"))
+            for name in snapshot_service.prune_snapshots(options['keep']):
+                self.stdout.write(f"Pruned {name}")
+        except SnapshotError as e:
+            raise CommandError(str(e))
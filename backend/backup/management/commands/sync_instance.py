@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from services import backup_service, sync_service
+from services.backup_stream import BackupFormatError
+
+
+class Command(BaseCommand):
+    help = (
+        'Reconcile this LifeOS database with another instance by comparing Merkle '
+        'digests of every table and transferring only the rows that differ.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('remote', help='Base URL of the other server (http://host:8000) or path of its SQLite database')
+        parser.add_argument('--direction', choices=['pull', 'push', 'both'], default='both')
+        parser.add_argument('--domain', default='', help='Comma separated domains to sync (tasks, projects, journal, finance)')
+        parser.add_argument('--tables', default='', help='Comma separated table keys to sync')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change without writing')
+
+    def handle(self, *args, **options):
+        try:
+            scope = backup_service.resolve_scope(options['domain'].split(','), options['tables'].split(','))
+            peer = sync_service.open_peer(options['remote'])
+            result = sync_service.sync(peer, scope=scope, direction=options['direction'], dry_run=options['dry_run'])
+        except (BackupFormatError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for key, info in result['tables'].items():
+            self.stdout.write(
+                f"{key}: {info['remote_only']} remote only, {info['local_only']} local only, "
+                f"{info['differing']} differing ({info['round_trips']} round trips)"
+            )
+        for side in ('pulled', 'pushed'):
+            for key, counts in result.get(side, {}).items():
+                self.stdout.write(f"{side} {key}: {counts}")
+        self.stdout.write(self.style.SUCCESS('Dry run completed, no data was changed' if options['dry_run'] else 'Sync completed'))
@@ -0,0 +1,30 @@
+# Generated by Django 6.0.1 on 2026-10-19 03:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backup', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DigestNode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table', models.CharField(max_length=50)),
+                ('level', models.PositiveSmallIntegerField()),
+                ('index', models.BigIntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('max_id', models.BigIntegerField(blank=True, null=True)),
+                ('digest', models.CharField(blank=True, max_length=32)),
+                ('rows', models.JSONField(blank=True, null=True)),
+                ('stale', models.BooleanField(db_index=True, default=False)),
+            ],
+            options={
+                'unique_together': {('table', 'level', 'index')},
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+from django.db import models
+
+
+class Tombstone(models.Model):
+    """Deletion log used by incremental (delta) backups"""
+    table = models.CharField(max_length=50)  # Backup table key (tasks, transactions...)
+    row_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['deleted_at']
+
+    def __str__(self):
+        return f"{self.table} #{self.row_id} ({self.deleted_at})"
+
+
+class DigestNode(models.Model):
+    """Stored Merkle digest of one id range of a backup table, so sync skips unchanged ranges (services/sync_service.py)"""
+    table = models.CharField(max_length=50)  # Backup table key
+    level = models.PositiveSmallIntegerField()  # 0: leaf
+    index = models.BigIntegerField()  # The node covers ids [index, index + 1) * span of its level
+    count = models.PositiveIntegerField(default=0)
+    max_id = models.BigIntegerField(null=True, blank=True)
+    digest = models.CharField(max_length=32, blank=True)
+    rows = models.JSONField(null=True, blank=True)  # [id, row hash] pairs of small nodes
+    stale = models.BooleanField(default=False, db_index=True)  # Leaves: a row inside was written since the digest was computed
+
+    class Meta:
+        unique_together = ['table', 'level', 'index']
+
+    def __str__(self):
+        return f"{self.table} L{self.level} #{self.index}"
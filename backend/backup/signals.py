@@ -0,0 +1,26 @@
+from django.db.models.signals import post_delete, post_save
+
+from services import sync_service
+from services.backup_service import TABLES, TABLE_KEYS
+from .models import Tombstone
+
+
+def record_tombstone(sender, instance, **kwargs):
+    """Log every deleted row so delta backups can replay the deletion."""
+    Tombstone.objects.create(table=TABLE_KEYS[sender], row_id=instance.pk)
+
+
+def mark_digests_stale(sender, instance, using, **kwargs):
+    """A saved or deleted row changes the sync digests over its id."""
+    sync_service.mark_stale(TABLE_KEYS[sender], [instance.pk], using)
+
+
+def reset_digests(sender, using, **kwargs):
+    """Migrations may change the exported columns, hence every row hash: rebuild the sync digests."""
+    sync_service.reset_digests([key for key, _ in TABLES], using)
+
+
+for key, model in TABLES:
+    post_delete.connect(record_tombstone, sender=model, dispatch_uid=f'backup_tombstone_{key}')
+    post_save.connect(mark_digests_stale, sender=model, dispatch_uid=f'backup_digest_save_{key}')
+    post_delete.connect(mark_digests_stale, sender=model, dispatch_uid=f'backup_digest_delete_{key}')
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class ChatConfig(AppConfig):
+    name = 'chat'
+
+    def ready(self):
+        # Version the data domains, for the chat response cache
+        from . import signals  # noqa: F401
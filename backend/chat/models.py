@@ -0,0 +1,52 @@
+import uuid
+
+from django.db import models
+
+
+class ChatSession(models.Model):
+    """A conversation with the chat assistant, kept server-side so clients only send the new message"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    title = models.CharField(max_length=200, blank=True)  # Start of the first user message
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)  # Idle sessions are pruned by age
+
+    class Meta:
+        ordering = ['-updated_at']
+
+    def __str__(self):
+        return self.title or str(self.id)
+
+
+class ChatMessage(models.Model):
+    """One message of a session, in the OpenAI chat format (tool calls and tool results included)"""
+    ROLE_CHOICES = [
+        ('user', 'User'),
+        ('assistant', 'Assistant'),
+        ('tool', 'Tool'),
+    ]
+
+    session = models.ForeignKey(ChatSession, on_delete=models.CASCADE, related_name='messages')
+    role = models.CharField(max_length=10, choices=ROLE_CHOICES)
+    content = models.TextField(blank=True)
+    tool_calls = models.JSONField(null=True, blank=True)  # Assistant turns that call tools
+    tool_call_id = models.CharField(max_length=100, blank=True)  # Tool results: the call they answer
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # History of a session in order, and trimming its oldest messages
+            models.Index(fields=['session', 'id'], name='chat_message_session_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.role}: {self.content[:50]}"
+
+
+class DataVersion(models.Model):
+    """Version token of a data domain, replaced in the transaction of every write to it (services/data_versions.py)"""
+    domain = models.CharField(max_length=20, primary_key=True)  # tasks, finance, journal, projects
+    version = models.CharField(max_length=32)
+
+    def __str__(self):
+        return f"{self.domain}: {self.version}"
@@ -0,0 +1,15 @@
+from django.apps import apps
+from django.db.models.signals import post_save, post_delete
+
+from services import data_versions
+
+
+def bump_data_version(sender, using=None, **kwargs):
+    """A row of a data domain changed: cached chat answers that read the domain are stale."""
+    data_versions.bump([sender._meta.app_label], using=using)
+
+
+for domain in data_versions.DOMAINS:
+    for model in apps.get_app_config(domain).get_models():
+        post_save.connect(bump_data_version, sender=model, dispatch_uid=f'data_version_save_{model._meta.label}')
+        post_delete.connect(bump_data_version, sender=model, dispatch_uid=f'data_version_delete_{model._meta.label}')
@@ -0,0 +1,10 @@
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from .views import ChatSessionViewSet
+
+router = DefaultRouter()
+router.register(r'chat/sessions', ChatSessionViewSet)
+
+urlpatterns = [
+    path('', include(router.urls)),
+]
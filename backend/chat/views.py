@@ -0,0 +1,13 @@
+from rest_framework import viewsets, mixins
+from .models import ChatSession
+from .serializers import ChatSessionSerializer, ChatSessionDetailSerializer
+
+class ChatSessionViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    """Stored chat sessions: list them, reload one with its messages, or delete it."""
+    queryset = ChatSession.objects.all()
+    serializer_class = ChatSessionSerializer
+
+    def get_serializer_class(self):
+        if self.action == 'retrieve':
+            return ChatSessionDetailSerializer
+        return ChatSessionSerializer
@@ -3,6 +3,9 @@ ASGI config for core project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with ``uvicorn core.asgi:application`` to get the async chat endpoint
+(/api/chat/async/), which handles many concurrent chats in one process.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
@@ -1,27 +1,46 @@
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse, FileResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
-from django.db import transaction
 from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 import json
 from datetime import datetime
 
-# Import all models
-from tasks.models import Task
-from projects.models import Project, Objective
-from journal.models import Entry, Category
-from finance.models import Transaction, FinanceCategory, Budget, SavingsGoal
+from services import backup_service, backup_archive, snapshot_service, jobs_service
+from services.backup_stream import BackupFormatError
+from services.snapshot_service import SnapshotError
+from jobs.serializers import JobSerializer
 
-# Import all serializers
-from tasks.serializers import TaskSerializer
-from projects.serializers import ProjectSerializer, ObjectiveSerializer
-from journal.serializers import EntrySerializer, CategorySerializer
-from finance.serializers import (
-    TransactionSerializer, 
-    FinanceCategorySerializer, 
-    BudgetSerializer, 
-    SavingsGoalSerializer
-)
+
+def wants_archive(request) -> bool:
+    """Pick the export format: ?format=archive|json wins, then the Accept header."""
+    requested = request.GET.get('format')
+    if requested:
+        return requested == 'archive'
+    return backup_archive.ARCHIVE_CONTENT_TYPE in request.headers.get('Accept', '')
+
+
+def get_scope(request):
+    """
+    Tables selected with ?domain=finance,journal and/or ?tables=transactions,budgets.
+    None means every table. Raises BackupFormatError for unknown names.
+    """
+    def names(param):
+        return [name.strip() for value in request.GET.getlist(param) for name in value.split(',')]
+    return backup_service.resolve_scope(names('domain'), names('tables'))
+
+
+def wants_async(request) -> bool:
+    return request.GET.get('async', '').lower() in ('1', 'true', 'yes')
+
+
+def job_accepted(job) -> JsonResponse:
+    """202 response pointing the client at the job to poll."""
+    return JsonResponse({
+        'success': True,
+        'job': JobSerializer(job).data
+    }, status=202)
 
 
 @require_http_methods(["GET"])
@@ -29,56 +48,79 @@ def export_all_data(request):
     """
     Export all user data to a single JSON file.
     Returns a downloadable JSON file with all tasks, projects, journal entries, and finance data.
+    
+    With ?since=<watermark> (taken from a previous export) only the rows changed
+    and the ids deleted since then are exported, plus a new watermark.
+    
+    Requesting application/zip (Accept header or ?format=archive) streams a
+    compressed archive with one NDJSON file per table and a checksummed
+    manifest instead; ?compression=deflate|xz picks the codec.
+    
+    ?domain=tasks|projects|journal|finance (comma separated) and/or
+    ?tables=<table keys> limit the export to those tables.
+    
+    With ?async=1 the export runs as a background job: the response is 202 with
+    the job, to be polled at /api/jobs/<id>/ and downloaded from its download_url.
     """
+    since = None
+    if request.GET.get('since'):
+        since = parse_datetime(request.GET['since'])
+        if since is None:
+            return JsonResponse({
+                'success': False,
+                'error': 'Invalid "since" watermark, expected an ISO 8601 datetime'
+            }, status=400)
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+    
     try:
-        # Serialize all data
-        # For projects, we need to exclude the computed 'stats' field during export
-        projects_data = []
-        for project in Project.objects.all():
-            proj_dict = {
-                'id': project.id,
-                'name': project.name,
-                'description': project.description,
-                'color': project.color,
-                'icon': project.icon,
-                'is_active': project.is_active,
-                'created_at': project.created_at.isoformat() if project.created_at else None,
-                'updated_at': project.updated_at.isoformat() if project.updated_at else None,
-            }
-            projects_data.append(proj_dict)
+        scope = get_scope(request)
+    except BackupFormatError as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=400)
+    
+    compression = request.GET.get('compression', backup_archive.DEFAULT_COMPRESSION)
+    if compression not in backup_archive.COMPRESSIONS:
+        return JsonResponse({
+            'success': False,
+            'error': f'Invalid compression: {compression}'
+        }, status=400)
+    
+    # Create filename with current date
+    kind = 'delta' if since else 'backup'
+    if scope:
+        kind += '-partial'
+    filename = f"second-brain-{kind}-{datetime.now().strftime('%Y-%m-%d')}"
+    
+    try:
+        if wants_async(request):
+            return job_accepted(jobs_service.submit('backup_export', {
+                'since': since.isoformat() if since else None,
+                'archive': wants_archive(request),
+                'compression': compression,
+                'scope': scope
+            }))
         
-        data = {
-            'export_date': datetime.now().isoformat(),
-            'version': '1.0',
-            'data': {
-                # Tasks
-                'tasks': list(TaskSerializer(Task.objects.all(), many=True).data),
-                
-                # Projects & Objectives
-                'projects': projects_data,
-                'objectives': list(ObjectiveSerializer(Objective.objects.all(), many=True).data),
-                
-                # Journal
-                'journal_categories': list(CategorySerializer(Category.objects.all(), many=True).data),
-                'journal_entries': list(EntrySerializer(Entry.objects.all(), many=True).data),
-                
-                # Finance
-                'finance_categories': list(FinanceCategorySerializer(FinanceCategory.objects.all(), many=True).data),
-                'transactions': list(TransactionSerializer(Transaction.objects.all(), many=True).data),
-                'budgets': list(BudgetSerializer(Budget.objects.all(), many=True).data),
-                'savings_goals': list(SavingsGoalSerializer(SavingsGoal.objects.all(), many=True).data),
-            }
-        }
+        if wants_archive(request):
+            # Streamed table by table, never built in memory
+            response = StreamingHttpResponse(
+                backup_archive.iter_backup_archive(since=since, compression=compression, scope=scope),
+                content_type=backup_archive.ARCHIVE_CONTENT_TYPE
+            )
+            response['Content-Disposition'] = f'attachment; filename="{filename}.zip"'
+            return response
         
-        # Create filename with current date
-        filename = f"second-brain-backup-{datetime.now().strftime('%Y-%m-%d')}.json"
+        # Raw column export: one SELECT per table, no computed serializer fields
+        data = backup_service.export_all(since=since, scope=scope)
         
         # Return as downloadable file
         response = HttpResponse(
             json.dumps(data, indent=2, ensure_ascii=False, cls=DjangoJSONEncoder),
             content_type='application/json'
         )
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        response['Content-Disposition'] = f'attachment; filename="{filename}.json"'
         
         return response
         
@@ -93,119 +135,69 @@ def export_all_data(request):
 @require_http_methods(["POST"])
 def import_all_data(request):
     """
-    Import data from a JSON backup file.
+    Import data from a JSON backup file or a backup archive (Content-Type: application/zip).
     Replaces all existing data with the imported data.
+    The body is streamed, so backups larger than the request body limit are accepted.
+    Archives are checked against their manifest checksums before anything is written.
+    
+    Query params:
+    - mode=merge: upsert by id instead of replacing, reporting per-table
+      inserted/updated/unchanged counts
+    - mode=delta: apply a delta export (changed rows and deletions) on top of
+      the current data
+    - dry_run=1: with mode=merge or delta, report the counts without writing anything
+    - domain=<domains> and/or tables=<table keys>: only restore those tables,
+      leaving the rest untouched. A partial backup restores its own tables by default.
+    - async=1: spool the upload and import it in a background job, returning
+      202 with the job; the stats end up in the job result
     """
+    mode = request.GET.get('mode', 'replace')
+    dry_run = request.GET.get('dry_run', '').lower() in ('1', 'true', 'yes')
+    
+    if mode not in ('replace', 'merge', 'delta'):
+        return JsonResponse({
+            'success': False,
+            'error': f'Invalid import mode: {mode}'
+        }, status=400)
+    
     try:
-        # Parse JSON data
-        data = json.loads(request.body)
-        
-        # Validate format
-        if 'data' not in data:
-            return JsonResponse({
-                'success': False,
-                'error': 'Invalid backup file format: missing "data" key'
-            }, status=400)
-        
-        import_data = data['data']
+        scope = get_scope(request)
+    except BackupFormatError as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=400)
+    
+    try:
+        if wants_async(request):
+            upload = jobs_service.save_upload(request)
+            return job_accepted(jobs_service.submit('backup_import', {
+                'upload': upload,
+                'content_type': request.content_type,
+                'mode': mode,
+                'dry_run': dry_run,
+                'scope': scope
+            }))
         
-        # Use atomic transaction to ensure all-or-nothing import
-        with transaction.atomic():
-            # Clear existing data (in reverse order of dependencies)
-            Task.objects.all().delete()
-            Objective.objects.all().delete()
-            Entry.objects.all().delete()
-            Category.objects.all().delete()
-            Budget.objects.all().delete()
-            Transaction.objects.all().delete()
-            SavingsGoal.objects.all().delete()
-            FinanceCategory.objects.all().delete()
-            Project.objects.all().delete()
-            
-            # Import data in order of dependencies
-            stats = {
-                'projects': 0,
-                'objectives': 0,
-                'tasks': 0,
-                'journal_categories': 0,
-                'journal_entries': 0,
-                'finance_categories': 0,
-                'transactions': 0,
-                'budgets': 0,
-                'savings_goals': 0,
-            }
-            
-            # 1. Projects (no dependencies)
-            if 'projects' in import_data:
-                for item in import_data['projects']:
-                    # Remove computed fields
-                    item.pop('stats', None)
-                    Project.objects.create(**item)
-                    stats['projects'] += 1
-            
-            # 2. Objectives (depends on Projects)
-            if 'objectives' in import_data:
-                for item in import_data['objectives']:
-                    Objective.objects.create(**item)
-                    stats['objectives'] += 1
-            
-            # 3. Tasks (depends on Projects)
-            if 'tasks' in import_data:
-                for item in import_data['tasks']:
-                    Task.objects.create(**item)
-                    stats['tasks'] += 1
-            
-            # 4. Journal Categories (no dependencies)
-            if 'journal_categories' in import_data:
-                for item in import_data['journal_categories']:
-                    Category.objects.create(**item)
-                    stats['journal_categories'] += 1
-            
-            # 5. Journal Entries (depends on Categories and Projects)
-            if 'journal_entries' in import_data:
-                for item in import_data['journal_entries']:
-                    # Remove computed fields
-                    item.pop('category_detail', None)
-                    Entry.objects.create(**item)
-                    stats['journal_entries'] += 1
-            
-            # 6. Finance Categories (no dependencies)
-            if 'finance_categories' in import_data:
-                for item in import_data['finance_categories']:
-                    FinanceCategory.objects.create(**item)
-                    stats['finance_categories'] += 1
-            
-            # 7. Transactions (depends on Finance Categories and Projects)
-            if 'transactions' in import_data:
-                for item in import_data['transactions']:
-                    # Remove computed fields
-                    item.pop('category_name', None)
-                    item.pop('category_color', None)
-                    Transaction.objects.create(**item)
-                    stats['transactions'] += 1
-            
-            # 8. Budgets (depends on Finance Categories)
-            if 'budgets' in import_data:
-                for item in import_data['budgets']:
-                    # Remove computed fields
-                    item.pop('category_name', None)
-                    item.pop('category_color', None)
-                    item.pop('spent', None)
-                    item.pop('percentage', None)
-                    Budget.objects.create(**item)
-                    stats['budgets'] += 1
-            
-            # 9. Savings Goals (no dependencies)
-            if 'savings_goals' in import_data:
-                for item in import_data['savings_goals']:
-                    # Remove computed fields
-                    item.pop('percentage', None)
-                    SavingsGoal.objects.create(**item)
-                    stats['savings_goals'] += 1
+        with backup_archive.open_backup(request, request.content_type) as reader:
+            if mode == 'merge':
+                # Upsert only new and changed rows, leaving everything else in place
+                stats = backup_service.merge_backup(reader, dry_run=dry_run, scope=scope)
+                message = 'Dry run completed, no data was changed' if dry_run else 'Data merged successfully'
+            elif mode == 'delta':
+                # Upsert the changed rows and replay the logged deletions
+                stats = backup_service.apply_delta(reader, dry_run=dry_run, scope=scope)
+                message = 'Dry run completed, no data was changed' if dry_run else 'Delta applied successfully'
+            else:
+                # Read the upload incrementally and bulk insert it in one atomic transaction
+                stats = backup_service.import_backup(reader, scope=scope)
+                message = 'Data imported successfully'
         
         return JsonResponse({
             'success': True,
-            'message': 'Data imported successfully',
+            'message': message,
+            'mode': mode,
+            'dry_run': dry_run and mode != 'replace',
             'stats': stats
         })
         
@@ -214,8 +206,59 @@ def import_all_data(request):
             'success': False,
             'error': 'Invalid JSON format'
         }, status=400)
+    except BackupFormatError as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=400)
     except Exception as e:
         return JsonResponse({
             'success': False,
             'error': f'Import failed: {str(e)}'
         }, status=500)
+
+
+@csrf_exempt
+@require_http_methods(["GET", "POST"])
+def snapshots(request):
+    """
+    Physical SQLite snapshots.
+    GET lists them, newest first. POST takes a new snapshot with the online
+    backup API and then applies the retention policy.
+    """
+    try:
+        if request.method == 'GET':
+            return JsonResponse({'snapshots': snapshot_service.list_snapshots()})
+        
+        snapshot = snapshot_service.create_snapshot()
+        pruned = snapshot_service.prune_snapshots()
+        return JsonResponse({
+            'success': True,
+            'snapshot': snapshot,
+            'pruned': pruned
+        }, status=201)
+        
+    except SnapshotError as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=400)
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': f'Snapshot failed: {str(e)}'
+        }, status=500)
+
+
+@require_http_methods(["GET"])
+def download_snapshot(request, name):
+    """Download a snapshot as a .sqlite3 file."""
+    try:
+        path = snapshot_service.get_snapshot_path(name)
+    except SnapshotError as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=404)
+    
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=name, content_type='application/vnd.sqlite3')
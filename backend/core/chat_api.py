@@ -3,15 +3,40 @@ LifeOS Chat API View
 Handles chat requests with multi-provider support (Groq, OpenAI, Anthropic, Together, OpenRouter).
 """
 import json
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import date, datetime, timedelta
 
-from django.http import JsonResponse
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
+from jsonschema import Draft7Validator
+from jsonschema.exceptions import best_match
 
 # Import services for tool execution
-from services import finance_service, tasks_service, journal_service, projects_service
+from services import finance_service, tasks_service, journal_service, projects_service, tool_pages
+from services import chat_session_service, data_versions
 
+from core import chat_cache, chat_context, chat_trace, llm_clients, llm_limiter, llm_router
+
+
+logger = logging.getLogger('lifeos.chat')
+
+
+# limit/offset arguments of the list tools, which answer with one page (services.tool_pages)
+PAGE_PROPERTIES = {
+    "limit": {
+        "type": "integer", "minimum": 1, "maximum": settings.TOOL_PAGE_MAX_LIMIT,
+        "description": f"Máximo de resultados (por defecto {settings.TOOL_PAGE_DEFAULT_LIMIT})"
+    },
+    "offset": {"type": "integer", "minimum": 0, "description": "Resultados a saltar: usa next_offset para la página siguiente"}
+}
+PAGE_NOTE = " Devuelve una página: total, has_more, next_offset e items."
 
 # Tool definitions for function calling
 TOOLS = [
@@ -27,19 +52,30 @@ TOOLS = [
         "type": "function",
         "function": {
             "name": "get_all_tasks",
-            "description": "Obtiene todas las tareas del usuario.",
-            "parameters": {"type": "object", "properties": {}, "required": []}
+            "description": "Obtiene las tareas del usuario, con filtros opcionales por estado, texto del título o proyecto." + PAGE_NOTE,
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "status": {"type": "string", "enum": ["INBOX", "TODO", "DONE"]},
+                    "query": {"type": "string", "description": "Texto que contiene el título"},
+                    "project_id": {"type": "integer", "description": "ID del proyecto"},
+                    **PAGE_PROPERTIES
+                },
+                "required": []
+            }
         }
     },
     {
         "type": "function",
         "function": {
             "name": "get_tasks_by_status",
-            "description": "Obtiene tareas por estado: INBOX, TODO, DONE.",
+            "description": "Obtiene tareas por estado: INBOX, TODO, DONE." + PAGE_NOTE,
             "parameters": {
                 "type": "object",
                 "properties": {
-                    "status": {"type": "string", "enum": ["INBOX", "TODO", "DONE"]}
+                    "status": {"type": "string", "enum": ["INBOX", "TODO", "DONE"]},
+                    "query": {"type": "string", "description": "Texto que contiene el título"},
+                    **PAGE_PROPERTIES
                 },
                 "required": ["status"]
             }
@@ -81,8 +117,15 @@ TOOLS = [
         "type": "function",
         "function": {
             "name": "get_overdue_tasks",
-            "description": "Obtiene las tareas vencidas.",
-            "parameters": {"type": "object", "properties": {}, "required": []}
+            "description": "Obtiene las tareas vencidas." + PAGE_NOTE,
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {"type": "string", "description": "Texto que contiene el título"},
+                    **PAGE_PROPERTIES
+                },
+                "required": []
+            }
         }
     },
     {
@@ -113,24 +156,39 @@ TOOLS = [
         "type": "function",
         "function": {
             "name": "get_budget_status",
-            "description": "Obtiene el estado de los presupuestos del mes actual.",
-            "parameters": {"type": "object", "properties": {}, "required": []}
+            "description": "Obtiene el estado de los presupuestos del mes actual." + PAGE_NOTE,
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {"type": "string", "description": "Texto que contiene el nombre de la categoría"},
+                    **PAGE_PROPERTIES
+                },
+                "required": []
+            }
         }
     },
     {
         "type": "function",
         "function": {
             "name": "check_budget_alerts",
-            "description": "Comprueba si hay alertas de presupuesto (>70% o >90%).",
-            "parameters": {"type": "object", "properties": {}, "required": []}
+            "description": "Comprueba si hay alertas de presupuesto (>70% o >90%)." + PAGE_NOTE,
+            "parameters": {"type": "object", "properties": {**PAGE_PROPERTIES}, "required": []}
         }
     },
     {
         "type": "function",
         "function": {
             "name": "get_savings_goals",
-            "description": "Obtiene todas las metas de ahorro con su progreso.",
-            "parameters": {"type": "object", "properties": {}, "required": []}
+            "description": "Obtiene las metas de ahorro con su progreso." + PAGE_NOTE,
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {"type": "string", "description": "Texto que contiene el nombre de la meta"},
+                    "completed": {"type": "boolean", "description": "Solo metas completadas (true) o en curso (false)"},
+                    **PAGE_PROPERTIES
+                },
+                "required": []
+            }
         }
     },
     {
@@ -151,8 +209,16 @@ TOOLS = [
         "type": "function",
         "function": {
             "name": "get_all_projects",
-            "description": "Obtiene todos los proyectos con sus estadísticas.",
-            "parameters": {"type": "object", "properties": {}, "required": []}
+            "description": "Obtiene los proyectos con sus estadísticas." + PAGE_NOTE,
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {"type": "string", "description": "Texto que contiene el nombre del proyecto"},
+                    "active": {"type": "boolean", "description": "Solo proyectos activos (true) o inactivos (false)"},
+                    **PAGE_PROPERTIES
+                },
+                "required": []
+            }
         }
     },
     # Journal tools
@@ -160,8 +226,15 @@ TOOLS = [
         "type": "function",
         "function": {
             "name": "get_journal_categories",
-            "description": "Obtiene todas las categorías del diario disponibles.",
-            "parameters": {"type": "object", "properties": {}, "required": []}
+            "description": "Obtiene las categorías del diario disponibles." + PAGE_NOTE,
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {"type": "string", "description": "Texto que contiene el nombre de la categoría"},
+                    **PAGE_PROPERTIES
+                },
+                "required": []
+            }
         }
     },
     {
@@ -260,11 +333,13 @@ TOOLS = [
         "type": "function",
         "function": {
             "name": "get_project_objectives",
-            "description": "Obtiene los objetivos de un proyecto.",
+            "description": "Obtiene los objetivos de un proyecto." + PAGE_NOTE,
             "parameters": {
                 "type": "object",
                 "properties": {
-                    "project_id": {"type": "integer", "description": "ID del proyecto"}
+                    "project_id": {"type": "integer", "description": "ID del proyecto"},
+                    "status": {"type": "string", "enum": ["PENDING", "COMPLETED"]},
+                    **PAGE_PROPERTIES
                 },
                 "required": ["project_id"]
             }
@@ -351,273 +426,530 @@ TOOLS = [
 ]
 
 
-def execute_tool(name: str, args: dict) -> dict:
-    """Execute a tool and return the result."""
+# Shared by the sync and async chat views for running tools off the request thread
+TOOL_EXECUTOR = ThreadPoolExecutor(max_workers=settings.CHAT_TOOL_WORKERS, thread_name_prefix='chat-tool')
+
+
+# Tool registry: name -> handler(args). Handlers receive arguments already
+# validated against the tool's JSON schema.
+TOOL_HANDLERS = {}
+
+# name -> data domains ('tasks', 'finance', 'journal', 'projects') the tool reads / writes
+TOOL_READS = {}
+TOOL_WRITES = {}
+
+
+def tool(name: str, reads: tuple = (), writes: tuple = ()):
+    """Register the handler of a tool declared in TOOLS, with the domains it touches."""
+    def decorator(handler):
+        TOOL_HANDLERS[name] = handler
+        TOOL_READS[name] = frozenset(reads)
+        TOOL_WRITES[name] = frozenset(writes)
+        return handler
+    return decorator
+
+
+@tool("get_daily_summary", reads=('tasks', 'finance', 'journal'))
+def get_daily_summary(args: dict):
     today = date.today()
+    all_tasks = tasks_service.get_all_tasks()
+    overdue = tasks_service.get_overdue_tasks()
+    finance_summary = finance_service.get_monthly_summary(today.year, today.month)
+    mood_stats = journal_service.get_mood_stats(7)
     
-    if name == "get_daily_summary":
-        all_tasks = tasks_service.get_all_tasks()
-        overdue = tasks_service.get_overdue_tasks()
-        finance_summary = finance_service.get_monthly_summary(today.year, today.month)
-        mood_stats = journal_service.get_mood_stats(7)
-        
-        return {
-            'fecha': str(today),
-            'tareas': {
-                'inbox': len([t for t in all_tasks if t.status == 'INBOX']),
-                'pendientes': len([t for t in all_tasks if t.status == 'TODO']),
-                'vencidas': len(overdue)
-            },
-            'finanzas': {
-                'ingresos_mes': finance_summary['income'],
-                'gastos_mes': finance_summary['expense'],
-                'balance': finance_summary['balance']
-            },
-            'animo': {
-                'promedio_7d': mood_stats['average_mood'],
-                'energia_7d': mood_stats['average_energy']
-            }
+    return {
+        'fecha': str(today),
+        'tareas': {
+            'inbox': len([t for t in all_tasks if t.status == 'INBOX']),
+            'pendientes': len([t for t in all_tasks if t.status == 'TODO']),
+            'vencidas': len(overdue)
+        },
+        'finanzas': {
+            'ingresos_mes': finance_summary['income'],
+            'gastos_mes': finance_summary['expense'],
+            'balance': finance_summary['balance']
+        },
+        'animo': {
+            'promedio_7d': mood_stats['average_mood'],
+            'energia_7d': mood_stats['average_energy']
         }
+    }
+
+
+@tool("get_all_tasks", reads=('tasks',))
+def get_all_tasks(args: dict):
+    tasks = tasks_service.filter_tasks(status=args.get('status'), query=args.get('query'), project_id=args.get('project_id'))
+    return tool_pages.get_page(
+        tasks,
+        lambda t: {'id': t.id, 'titulo': t.title, 'estado': t.status, 'fecha': str(t.due_date) if t.due_date else None},
+        args.get('limit'), args.get('offset')
+    )
+
+
+@tool("get_tasks_by_status", reads=('tasks',))
+def get_tasks_by_status(args: dict):
+    tasks = tasks_service.filter_tasks(status=args.get('status', 'TODO'), query=args.get('query'))
+    return tool_pages.get_page(tasks, lambda t: {'id': t.id, 'titulo': t.title}, args.get('limit'), args.get('offset'))
+
+
+@tool("create_task", writes=('tasks',))
+def create_task(args: dict):
+    due_date = None
+    due_time = None
+    if args.get('due_date'):
+        due_date = datetime.strptime(args['due_date'], '%Y-%m-%d').date()
+    if args.get('due_time'):
+        due_time = args['due_time']
+    status = args.get('status', 'TODO')  # Por defecto TODO (rojo en calendario)
+    task = tasks_service.create_task(
+        title=args['title'], 
+        due_date=due_date,
+        due_time=due_time,
+        status=status
+    )
+    return {'id': task.id, 'titulo': task.title, 'estado': task.status, 'creada': True}
+
+
+@tool("complete_task", writes=('tasks',))
+def complete_task(args: dict):
+    from tasks.models import Task
+    task_id = args.get('task_id')
+    task_title = args.get('task_title')
     
-    elif name == "get_all_tasks":
-        tasks = tasks_service.get_all_tasks()
-        return [{'id': t.id, 'titulo': t.title, 'estado': t.status, 'fecha': str(t.due_date) if t.due_date else None} for t in tasks]
-    
-    elif name == "get_tasks_by_status":
-        tasks = tasks_service.get_tasks_by_status(args.get('status', 'TODO'))
-        return [{'id': t.id, 'titulo': t.title} for t in tasks]
-    
-    elif name == "create_task":
-        due_date = None
-        due_time = None
-        if args.get('due_date'):
-            due_date = datetime.strptime(args['due_date'], '%Y-%m-%d').date()
-        if args.get('due_time'):
-            due_time = args['due_time']
-        status = args.get('status', 'TODO')  # Por defecto TODO (rojo en calendario)
-        task = tasks_service.create_task(
-            title=args['title'], 
-            due_date=due_date,
-            due_time=due_time,
-            status=status
+    if task_id:
+        task = tasks_service.update_task_status(task_id, 'DONE')
+    elif task_title:
+        # Find task by title (case-insensitive partial match)
+        matching = Task.objects.filter(title__icontains=task_title, status__in=['TODO', 'INBOX']).first()
+        if not matching:
+            return {'error': f"No se encontró tarea pendiente con título '{task_title}'"}
+        task = tasks_service.update_task_status(matching.id, 'DONE')
+    else:
+        return {'error': 'Debes especificar task_id o task_title'}
+    
+    return {'id': task.id, 'titulo': task.title, 'completada': True}
+
+
+@tool("get_overdue_tasks", reads=('tasks',))
+def get_overdue_tasks(args: dict):
+    today = date.today()
+    tasks = tasks_service.filter_tasks(query=args.get('query'), overdue=True)
+    return tool_pages.get_page(
+        tasks,
+        lambda t: {'id': t.id, 'titulo': t.title, 'fecha': str(t.due_date), 'dias_vencida': (today - t.due_date).days},
+        args.get('limit'), args.get('offset')
+    )
+
+
+@tool("get_financial_summary", reads=('finance',))
+def get_financial_summary(args: dict):
+    today = date.today()
+    return finance_service.get_monthly_summary(today.year, today.month)
+
+
+@tool("add_transaction", writes=('finance',))
+def add_transaction(args: dict):
+    today = date.today()
+    tx = finance_service.create_transaction(
+        title=args['title'],
+        amount=args['amount'],
+        transaction_type=args['transaction_type'],
+        transaction_date=today
+    )
+    return {'id': tx.id, 'titulo': tx.title, 'cantidad': float(tx.amount), 'tipo': tx.type}
+
+
+@tool("get_budget_status", reads=('finance',))
+def get_budget_status(args: dict):
+    today = date.today()
+    budgets = finance_service.get_budgets_for_month(today.year, today.month)
+    if args.get('query'):
+        budgets = [b for b in budgets if args['query'].lower() in b['category_name'].lower()]
+    return tool_pages.get_page(budgets, dict, args.get('limit'), args.get('offset'))
+
+
+@tool("check_budget_alerts", reads=('finance',))
+def check_budget_alerts(args: dict):
+    return tool_pages.get_page(finance_service.check_budget_alerts(), dict, args.get('limit'), args.get('offset'))
+
+
+@tool("get_savings_goals", reads=('finance',))
+def get_savings_goals(args: dict):
+    goals = finance_service.filter_savings_goals(query=args.get('query'), completed=args.get('completed'))
+    return tool_pages.get_page(
+        goals,
+        lambda g: {'id': g.id, 'nombre': g.name, 'objetivo': float(g.target_amount), 'actual': float(g.current_amount), 'porcentaje': g.get_percentage()},
+        args.get('limit'), args.get('offset')
+    )
+
+
+@tool("get_mood_stats", reads=('journal',))
+def get_mood_stats(args: dict):
+    days = args.get('days', 30)
+    return journal_service.get_mood_stats(days)
+
+
+# Project stats count the linked tasks, transactions and entries
+@tool("get_all_projects", reads=('tasks', 'finance', 'journal', 'projects'))
+def get_all_projects(args: dict):
+    projects = projects_service.filter_projects(query=args.get('query'), active=args.get('active'))
+    return tool_pages.get_page(
+        projects,
+        lambda p: {'id': p.id, 'nombre': p.name, 'color': p.color, 'stats': p.get_stats()},
+        args.get('limit'), args.get('offset')
+    )
+
+
+# Journal tools
+
+@tool("get_journal_categories", reads=('journal',))
+def get_journal_categories(args: dict):
+    categories = journal_service.filter_categories(query=args.get('query'))
+    return tool_pages.get_page(categories, lambda c: {'id': c.id, 'nombre': c.name}, args.get('limit'), args.get('offset'))
+
+
+@tool("write_journal_entry", writes=('journal',))
+def write_journal_entry(args: dict):
+    today = date.today()
+    # Buscar o crear categoría si se especifica
+    category_id = None
+    if args.get('category_name'):
+        from journal.models import Category
+        category, created = Category.objects.get_or_create(
+            name=args['category_name']
         )
-        return {'id': task.id, 'titulo': task.title, 'estado': task.status, 'creada': True}
+        category_id = category.id
     
-    elif name == "complete_task":
-        from tasks.models import Task
-        task_id = args.get('task_id')
-        task_title = args.get('task_title')
+    entry = journal_service.create_entry(
+        title=args['title'],
+        content=args['content'],
+        entry_date=today,
+        category_id=category_id,
+        mood=args.get('mood'),
+        energy=args.get('energy')
+    )
+    return {'id': entry.id, 'titulo': entry.title, 'categoria': args.get('category_name'), 'creada': True}
+
+
+# Project tools
+
+@tool("create_project", writes=('projects',))
+def create_project(args: dict):
+    project = projects_service.create_project(
+        name=args['name'],
+        description=args.get('description', ''),
+        color=args.get('color', '#6366F1')
+    )
+    return {'id': project.id, 'nombre': project.name, 'creado': True}
+
+
+@tool("add_project_objective", writes=('projects',))
+def add_project_objective(args: dict):
+    deadline = None
+    if args.get('deadline'):
+        deadline = datetime.strptime(args['deadline'], '%Y-%m-%d').date()
+    objective = projects_service.create_objective(
+        project_id=args['project_id'],
+        title=args['title'],
+        description=args.get('description', ''),
+        deadline=deadline
+    )
+    if not objective:
+        return {'error': f"No se encontró proyecto con ID {args['project_id']}"}
         
+    return {'id': objective.id, 'titulo': objective.title, 'creado': True}
+
+
+@tool("add_project_objectives_batch", writes=('projects',))
+def add_project_objectives_batch(args: dict):
+    result = projects_service.create_objectives_batch(
+        project_id=args['project_id'],
+        objectives=args['objectives']
+    )
+    if not result['success']:
+        return {'error': result.get('error', 'Error creating objectives')}
+    return result
+
+
+@tool("complete_objective", writes=('projects',))
+def complete_objective(args: dict):
+    objective = projects_service.update_objective_status(args['objective_id'], 'COMPLETED')
+    return {'id': objective.id, 'titulo': objective.title, 'completado': True}
+
+
+@tool("get_project_objectives", reads=('projects',))
+def get_project_objectives(args: dict):
+    objectives = projects_service.filter_objectives(args['project_id'], status=args.get('status'))
+    return tool_pages.get_page(objectives, projects_service.objective_to_dict, args.get('limit'), args.get('offset'))
+
+
+# Savings Goals tools
+
+@tool("create_savings_goal", writes=('finance',))
+def create_savings_goal(args: dict):
+    goal = finance_service.create_savings_goal(
+        name=args['name'],
+        target_amount=args['target_amount'],
+        current_amount=args.get('initial_amount', 0)
+    )
+    return {
+        'id': goal.id, 
+        'nombre': goal.name, 
+        'objetivo': float(goal.target_amount),
+        'actual': float(goal.current_amount),
+        'porcentaje': float(goal.get_percentage()),
+        'creada': True
+    }
+
+
+@tool("add_funds_to_goal", writes=('finance',))
+def add_funds_to_goal(args: dict):
+    from finance.models import SavingsGoal
+    try:
+        goal = SavingsGoal.objects.get(name__icontains=args['goal_name'])
+        goal = finance_service.add_funds_to_goal(goal.id, args['amount'])
+        return {
+            'id': goal.id,
+            'nombre': goal.name,
+            'nuevo_saldo': float(goal.current_amount),
+            'objetivo': float(goal.target_amount),
+            'porcentaje': float(goal.get_percentage()),
+            'agregado': float(args['amount'])
+        }
+    except SavingsGoal.DoesNotExist:
+        return {'error': f"No se encontró meta de ahorro con nombre '{args['goal_name']}'"}
+
+
+# Delete tools
+
+@tool("delete_task", writes=('tasks',))
+def delete_task(args: dict):
+    from tasks.models import Task
+    task_id = args.get('task_id')
+    task_title = args.get('task_title')
+    
+    try:
         if task_id:
-            task = tasks_service.update_task_status(task_id, 'DONE')
+            task = Task.objects.get(id=task_id)
         elif task_title:
-            # Find task by title (case-insensitive partial match)
-            matching = Task.objects.filter(title__icontains=task_title, status__in=['TODO', 'INBOX']).first()
-            if not matching:
-                return {'error': f"No se encontró tarea pendiente con título '{task_title}'"}
-            task = tasks_service.update_task_status(matching.id, 'DONE')
+            task = Task.objects.filter(title__icontains=task_title).first()
+            if not task:
+                return {'error': f"No se encontró tarea con título '{task_title}'"}
         else:
             return {'error': 'Debes especificar task_id o task_title'}
         
-        return {'id': task.id, 'titulo': task.title, 'completada': True}
-    
-    elif name == "get_overdue_tasks":
-        tasks = tasks_service.get_overdue_tasks()
-        return [{'id': t.id, 'titulo': t.title, 'fecha': str(t.due_date), 'dias_vencida': (today - t.due_date).days} for t in tasks]
-    
-    elif name == "get_financial_summary":
-        return finance_service.get_monthly_summary(today.year, today.month)
-    
-    elif name == "add_transaction":
-        tx = finance_service.create_transaction(
-            title=args['title'],
-            amount=args['amount'],
-            transaction_type=args['transaction_type'],
-            transaction_date=today
-        )
-        return {'id': tx.id, 'titulo': tx.title, 'cantidad': float(tx.amount), 'tipo': tx.type}
-    
-    elif name == "get_budget_status":
-        return finance_service.get_budgets_for_month(today.year, today.month)
-    
-    elif name == "check_budget_alerts":
-        return finance_service.check_budget_alerts()
-    
-    elif name == "get_savings_goals":
-        goals = finance_service.get_all_savings_goals()
-        return [{'id': g.id, 'nombre': g.name, 'objetivo': float(g.target_amount), 'actual': float(g.current_amount), 'porcentaje': g.get_percentage()} for g in goals]
-    
-    elif name == "get_mood_stats":
-        days = args.get('days', 30)
-        return journal_service.get_mood_stats(days)
+        task_name = task.title
+        task.delete()
+        return {'eliminada': True, 'titulo': task_name}
+    except Task.DoesNotExist:
+        return {'error': f"No se encontró tarea con ID {task_id}"}
+
+
+# Deleting a project unlinks its tasks, transactions and entries
+@tool("delete_project", writes=('tasks', 'finance', 'journal', 'projects'))
+def delete_project(args: dict):
+    from projects.models import Project
+    project_id = args.get('project_id')
+    project_name = args.get('project_name')
     
-    elif name == "get_all_projects":
-        projects = projects_service.get_all_projects()
-        return [{'id': p.id, 'nombre': p.name, 'color': p.color, 'stats': p.get_stats()} for p in projects]
+    try:
+        if project_id:
+            project = Project.objects.get(id=project_id)
+        elif project_name:
+            project = Project.objects.filter(name__icontains=project_name).first()
+            if not project:
+                return {'error': f"No se encontró proyecto con nombre '{project_name}'"}
+        else:
+            return {'error': 'Debes especificar project_id o project_name'}
+        
+        proj_name = project.name
+        project.delete()
+        return {'eliminado': True, 'nombre': proj_name}
+    except Project.DoesNotExist:
+        return {'error': f"No se encontró proyecto con ID {project_id}"}
+
+
+@tool("delete_savings_goal", writes=('finance',))
+def delete_savings_goal(args: dict):
+    from finance.models import SavingsGoal
+    goal_id = args.get('goal_id')
+    goal_name = args.get('goal_name')
     
-    # Journal tools
-    elif name == "get_journal_categories":
-        categories = journal_service.get_all_categories()
-        return [{'id': c.id, 'nombre': c.name} for c in categories]
-    
-    elif name == "write_journal_entry":
-        # Buscar o crear categoría si se especifica
-        category_id = None
-        if args.get('category_name'):
-            from journal.models import Category
-            category, created = Category.objects.get_or_create(
-                name=args['category_name']
-            )
-            category_id = category.id
+    try:
+        if goal_id:
+            goal = SavingsGoal.objects.get(id=goal_id)
+        elif goal_name:
+            goal = SavingsGoal.objects.filter(name__icontains=goal_name).first()
+            if not goal:
+                return {'error': f"No se encontró meta de ahorro con nombre '{goal_name}'"}
+        else:
+            return {'error': 'Debes especificar goal_id o goal_name'}
         
-        entry = journal_service.create_entry(
-            title=args['title'],
-            content=args['content'],
-            entry_date=today,
-            category_id=category_id,
-            mood=args.get('mood'),
-            energy=args.get('energy')
-        )
-        return {'id': entry.id, 'titulo': entry.title, 'categoria': args.get('category_name'), 'creada': True}
+        g_name = goal.name
+        goal.delete()
+        return {'eliminada': True, 'nombre': g_name}
+    except SavingsGoal.DoesNotExist:
+        return {'error': f"No se encontró meta de ahorro con ID {goal_id}"}
+
+
+# Everything derived from TOOLS is built once, at import: the argument
+# validators and the tool list in each provider's format.
+_undeclared = {t["function"]["name"] for t in TOOLS} ^ set(TOOL_HANDLERS)
+if _undeclared:
+    raise ImproperlyConfigured(f"Chat tools without both a declaration and a handler: {sorted(_undeclared)}")
+
+TOOL_VALIDATORS = {
+    t["function"]["name"]: Draft7Validator(t["function"]["parameters"])
+    for t in TOOLS
+}
+
+# Tools that only read data. Several of them in one turn run concurrently and
+# their results are memoized for the request; every other tool is a write and
+# runs alone, in the order the model asked.
+READ_ONLY_TOOLS = frozenset(name for name, domains in TOOL_WRITES.items() if not domains)
+
+ANTHROPIC_TOOLS = [
+    {
+        "name": t["function"]["name"],
+        "description": t["function"]["description"],
+        "input_schema": t["function"]["parameters"]
+    }
+    for t in TOOLS
+]
+# Prompt caching: the tool list is the start of every Anthropic prompt and never changes
+ANTHROPIC_TOOLS[-1]["cache_control"] = {"type": "ephemeral"}
+
+
+def execute_tool(name: str, args: dict) -> dict:
+    """Execute a tool and return the result."""
+    handler = TOOL_HANDLERS.get(name)
+    if handler is None:
+        return {"error": f"Herramienta desconocida: {name}"}
     
-    # Project tools
-    elif name == "create_project":
-        project = projects_service.create_project(
-            name=args['name'],
-            description=args.get('description', ''),
-            color=args.get('color', '#6366F1')
-        )
-        return {'id': project.id, 'nombre': project.name, 'creado': True}
-    
-    elif name == "add_project_objective":
-        deadline = None
-        if args.get('deadline'):
-            deadline = datetime.strptime(args['deadline'], '%Y-%m-%d').date()
-        objective = projects_service.create_objective(
-            project_id=args['project_id'],
-            title=args['title'],
-            description=args.get('description', ''),
-            deadline=deadline
-        )
-        if not objective:
-            return {'error': f"No se encontró proyecto con ID {args['project_id']}"}
-            
-        return {'id': objective.id, 'titulo': objective.title, 'creado': True}
-    
-    elif name == "add_project_objectives_batch":
-        result = projects_service.create_objectives_batch(
-            project_id=args['project_id'],
-            objectives=args['objectives']
-        )
-        if not result['success']:
-            return {'error': result.get('error', 'Error creating objectives')}
-        return result
+    # The model gets the schema violation back and can retry with fixed arguments
+    error = best_match(TOOL_VALIDATORS[name].iter_errors(args))
+    if error is not None:
+        return {"error": f"Argumentos inválidos para {name}: {error.message}"}
     
-    elif name == "complete_objective":
-        objective = projects_service.update_objective_status(args['objective_id'], 'COMPLETED')
-        return {'id': objective.id, 'titulo': objective.title, 'completado': True}
+    return handler(args)
+
+
+def execute_tool_traced(name: str, args: dict, trace: chat_trace.Trace = None) -> dict:
+    """execute_tool in a 'tool' span of the trace, counting its SQL queries."""
+    with chat_trace.span(trace, 'tool', sql=True, tool=name):
+        return execute_tool(name, args)
+
+
+def execute_tool_in_worker(name: str, args: dict, trace: chat_trace.Trace = None) -> dict:
+    """execute_tool for pool threads, which outlive the request: release their connection like a request would."""
+    try:
+        return execute_tool_traced(name, args, trace)
+    finally:
+        close_old_connections()
+
+
+def tool_timeout_result(name: str) -> dict:
+    return {'error': f"La herramienta {name} no respondió en {settings.CHAT_TOOL_TIMEOUT} segundos"}
+
+
+def plan_tool_batches(calls: list) -> list:
+    """
+    Group a turn's tool calls into batches that run one after another:
+    consecutive read-only calls share a batch and run concurrently, each
+    write call is a batch of its own. Reads after a write see its changes.
+    """
+    batches = []
+    for call in calls:
+        is_read = call[1] in READ_ONLY_TOOLS
+        if is_read and batches and batches[-1][0]:
+            batches[-1][1].append(call)
+        else:
+            batches.append((is_read, [call]))
+    return batches
+
+
+class ToolMemo:
+    """
+    Results of read-only tools within one chat request, so a call the model
+    repeats across iterations runs once. A write tool drops every memoized
+    result that read a domain it writes; failed calls are never memoized.
+    """
     
-    elif name == "get_project_objectives":
-        objectives = projects_service.get_project_objectives(args['project_id'])
-        return objectives
+    def __init__(self):
+        self.results = {}  # (name, canonical args) -> result
+        self.hits = 0
     
-    # Savings Goals tools
-    elif name == "create_savings_goal":
-        goal = finance_service.create_savings_goal(
-            name=args['name'],
-            target_amount=args['target_amount'],
-            current_amount=args.get('initial_amount', 0)
-        )
-        return {
-            'id': goal.id, 
-            'nombre': goal.name, 
-            'objetivo': float(goal.target_amount),
-            'actual': float(goal.current_amount),
-            'porcentaje': float(goal.get_percentage()),
-            'creada': True
-        }
+    @staticmethod
+    def key(name: str, args: dict) -> tuple:
+        return name, json.dumps(args, sort_keys=True, cls=DjangoJSONEncoder)
     
-    elif name == "add_funds_to_goal":
-        from finance.models import SavingsGoal
-        try:
-            goal = SavingsGoal.objects.get(name__icontains=args['goal_name'])
-            goal = finance_service.add_funds_to_goal(goal.id, args['amount'])
-            return {
-                'id': goal.id,
-                'nombre': goal.name,
-                'nuevo_saldo': float(goal.current_amount),
-                'objetivo': float(goal.target_amount),
-                'porcentaje': float(goal.get_percentage()),
-                'agregado': float(args['amount'])
-            }
-        except SavingsGoal.DoesNotExist:
-            return {'error': f"No se encontró meta de ahorro con nombre '{args['goal_name']}'"}
-    
-    # Delete tools execution
-    elif name == "delete_task":
-        from tasks.models import Task
-        task_id = args.get('task_id')
-        task_title = args.get('task_title')
+    def pending(self, keys: list) -> list:
+        """The keys of a read batch that have to run: not memoized, each one once."""
+        return [key for key in dict.fromkeys(keys) if key not in self.results]
+    
+    def resolve(self, keys: list, executed: dict) -> list:
+        """
+        Results of a read batch in call order, from this batch's executions
+        (key -> result) and the memo. Every call that did not run is a hit.
+        """
+        for key, result in executed.items():
+            if not (isinstance(result, dict) and 'error' in result):
+                self.results[key] = result
         
-        try:
-            if task_id:
-                task = Task.objects.get(id=task_id)
-            elif task_title:
-                task = Task.objects.filter(title__icontains=task_title).first()
-                if not task:
-                    return {'error': f"No se encontró tarea con título '{task_title}'"}
+        fresh = set(executed)
+        results = []
+        for key in keys:
+            if key in fresh:
+                fresh.discard(key)
             else:
-                return {'error': 'Debes especificar task_id o task_title'}
-            
-            task_name = task.title
-            task.delete()
-            return {'eliminada': True, 'titulo': task_name}
-        except Task.DoesNotExist:
-            return {'error': f"No se encontró tarea con ID {task_id}"}
-    
-    elif name == "delete_project":
-        from projects.models import Project
-        project_id = args.get('project_id')
-        project_name = args.get('project_name')
+                self.hits += 1
+            results.append(executed[key] if key in executed else self.results[key])
+        return results
+    
+    def invalidate(self, name: str):
+        written = TOOL_WRITES.get(name, frozenset())
+        if written:
+            self.results = {key: result for key, result in self.results.items() if not TOOL_READS[key[0]] & written}
+
+
+def execute_tool_calls(calls: list, memo: ToolMemo = None, trace: chat_trace.Trace = None):
+    """
+    Run a turn's tool calls, yielding 'tool_start' / 'tool_result' events batch by batch.
+    Read batches run on TOOL_EXECUTOR with a per-tool timeout (a timed out tool
+    reports an error to the model), skipping the calls memoized in `memo`;
+    writes run inline, in order, and invalidate the reads they affect.
+    Every execution is a span of `trace`, if given.
+    Returns the results in call order.
+    """
+    memo = memo if memo is not None else ToolMemo()
+    results = []
+    for is_read, batch in plan_tool_batches(calls):
+        for call_id, tool_name, tool_args in batch:
+            yield 'tool_start', {'name': tool_name, 'arguments': tool_args}
         
-        try:
-            if project_id:
-                project = Project.objects.get(id=project_id)
-            elif project_name:
-                project = Project.objects.filter(name__icontains=project_name).first()
-                if not project:
-                    return {'error': f"No se encontró proyecto con nombre '{project_name}'"}
-            else:
-                return {'error': 'Debes especificar project_id o project_name'}
-            
-            proj_name = project.name
-            project.delete()
-            return {'eliminado': True, 'nombre': proj_name}
-        except Project.DoesNotExist:
-            return {'error': f"No se encontró proyecto con ID {project_id}"}
-    
-    elif name == "delete_savings_goal":
-        from finance.models import SavingsGoal
-        goal_id = args.get('goal_id')
-        goal_name = args.get('goal_name')
+        if is_read:
+            keys = [memo.key(tool_name, tool_args) for _, tool_name, tool_args in batch]
+            args_by_key = dict(zip(keys, (tool_args for _, _, tool_args in batch)))
+            futures = {
+                key: TOOL_EXECUTOR.submit(execute_tool_in_worker, key[0], args_by_key[key], trace)
+                for key in memo.pending(keys)
+            }
+            executed = {}
+            for key, future in futures.items():
+                try:
+                    executed[key] = future.result(timeout=settings.CHAT_TOOL_TIMEOUT)
+                except FutureTimeoutError:
+                    executed[key] = tool_timeout_result(key[0])
+            batch_results = memo.resolve(keys, executed)
+        else:
+            _, tool_name, tool_args = batch[0]
+            batch_results = [execute_tool_traced(tool_name, tool_args, trace)]
+            memo.invalidate(tool_name)
         
-        try:
-            if goal_id:
-                goal = SavingsGoal.objects.get(id=goal_id)
-            elif goal_name:
-                goal = SavingsGoal.objects.filter(name__icontains=goal_name).first()
-                if not goal:
-                    return {'error': f"No se encontró meta de ahorro con nombre '{goal_name}'"}
-            else:
-                return {'error': 'Debes especificar goal_id o goal_name'}
-            
-            g_name = goal.name
-            goal.delete()
-            return {'eliminada': True, 'nombre': g_name}
-        except SavingsGoal.DoesNotExist:
-            return {'error': f"No se encontró meta de ahorro con ID {goal_id}"}
-    
-    return {"error": f"Herramienta desconocida: {name}"}
+        for (_, tool_name, _), result in zip(batch, batch_results):
+            yield 'tool_result', {'name': tool_name, 'result': result}
+        results.extend(batch_results)
+    return results
 
 
 SYSTEM_PROMPT = """Eres LifeOS AI, un asistente personal inteligente que ayuda a gestionar la vida del usuario.
@@ -646,25 +978,8 @@ Cuando debas crear VARIOS objetivos para un proyecto, usa add_project_objectives
 
 
 def get_client_for_provider(provider: str, api_key: str):
-    """Create appropriate client based on provider."""
-    if provider == 'groq':
-        from groq import Groq
-        return Groq(api_key=api_key), 'groq'
-    elif provider == 'openai':
-        from openai import OpenAI
-        return OpenAI(api_key=api_key), 'openai'
-    elif provider == 'anthropic':
-        import anthropic
-        return anthropic.Anthropic(api_key=api_key), 'anthropic'
-    elif provider == 'together':
-        from openai import OpenAI
-        return OpenAI(api_key=api_key, base_url="https://api.together.xyz/v1"), 'openai'
-    elif provider == 'openrouter':
-        from openai import OpenAI
-        return OpenAI(api_key=api_key, base_url="https://openrouter.ai/api/v1"), 'openai'
-    else:
-        from groq import Groq
-        return Groq(api_key=api_key), 'groq'
+    """Get the pooled client for a provider (see core.llm_clients)."""
+    return llm_clients.get_client(provider, api_key)
 
 
 def call_openai_compatible(client, model: str, messages: list, tools: list):
@@ -679,50 +994,539 @@ def call_openai_compatible(client, model: str, messages: list, tools: list):
     return response
 
 
-def call_anthropic(client, model: str, messages: list, tools: list):
-    """Call Anthropic API with tool support."""
-    # Convert tools to Anthropic format
-    anthropic_tools = []
-    for tool in tools:
-        anthropic_tools.append({
-            "name": tool["function"]["name"],
-            "description": tool["function"]["description"],
-            "input_schema": tool["function"]["parameters"]
-        })
-    
-    # Extract system message and convert messages
-    system_msg = ""
+def stream_openai_compatible(client, model: str, messages: list, tools: list, usage: "TokenUsage" = None):
+    """
+    Streaming variant of call_openai_compatible.
+    Yields ('token', {'text': ...}) events as the answer arrives and returns the
+    assembled assistant message (content and tool calls) as a dict.
+    Token counts sent by the provider with the stream are added to `usage`.
+    """
+    stream = client.chat.completions.create(
+        model=model,
+        messages=messages,
+        tools=tools,
+        tool_choice="auto",
+        max_tokens=1024,
+        stream=True
+    )
+    content = []
+    tool_calls = {}
+    for chunk in stream:
+        if usage is not None:
+            usage.add_openai(chunk_usage(chunk))
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta
+        if delta.content:
+            content.append(delta.content)
+            yield 'token', {'text': delta.content}
+        # Tool calls arrive in fragments keyed by their index
+        for call in delta.tool_calls or []:
+            entry = tool_calls.setdefault(call.index, {
+                'id': '', 'type': 'function', 'function': {'name': '', 'arguments': ''}
+            })
+            if call.id:
+                entry['id'] = call.id
+            if call.function and call.function.name:
+                entry['function']['name'] += call.function.name
+            if call.function and call.function.arguments:
+                entry['function']['arguments'] += call.function.arguments
+
+    message = {'role': 'assistant', 'content': ''.join(content) or None}
+    if tool_calls:
+        message['tool_calls'] = [tool_calls[index] for index in sorted(tool_calls)]
+    return message
+
+
+def chunk_usage(chunk):
+    """Usage carried by a stream chunk: OpenRouter sends it on the last chunk, Groq under x_groq."""
+    return getattr(chunk, 'usage', None) or getattr(getattr(chunk, 'x_groq', None), 'usage', None)
+
+
+def openai_message_to_dict(message) -> dict:
+    """Convert an SDK assistant message to the dict form used in the message list."""
+    result = {'role': 'assistant', 'content': message.content}
+    if message.tool_calls:
+        result['tool_calls'] = [
+            {
+                'id': call.id,
+                'type': 'function',
+                'function': {'name': call.function.name, 'arguments': call.function.arguments}
+            }
+            for call in message.tool_calls
+        ]
+    return result
+
+
+def to_anthropic_request(messages: list):
+    """
+    Split out the system messages: Anthropic takes them as a separate list of
+    text blocks. The first one is the stable system prompt and carries the
+    cache breakpoint, so tools and system prompt are read from the cache.
+    OpenAI-format tool turns (from a stored session) become tool_use and
+    tool_result blocks.
+    """
+    system_blocks = []
     anthropic_messages = []
     for msg in messages:
         if msg["role"] == "system":
-            system_msg = msg["content"]
+            system_blocks.append({"type": "text", "text": msg["content"]})
+        elif msg["role"] == "tool":
+            block = {"type": "tool_result", "tool_use_id": msg["tool_call_id"], "content": msg["content"]}
+            previous = anthropic_messages[-1] if anthropic_messages else None
+            if previous and previous["role"] == "user" and isinstance(previous["content"], list):
+                previous["content"].append(block)
+            else:
+                anthropic_messages.append({"role": "user", "content": [block]})
+        elif msg.get("tool_calls"):
+            content = [{"type": "text", "text": msg["content"]}] if msg["content"] else []
+            content.extend(
+                {
+                    "type": "tool_use",
+                    "id": call["id"],
+                    "name": call["function"]["name"],
+                    "input": json.loads(call["function"]["arguments"] or '{}')
+                }
+                for call in msg["tool_calls"]
+            )
+            anthropic_messages.append({"role": "assistant", "content": content})
         else:
             anthropic_messages.append(msg)
+    if system_blocks:
+        system_blocks[0]["cache_control"] = {"type": "ephemeral"}
+    return system_blocks, anthropic_messages
+
+
+def call_anthropic(client, model: str, messages: list, tools: list):
+    """Call Anthropic API with tool support (tools in Anthropic format, e.g. ANTHROPIC_TOOLS)."""
+    system_blocks, anthropic_messages = to_anthropic_request(messages)
     
     response = client.messages.create(
         model=model,
         max_tokens=1024,
-        system=system_msg,
+        system=system_blocks,
         messages=anthropic_messages,
-        tools=anthropic_tools
+        tools=tools
     )
     return response
 
+
+def stream_anthropic(client, model: str, messages: list, tools: list):
+    """
+    Streaming variant of call_anthropic.
+    Yields ('token', {'text': ...}) events and returns the final message.
+    """
+    system_blocks, anthropic_messages = to_anthropic_request(messages)
+    
+    with client.messages.stream(
+        model=model,
+        max_tokens=1024,
+        system=system_blocks,
+        messages=anthropic_messages,
+        tools=tools
+    ) as stream:
+        for text in stream.text_stream:
+            yield 'token', {'text': text}
+        return stream.get_final_message()
+
+
+MAX_TOOL_ITERATIONS = 5
+
+
+def build_messages(recent_messages: list, summary: str = None) -> list:
+    """
+    The system prompt, a second system message with what changes between
+    requests (current date, summary of older messages), then the recent
+    conversation (as split by chat_context.split_history).
+    Tools and SYSTEM_PROMPT come first and never change, so providers serve
+    that prefix from their prompt cache.
+    """
+    today = date.today()
+    context_prompt = f"""INFORMACIÓN IMPORTANTE:
+- Fecha actual: {today.strftime('%Y-%m-%d')} ({today.strftime('%A, %d de %B de %Y')})
+- Cuando el usuario diga "mañana", calcula la fecha como {(today + timedelta(days=1)).strftime('%Y-%m-%d')}
+- Cuando el usuario diga "pasado mañana", calcula la fecha como {(today + timedelta(days=2)).strftime('%Y-%m-%d')}
+- Siempre usa el formato YYYY-MM-DD para las fechas en las herramientas."""
+    
+    if summary:
+        context_prompt += f"\n\nRESUMEN DE LA CONVERSACIÓN ANTERIOR:\n{summary}"
+    
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "system", "content": context_prompt},
+        *recent_messages
+    ]
+
+
+def complete_text(client, client_type: str, model: str, messages: list, max_tokens: int) -> str:
+    """Plain completion without tools (used for the conversation summary)."""
+    if client_type == 'anthropic':
+        system_blocks, anthropic_messages = to_anthropic_request(messages)
+        response = client.messages.create(model=model, max_tokens=max_tokens, system=system_blocks, messages=anthropic_messages)
+        return next((b.text for b in response.content if hasattr(b, 'text')), '')
+    
+    response = client.chat.completions.create(model=model, messages=messages, max_tokens=max_tokens)
+    return response.choices[0].message.content or ''
+
+
+def build_context(router: llm_router.Router, history: list, trace: chat_trace.Trace = None) -> list:
+    """
+    Messages for a chat request within the token budget: the recent history
+    verbatim, the older history as a rolling summary (summarizing only the
+    messages the cached summary does not cover yet).
+    `history` is OpenAI-format and ends with the message being answered.
+    """
+    older, recent = chat_context.split_history(history)
+    summary = chat_context.RollingSummary(older)
+    if summary.pending:
+        try:
+            prompt = summary.prompt()
+            with chat_trace.span(trace, 'summary', messages=len(summary.pending)):
+                _, text = router.call(
+                    lambda client, client_type, model: complete_text(client, client_type, model, prompt, settings.CHAT_SUMMARY_MAX_TOKENS)
+                )
+                summary.save(text)
+        except Exception:
+            # The chat goes on with the last cached summary: it only forgets the newest folded turns
+            logger.warning("Error summarizing conversation", exc_info=True)
+    return build_messages(recent, summary.summary)
+
+
+class TokenUsage:
+    """Token counts of a chat request, summed over its model calls."""
+    
+    def __init__(self):
+        self.input_tokens = 0  # Prompt tokens, cached ones included
+        self.output_tokens = 0
+        self.cache_read_tokens = 0
+        self.cache_write_tokens = 0
+    
+    def add_openai(self, usage):
+        if usage is None:
+            return
+        self.input_tokens += getattr(usage, 'prompt_tokens', 0) or 0
+        self.output_tokens += getattr(usage, 'completion_tokens', 0) or 0
+        details = getattr(usage, 'prompt_tokens_details', None)
+        self.cache_read_tokens += getattr(details, 'cached_tokens', 0) or 0
+    
+    def add_anthropic(self, usage):
+        if usage is None:
+            return
+        # Anthropic counts cached prompt tokens apart from input_tokens
+        cache_read = getattr(usage, 'cache_read_input_tokens', 0) or 0
+        cache_write = getattr(usage, 'cache_creation_input_tokens', 0) or 0
+        self.input_tokens += (getattr(usage, 'input_tokens', 0) or 0) + cache_read + cache_write
+        self.output_tokens += getattr(usage, 'output_tokens', 0) or 0
+        self.cache_read_tokens += cache_read
+        self.cache_write_tokens += cache_write
+    
+    def add(self, other: "TokenUsage"):
+        self.input_tokens += other.input_tokens
+        self.output_tokens += other.output_tokens
+        self.cache_read_tokens += other.cache_read_tokens
+        self.cache_write_tokens += other.cache_write_tokens
+    
+    def as_dict(self) -> dict:
+        return {
+            'input_tokens': self.input_tokens,
+            'output_tokens': self.output_tokens,
+            'cache_read_tokens': self.cache_read_tokens,
+            'cache_write_tokens': self.cache_write_tokens,
+        }
+
+
+def request_turn(client, client_type: str, model: str, messages: list, stream: bool = False, usage: TokenUsage = None):
+    """
+    Ask the model for its next turn. A generator: with stream=True it yields
+    'token' events while the turn arrives. Returns the turn in the form
+    parse_turn() reads (Anthropic message, or OpenAI-style message dict),
+    adding its token counts to `usage`.
+    """
+    usage = usage if usage is not None else TokenUsage()
+    if client_type == 'anthropic':
+        if stream:
+            response = yield from stream_anthropic(client, model, messages, ANTHROPIC_TOOLS)
+        else:
+            response = call_anthropic(client, model, messages, ANTHROPIC_TOOLS)
+        usage.add_anthropic(getattr(response, 'usage', None))
+        return response
+    
+    # OpenAI-compatible flow (Groq, OpenAI, Together, OpenRouter)
+    if stream:
+        return (yield from stream_openai_compatible(client, model, messages, TOOLS, usage))
+    response = call_openai_compatible(client, model, messages, TOOLS)
+    usage.add_openai(getattr(response, 'usage', None))
+    return openai_message_to_dict(response.choices[0].message)
+
+
+def finish_generator(generator):
+    """Run a generator that yields nothing (request_turn without streaming) and return its value."""
+    try:
+        while True:
+            next(generator)
+    except StopIteration as finished:
+        return finished.value
+
+
+def request_routed_turn(router: llm_router.Router, messages: list, stream: bool = False):
+    """
+    request_turn over the router's providers: retried, failed over and, when
+    not streamed, hedged (core/llm_router.py). A generator like request_turn,
+    returning (route, client_type, response, token usage of the answering call).
+    """
+    def attempt(client, client_type, model):
+        usage = TokenUsage()
+        response = yield from request_turn(client, client_type, model, messages, stream, usage)
+        return client_type, response, usage
+    
+    if stream:
+        route, result = yield from router.stream(attempt)
+    else:
+        route, result = router.call(lambda client, client_type, model: finish_generator(attempt(client, client_type, model)))
+    return (route, *result)
+
+
+def parse_turn(client_type: str, response):
+    """Split an assistant turn into its text and its tool calls as (call id, name, args)."""
+    if client_type == 'anthropic':
+        text_content = next((b.text for b in response.content if hasattr(b, 'text')), '')
+        calls = [(block.id, block.name, block.input) for block in response.content if block.type == "tool_use"]
+        return text_content, calls
+    
+    calls = []
+    for tool_call in response.get('tool_calls') or []:
+        arguments = tool_call['function']['arguments']
+        calls.append((tool_call['id'], tool_call['function']['name'], json.loads(arguments) if arguments else {}))
+    return response['content'] or '', calls
+
+
+def append_tool_turn(client_type: str, messages: list, response, calls: list, results: list) -> list:
+    """
+    Add the assistant turn and its tool results to the conversation, in call order.
+    Results over the size limit reach the model truncated (the events keep them whole).
+    Turns are kept in the OpenAI format whatever the provider (to_anthropic_request
+    converts them), so the next turn may be answered by another provider.
+    Returns the added messages, the form sessions store.
+    """
+    if client_type == 'anthropic':
+        text_content, _ = parse_turn(client_type, response)
+        response = {
+            "role": "assistant",
+            "content": text_content or None,
+            "tool_calls": [
+                {
+                    "id": call_id,
+                    "type": "function",
+                    "function": {"name": tool_name, "arguments": json.dumps(tool_args, ensure_ascii=False)}
+                }
+                for call_id, tool_name, tool_args in calls
+            ]
+        }
+    
+    turn = [response, *(
+        {"role": "tool", "tool_call_id": call_id, "content": chat_context.truncate_tool_result(result)}
+        for (call_id, _, _), result in zip(calls, results)
+    )]
+    messages.extend(turn)
+    return turn
+
+
+def run_chat(
+    router: llm_router.Router,
+    messages: list,
+    stream: bool = False,
+    transcript: list = None,
+    trace: chat_trace.Trace = None
+):
+    """
+    Run the tool-calling loop, yielding (event, data) pairs:
+    'tool_start' and 'tool_result' around tool executions, 'token' for
+    streamed answer text (only with stream=True) and a final 'done' with the
+    response, the tools used, how many tool calls were answered from the
+    request's memo (tool_cache_hits) and the token usage, with the prompt
+    tokens read from the provider's cache.
+    Text streamed in a turn that ends up calling tools is part of that turn,
+    not of the final answer.
+    The new turns are added to `transcript`, if given, in OpenAI format, and
+    every model call and tool execution is a span of `trace`.
+    """
+    tools_used = []
+    text_content = ''
+    memo = ToolMemo()
+    usage = TokenUsage()
+    
+    for iteration in range(MAX_TOOL_ITERATIONS):
+        with chat_trace.span(trace, 'llm', iteration=iteration) as span:
+            route, client_type, response, turn_usage = yield from request_routed_turn(router, messages, stream)
+            span.update(provider=route.provider, model=route.model, **turn_usage.as_dict())
+            usage.add(turn_usage)
+        text_content, calls = parse_turn(client_type, response)
+        if not calls:
+            break
+        
+        tools_used.extend(tool_name for _, tool_name, _ in calls)
+        results = yield from execute_tool_calls(calls, memo, trace)
+        
+        # Continue the loop to allow more tool calls
+        turn = append_tool_turn(client_type, messages, response, calls, results)
+        if transcript is not None:
+            transcript.extend(turn)
+    
+    # Final answer, or the last response when max iterations were reached
+    if transcript is not None:
+        transcript.append({'role': 'assistant', 'content': text_content})
+    yield 'done', {
+        'response': text_content,
+        'tools_used': tools_used,
+        'tool_cache_hits': memo.hits,
+        'usage': usage.as_dict()
+    }
+
+
+def parse_session_id(data: dict):
+    """The session_id of a request body as a UUID (None for a new session). Raises ValueError if malformed."""
+    session_id = data.get('session_id')
+    if not session_id:
+        return None
+    try:
+        return uuid.UUID(str(session_id))
+    except ValueError:
+        raise ValueError('session_id inválido')
+
+
+def load_session(session_id, user_message: str, trace: chat_trace.Trace = None):
+    """The session (created if needed) and its stored history followed by the new user message."""
+    with chat_trace.span(trace, 'session_load', sql=True):
+        session = chat_session_service.get_or_create_session(session_id)
+        return session, [*chat_session_service.get_history(session), {'role': 'user', 'content': user_message}]
+
+
+def save_exchange(session, user_message: str, transcript: list, trace: chat_trace.Trace = None):
+    with chat_trace.span(trace, 'session_save', sql=True):
+        chat_session_service.save_messages(session, [{'role': 'user', 'content': user_message}, *transcript])
+
+
+def record_session(events, session, user_message: str, transcript: list, trace: chat_trace.Trace = None):
+    """Pass run_chat events through; on 'done' store the exchange and add the session_id."""
+    for event, data in events:
+        if event == 'done':
+            save_exchange(session, user_message, transcript, trace)
+            data = {**data, 'session_id': str(session.id)}
+        yield event, data
+
+
+def lookup_cached_response(user_message: str, model: str, trace: chat_trace.Trace = None):
+    """
+    (cache key, data versions before the request, cached 'done' data or None)
+    for a request that opted into the response cache.
+    """
+    with chat_trace.span(trace, 'response_cache') as span:
+        cache_key = chat_cache.response_key(user_message, model)
+        versions = data_versions.get_versions()
+        cached = chat_cache.get_response(cache_key)
+        span['hit'] = cached is not None
+    return cache_key, versions, cached
+
+
+def cached_chat_events(result: dict, stream: bool = False, transcript: list = None):
+    """The run_chat events of an answer served from the response cache: no model call, no tools."""
+    if transcript is not None:
+        transcript.append({'role': 'assistant', 'content': result['response']})
+    if stream and result['response']:
+        yield 'token', {'text': result['response']}
+    yield 'done', {**result, 'tool_cache_hits': 0, 'usage': TokenUsage().as_dict(), 'cached': True}
+
+
+def store_cacheable_response(cache_key: str, versions: dict, result: dict):
+    """
+    Cache a 'done' result answered only with read-only tools. Answers that
+    wrote data, or used no tools (chit-chat, which leans on the conversation), are not cached.
+    """
+    tools_used = result['tools_used']
+    if not tools_used or any(name not in READ_ONLY_TOOLS for name in tools_used):
+        return
+    domains = frozenset().union(*(TOOL_READS[name] for name in tools_used))
+    chat_cache.save_response(cache_key, versions, domains, {k: v for k, v in result.items() if k != 'session_id'})
+
+
+def cache_response(events, cache_key: str, versions: dict):
+    """Pass run_chat events through; on 'done' offer the answer to the response cache."""
+    for event, data in events:
+        if event == 'done':
+            store_cacheable_response(cache_key, versions, data)
+        yield event, data
+
+
+def sse_event(event: str, data) -> str:
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, cls=DjangoJSONEncoder)}\n\n"
+
+
+def error_response(error: Exception) -> JsonResponse:
+    """
+    The JSON error of a failed chat request. Rate limits (the provider's 429
+    after retries, or our own queue for the key being full) are a 429 with
+    Retry-After, so clients back off instead of seeing a server error.
+    """
+    if getattr(error, 'status_code', None) == 429:
+        response = JsonResponse({'error': str(error)}, status=429)
+        response['Retry-After'] = str(max(1, round(llm_limiter.retry_after(error) or settings.LLM_RETRY_BACKOFF)))
+        return response
+    return JsonResponse({'error': str(error)}, status=500)
+
+
+def stream_chat_events(events, trace: chat_trace.Trace = None):
+    """Relay run_chat events as SSE; a failure mid-stream becomes an 'error' event."""
+    error = None
+    try:
+        for event, data in events:
+            yield sse_event(event, data)
+    except Exception as e:
+        error = str(e)
+        yield sse_event('error', {'error': error})
+    finally:
+        if trace is not None:
+            trace.finish(**({'error': error} if error else {}))
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def chat_api(request):
-    """Handle chat requests with multi-provider support and conversation memory."""
+    """
+    Handle chat requests with multi-provider support and conversation memory.
+    
+    The conversation is stored server-side: the client sends the new
+    message and the session_id from the previous 'done' (none to start a
+    session). Clients that send the whole conversation_history instead and
+    no session_id are answered statelessly, as before.
+    
+    With "stream": true in the body the response is a text/event-stream of
+    Server-Sent Events: tool_start / tool_result for every tool call, token
+    for each piece of answer text, then done ({response, tools_used, tool_cache_hits, usage, session_id}) or error.
+    
+    Optional "fallbacks": [{provider, api_key, model}] name providers with an
+    equivalent model that take over when the selected one fails or is slow.
+    
+    With "cache": true (default CHAT_RESPONSE_CACHE) an answer given with
+    read-only tools is reused for the same question and model while the data
+    it read is unchanged (core/chat_cache.py); 'done' then has "cached": true.
+    
+    Every request is traced (core/chat_trace.py): X-Trace-Id names the trace,
+    and non-streamed responses carry its phase timings in Server-Timing.
+    """
+    trace = None
     try:
         data = json.loads(request.body)
         user_message = data.get('message', '')
-        conversation_history = data.get('conversation_history', [])
+        conversation_history = data.get('conversation_history')
         provider = data.get('provider', 'groq')
         api_key = data.get('api_key', '')
         model = data.get('model', 'llama-3.1-70b-versatile')
+        stream = bool(data.get('stream', False))
+        use_cache = bool(data.get('cache', settings.CHAT_RESPONSE_CACHE))
 
         mask_key = f"{api_key[:4]}...{api_key[-4:]}" if api_key and len(api_key) > 8 else "INVALID/EMPTY"
-        print(f"DEBUG: Chat Request - Provider: {provider}, Model: {model}, Key: {mask_key}")
-
+        logger.debug(f"Chat request - Provider: {provider}, Model: {model}, Key: {mask_key}")
         
         if not user_message:
             return JsonResponse({'error': 'Mensaje vacío'}, status=400)
@@ -730,118 +1534,58 @@ def chat_api(request):
         if not api_key:
             return JsonResponse({'error': 'API key no configurada. Ve a Configuración.'}, status=400)
         
-        # Get appropriate client
-        client, client_type = get_client_for_provider(provider, api_key)
+        try:
+            session_id = parse_session_id(data)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
         
-        # Build system prompt with current date
-        today = date.today()
-        dynamic_prompt = f"""{SYSTEM_PROMPT}
-
-INFORMACIÓN IMPORTANTE:
-- Fecha actual: {today.strftime('%Y-%m-%d')} ({today.strftime('%A, %d de %B de %Y')})
-- Cuando el usuario diga "mañana", calcula la fecha como {(today + timedelta(days=1)).strftime('%Y-%m-%d')}
-- Cuando el usuario diga "pasado mañana", calcula la fecha como {(today + timedelta(days=2)).strftime('%Y-%m-%d')}
-- Siempre usa el formato YYYY-MM-DD para las fechas en las herramientas."""
+        trace = chat_trace.Trace(provider=provider, model=model, stream=stream)
+        
+        # The selected provider, then the fallbacks (providers running an equivalent model)
+        router = llm_router.Router(llm_router.get_routes(provider, api_key, model, data.get('fallbacks')))
         
-        # Build messages with conversation history
-        messages = [{"role": "system", "content": dynamic_prompt}]
+        cached = None
+        if use_cache:
+            cache_key, versions, cached = lookup_cached_response(user_message, model, trace)
         
-        # Add conversation history (limit to last 20 messages to avoid token limits)
-        history_limit = conversation_history[-20:] if len(conversation_history) > 20 else conversation_history
-        for msg in history_limit:
-            if msg.get('role') in ['user', 'assistant'] and msg.get('content'):
-                messages.append({"role": msg['role'], "content": msg['content']})
+        if conversation_history is not None and session_id is None:
+            if cached is not None:
+                events = cached_chat_events(cached, stream)
+            else:
+                with trace.span('context'):
+                    messages = build_context(router, chat_context.client_history(conversation_history), trace)
+                events = run_chat(router, messages, stream=stream, trace=trace)
+        else:
+            session, history = load_session(session_id, user_message, trace)
+            transcript = []
+            if cached is not None:
+                events = cached_chat_events(cached, stream, transcript)
+            else:
+                with trace.span('context'):
+                    messages = build_context(router, history, trace)
+                events = run_chat(router, messages, stream=stream, transcript=transcript, trace=trace)
+            events = record_session(events, session, user_message, transcript, trace)
         
-        tools_used = []
+        if use_cache and cached is None:
+            events = cache_response(events, cache_key, versions)
         
-        if client_type == 'anthropic':
-            # Anthropic flow with iterative tool calling
-            max_iterations = 5
-            iteration = 0
-            
-            while iteration < max_iterations:
-                iteration += 1
-                response = call_anthropic(client, model, messages, TOOLS)
-                
-                # Check for tool use
-                tool_uses = [block for block in response.content if block.type == "tool_use"]
-                
-                if tool_uses:
-                    # Execute tools
-                    tool_results = []
-                    for tool_use in tool_uses:
-                        tool_name = tool_use.name
-                        tool_args = tool_use.input
-                        tools_used.append(tool_name)
-                        
-                        result = execute_tool(tool_name, tool_args)
-                        tool_results.append({
-                            "type": "tool_result",
-                            "tool_use_id": tool_use.id,
-                            "content": json.dumps(result, ensure_ascii=False)
-                        })
-                    
-                    # Add assistant message and tool results
-                    messages.append({"role": "assistant", "content": response.content})
-                    messages.append({"role": "user", "content": tool_results})
-                    
-                    # Continue loop to allow more tool calls
-                else:
-                    # No more tool calls, return final response
-                    text_content = next((b.text for b in response.content if hasattr(b, 'text')), '')
-                    return JsonResponse({
-                        'response': text_content,
-                        'tools_used': tools_used
-                    })
-            
-            # Max iterations reached, return last response
-            text_content = next((b.text for b in response.content if hasattr(b, 'text')), '')
-            return JsonResponse({
-                'response': text_content,
-                'tools_used': tools_used
-            })
+        if stream:
+            response = StreamingHttpResponse(stream_chat_events(events, trace), content_type='text/event-stream')
+            response['Cache-Control'] = 'no-cache'
+            # Keep reverse proxies from buffering the stream
+            response['X-Accel-Buffering'] = 'no'
+            response['X-Trace-Id'] = trace.id
+            return response
         
-        else:
-            # OpenAI-compatible flow (Groq, OpenAI, Together, OpenRouter) with iterative tool calling
-            max_iterations = 5
-            iteration = 0
-            
-            while iteration < max_iterations:
-                iteration += 1
-                response = call_openai_compatible(client, model, messages, TOOLS)
-                assistant_message = response.choices[0].message
-                
-                # Check for tool calls
-                if assistant_message.tool_calls:
-                    messages.append(assistant_message)
-                    
-                    for tool_call in assistant_message.tool_calls:
-                        tool_name = tool_call.function.name
-                        tool_args = json.loads(tool_call.function.arguments) if tool_call.function.arguments else {}
-                        tools_used.append(tool_name)
-                        
-                        result = execute_tool(tool_name, tool_args)
-                        
-                        messages.append({
-                            "role": "tool",
-                            "tool_call_id": tool_call.id,
-                            "content": json.dumps(result, ensure_ascii=False)
-                        })
-                    
-                    # Continue loop to allow more tool calls
-                else:
-                    # No more tool calls, return final response
-                    return JsonResponse({
-                        'response': assistant_message.content,
-                        'tools_used': tools_used
-                    })
-            
-            # Max iterations reached, return last response
-            return JsonResponse({
-                'response': assistant_message.content,
-                'tools_used': tools_used
-            })
+        for event, result in events:
+            if event == 'done':
+                trace.finish(tools_used=result['tools_used'])
+                response = JsonResponse(result)
+                response['X-Trace-Id'] = trace.id
+                response['Server-Timing'] = trace.server_timing()
+                return response
         
     except Exception as e:
-        return JsonResponse({'error': str(e)}, status=500)
-
+        if trace is not None:
+            trace.finish(error=str(e))
+        return error_response(e)
@@ -0,0 +1,349 @@
+"""
+LifeOS Async Chat API View
+Async variant of chat_api for ASGI deployments (uvicorn core.asgi:application).
+LLM round trips use the providers' async clients, so a waiting chat holds no
+thread; the sync service-layer tools run on a bounded thread pool.
+"""
+import asyncio
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from core import chat_context, chat_trace, llm_clients, llm_router
+from core.chat_api import (
+    TOOLS, ANTHROPIC_TOOLS, MAX_TOOL_ITERATIONS, TOOL_EXECUTOR, ToolMemo, TokenUsage, execute_tool_in_worker,
+    tool_timeout_result, plan_tool_batches, build_messages, parse_turn, append_tool_turn, chunk_usage,
+    openai_message_to_dict, to_anthropic_request, sse_event, parse_session_id, load_session, save_exchange,
+    lookup_cached_response, cached_chat_events, store_cacheable_response, error_response,
+)
+
+
+logger = logging.getLogger('lifeos.chat')
+
+
+# Tools touch the database through the sync ORM: they run on the pool, never on the event loop
+execute_tool_async = sync_to_async(execute_tool_in_worker, thread_sensitive=False, executor=TOOL_EXECUTOR)
+
+
+async def _execute_read_tool(tool_name: str, tool_args: dict, trace: chat_trace.Trace):
+    try:
+        return await asyncio.wait_for(execute_tool_async(tool_name, tool_args, trace), settings.CHAT_TOOL_TIMEOUT)
+    except asyncio.TimeoutError:
+        return tool_timeout_result(tool_name)
+
+
+async def execute_tool_calls_async(calls: list, memo: ToolMemo, trace: chat_trace.Trace = None):
+    """
+    Async counterpart of execute_tool_calls: read batches are gathered
+    concurrently (skipping memoized calls), writes are awaited one by one.
+    Yields the tool events and finally ('results', results in call order).
+    """
+    results = []
+    for is_read, batch in plan_tool_batches(calls):
+        for call_id, tool_name, tool_args in batch:
+            yield 'tool_start', {'name': tool_name, 'arguments': tool_args}
+
+        if is_read:
+            keys = [memo.key(tool_name, tool_args) for _, tool_name, tool_args in batch]
+            args_by_key = dict(zip(keys, (tool_args for _, _, tool_args in batch)))
+            pending = memo.pending(keys)
+            outcomes = await asyncio.gather(*[_execute_read_tool(key[0], args_by_key[key], trace) for key in pending])
+            batch_results = memo.resolve(keys, dict(zip(pending, outcomes)))
+        else:
+            _, tool_name, tool_args = batch[0]
+            batch_results = [await execute_tool_async(tool_name, tool_args, trace)]
+            memo.invalidate(tool_name)
+
+        for (_, tool_name, _), result in zip(batch, batch_results):
+            yield 'tool_result', {'name': tool_name, 'result': result}
+        results.extend(batch_results)
+    yield 'results', results
+
+
+def get_async_client_for_provider(provider: str, api_key: str):
+    """Get the pooled async client for a provider (same routing as get_client_for_provider)."""
+    return llm_clients.get_client(provider, api_key, use_async=True)
+
+
+async def complete_text_async(client, client_type: str, model: str, messages: list, max_tokens: int) -> str:
+    """Async counterpart of complete_text."""
+    if client_type == 'anthropic':
+        system_blocks, anthropic_messages = to_anthropic_request(messages)
+        response = await client.messages.create(model=model, max_tokens=max_tokens, system=system_blocks, messages=anthropic_messages)
+        return next((b.text for b in response.content if hasattr(b, 'text')), '')
+
+    response = await client.chat.completions.create(model=model, messages=messages, max_tokens=max_tokens)
+    return response.choices[0].message.content or ''
+
+
+async def build_context_async(router: llm_router.Router, history: list, trace: chat_trace.Trace = None) -> list:
+    """Async counterpart of build_context."""
+    older, recent = chat_context.split_history(history)
+    summary = chat_context.RollingSummary(older)
+    if summary.pending:
+        try:
+            prompt = summary.prompt()
+            with chat_trace.span(trace, 'summary', messages=len(summary.pending)):
+                _, text = await router.call_async(
+                    lambda client, client_type, model: complete_text_async(client, client_type, model, prompt, settings.CHAT_SUMMARY_MAX_TOKENS)
+                )
+                summary.save(text)
+        except Exception:
+            logger.warning("Error summarizing conversation", exc_info=True)
+    return build_messages(recent, summary.summary)
+
+
+async def request_turn_async(client, client_type: str, model: str, messages: list, stream: bool, usage: TokenUsage):
+    """
+    Async counterpart of request_turn. An async generator: yields 'token'
+    events while streaming and finally ('turn', response), since async
+    generators cannot return a value.
+    """
+    if client_type == 'anthropic':
+        system_blocks, anthropic_messages = to_anthropic_request(messages)
+        request = dict(model=model, max_tokens=1024, system=system_blocks, messages=anthropic_messages, tools=ANTHROPIC_TOOLS)
+        if not stream:
+            response = await client.messages.create(**request)
+        else:
+            async with client.messages.stream(**request) as response_stream:
+                async for text in response_stream.text_stream:
+                    yield 'token', {'text': text}
+                response = await response_stream.get_final_message()
+        usage.add_anthropic(getattr(response, 'usage', None))
+        yield 'turn', response
+        return
+
+    # OpenAI-compatible flow (Groq, OpenAI, Together, OpenRouter)
+    request = dict(model=model, messages=messages, tools=TOOLS, tool_choice="auto", max_tokens=1024)
+    if not stream:
+        response = await client.chat.completions.create(**request)
+        usage.add_openai(getattr(response, 'usage', None))
+        yield 'turn', openai_message_to_dict(response.choices[0].message)
+        return
+
+    content = []
+    tool_calls = {}
+    async for chunk in await client.chat.completions.create(**request, stream=True):
+        usage.add_openai(chunk_usage(chunk))
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta
+        if delta.content:
+            content.append(delta.content)
+            yield 'token', {'text': delta.content}
+        for call in delta.tool_calls or []:
+            entry = tool_calls.setdefault(call.index, {
+                'id': '', 'type': 'function', 'function': {'name': '', 'arguments': ''}
+            })
+            if call.id:
+                entry['id'] = call.id
+            if call.function and call.function.name:
+                entry['function']['name'] += call.function.name
+            if call.function and call.function.arguments:
+                entry['function']['arguments'] += call.function.arguments
+
+    message = {'role': 'assistant', 'content': ''.join(content) or None}
+    if tool_calls:
+        message['tool_calls'] = [tool_calls[index] for index in sorted(tool_calls)]
+    yield 'turn', message
+
+
+async def request_routed_turn_async(router: llm_router.Router, messages: list, stream: bool):
+    """
+    Async counterpart of request_routed_turn: yields 'token' events while
+    streaming and finally ('turn', (route, client_type, response, usage)).
+    """
+    if stream:
+        async def attempt_stream(client, client_type, model):
+            usage = TokenUsage()
+            async for event, data in request_turn_async(client, client_type, model, messages, True, usage):
+                yield event, (client_type, data, usage) if event == 'turn' else data
+
+        route = result = None
+        async for event, data in router.stream_async(attempt_stream):
+            if event == 'route':
+                route = data
+            elif event == 'turn':
+                result = data
+            else:
+                yield event, data
+        yield 'turn', (route, *result)
+        return
+
+    async def attempt(client, client_type, model):
+        usage = TokenUsage()
+        async for _, response in request_turn_async(client, client_type, model, messages, False, usage):
+            pass  # Without streaming the only event is the turn
+        return client_type, response, usage
+
+    route, result = await router.call_async(attempt)
+    yield 'turn', (route, *result)
+
+
+async def run_chat_async(
+    router: llm_router.Router,
+    messages: list,
+    stream: bool = False,
+    transcript: list = None,
+    trace: chat_trace.Trace = None
+):
+    """Async counterpart of run_chat, yielding the same (event, data) pairs."""
+    tools_used = []
+    text_content = ''
+    memo = ToolMemo()
+    usage = TokenUsage()
+
+    for iteration in range(MAX_TOOL_ITERATIONS):
+        with chat_trace.span(trace, 'llm', iteration=iteration) as span:
+            async for event, data in request_routed_turn_async(router, messages, stream):
+                if event == 'turn':
+                    route, client_type, response, turn_usage = data
+                else:
+                    yield event, data
+            span.update(provider=route.provider, model=route.model, **turn_usage.as_dict())
+            usage.add(turn_usage)
+
+        text_content, calls = parse_turn(client_type, response)
+        if not calls:
+            break
+
+        tools_used.extend(tool_name for _, tool_name, _ in calls)
+        results = []
+        async for event, data in execute_tool_calls_async(calls, memo, trace):
+            if event == 'results':
+                results = data
+            else:
+                yield event, data
+
+        turn = append_tool_turn(client_type, messages, response, calls, results)
+        if transcript is not None:
+            transcript.extend(turn)
+
+    if transcript is not None:
+        transcript.append({'role': 'assistant', 'content': text_content})
+    yield 'done', {
+        'response': text_content,
+        'tools_used': tools_used,
+        'tool_cache_hits': memo.hits,
+        'usage': usage.as_dict()
+    }
+
+
+async def record_session_async(events, session, user_message: str, transcript: list, trace: chat_trace.Trace = None):
+    """Async counterpart of record_session."""
+    async for event, data in events:
+        if event == 'done':
+            await sync_to_async(save_exchange)(session, user_message, transcript, trace)
+            data = {**data, 'session_id': str(session.id)}
+        yield event, data
+
+
+async def cached_chat_events_async(result: dict, stream: bool = False, transcript: list = None):
+    """Async counterpart of cached_chat_events."""
+    for event, data in cached_chat_events(result, stream, transcript):
+        yield event, data
+
+
+async def cache_response_async(events, cache_key: str, versions: dict):
+    """Async counterpart of cache_response."""
+    async for event, data in events:
+        if event == 'done':
+            store_cacheable_response(cache_key, versions, data)
+        yield event, data
+
+
+async def stream_chat_events_async(events, trace: chat_trace.Trace = None):
+    """Relay run_chat_async events as SSE; a failure mid-stream becomes an 'error' event."""
+    error = None
+    try:
+        async for event, data in events:
+            yield sse_event(event, data)
+    except Exception as e:
+        error = str(e)
+        yield sse_event('error', {'error': error})
+    finally:
+        if trace is not None:
+            trace.finish(**({'error': error} if error else {}))
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+async def chat_api_async(request):
+    """
+    Same request and response format as chat_api (including "stream": true, session_id, fallbacks and cache),
+    served without blocking a worker while the model answers.
+    """
+    trace = None
+    try:
+        data = json.loads(request.body)
+        user_message = data.get('message', '')
+        conversation_history = data.get('conversation_history')
+        provider = data.get('provider', 'groq')
+        api_key = data.get('api_key', '')
+        model = data.get('model', 'llama-3.1-70b-versatile')
+        stream = bool(data.get('stream', False))
+        use_cache = bool(data.get('cache', settings.CHAT_RESPONSE_CACHE))
+
+        if not user_message:
+            return JsonResponse({'error': 'Mensaje vacío'}, status=400)
+
+        if not api_key:
+            return JsonResponse({'error': 'API key no configurada. Ve a Configuración.'}, status=400)
+
+        try:
+            session_id = parse_session_id(data)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        trace = chat_trace.Trace(provider=provider, model=model, stream=stream)
+        router = llm_router.Router(llm_router.get_routes(provider, api_key, model, data.get('fallbacks')), use_async=True)
+
+        cached = None
+        if use_cache:
+            cache_key, versions, cached = await sync_to_async(lookup_cached_response)(user_message, model, trace)
+
+        if conversation_history is not None and session_id is None:
+            if cached is not None:
+                events = cached_chat_events_async(cached, stream)
+            else:
+                with trace.span('context'):
+                    messages = await build_context_async(router, chat_context.client_history(conversation_history), trace)
+                events = run_chat_async(router, messages, stream=stream, trace=trace)
+        else:
+            session, history = await sync_to_async(load_session)(session_id, user_message, trace)
+            transcript = []
+            if cached is not None:
+                events = cached_chat_events_async(cached, stream, transcript)
+            else:
+                with trace.span('context'):
+                    messages = await build_context_async(router, history, trace)
+                events = run_chat_async(router, messages, stream=stream, transcript=transcript, trace=trace)
+            events = record_session_async(events, session, user_message, transcript, trace)
+
+        if use_cache and cached is None:
+            events = cache_response_async(events, cache_key, versions)
+
+        if stream:
+            response = StreamingHttpResponse(stream_chat_events_async(events, trace), content_type='text/event-stream')
+            response['Cache-Control'] = 'no-cache'
+            response['X-Accel-Buffering'] = 'no'
+            response['X-Trace-Id'] = trace.id
+            return response
+
+        async for event, result in events:
+            if event == 'done':
+                trace.finish(tools_used=result['tools_used'])
+                response = JsonResponse(result)
+                response['X-Trace-Id'] = trace.id
+                response['Server-Timing'] = trace.server_timing()
+                return response
+
+    except Exception as e:
+        if trace is not None:
+            trace.finish(error=str(e))
+        return error_response(e)
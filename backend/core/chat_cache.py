@@ -0,0 +1,57 @@
+"""
+LifeOS Chat Response Cache
+Opt-in cache of answers to repeated read-only questions ("¿cómo va mi día?",
+"¿cuánto he gastado este mes?"). An answer is keyed on the normalized
+message, the model and the day, and stored with the version of every data
+domain its tools read (services/data_versions.py). It is served again,
+without calling the model or any tool, only while none of those domains has
+been written since. The versions are checked against the database on every
+hit, so entries stay correct whichever process wrote the data.
+"""
+import hashlib
+import re
+import unicodedata
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+
+from services import data_versions
+
+
+RESPONSE_CACHE_PREFIX = 'chat-response:'
+
+
+def normalize_message(message: str) -> str:
+    """Case, accents, punctuation and spacing do not change the question."""
+    text = unicodedata.normalize('NFKD', message.casefold())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(re.sub(r'[^\w\s]', ' ', text).split())
+
+
+def response_key(message: str, model: str) -> str:
+    # The day is part of the key: "hoy" and "este mes" answers go stale at midnight whatever the data
+    raw = '\x00'.join([normalize_message(message), model, date.today().isoformat()])
+    return RESPONSE_CACHE_PREFIX + hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def get_response(key: str):
+    """The cached 'done' data under this key, if the domains it read are unchanged; else None."""
+    entry = cache.get(key)
+    if entry is None:
+        return None
+    if data_versions.get_versions(entry['versions']) != entry['versions']:
+        return None
+    return entry['result']
+
+
+def save_response(key: str, versions: dict, domains, result: dict):
+    """
+    Cache a 'done' result with the versions of the domains it read, as they
+    were before the request ran: a write meanwhile leaves the entry stale at once.
+    """
+    cache.set(
+        key,
+        {'versions': {domain: versions[domain] for domain in domains}, 'result': result},
+        settings.CHAT_RESPONSE_CACHE_TTL
+    )
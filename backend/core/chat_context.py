@@ -0,0 +1,156 @@
+"""
+LifeOS Chat Context
+Fits a conversation into a token budget. Tokens are estimated locally, the
+newest messages are kept verbatim until the budget is spent, and the older
+ones are folded into a rolling summary. Summaries are cached by the messages
+they cover, so a request only summarizes what left the window since the last.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from services.tool_pages import CHARS_PER_TOKEN, estimate_tokens
+
+
+# Role and formatting tokens the providers add around every message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_CACHE_PREFIX = 'chat-summary:'
+
+SUMMARY_PROMPT = """Resume la conversación entre el usuario y LifeOS AI en español, en un solo párrafo breve.
+Conserva los hechos, decisiones, preferencias, fechas, cantidades e IDs mencionados; omite saludos y cortesías.
+Si hay un resumen previo, intégralo con los mensajes nuevos en un único resumen."""
+
+
+# ==================== TOKENS ====================
+
+def message_tokens(message: dict) -> int:
+    content = message.get('content') or ''
+    if not isinstance(content, str):
+        content = json.dumps(content, ensure_ascii=False, default=str)
+    if message.get('tool_calls'):
+        content += json.dumps(message['tool_calls'], ensure_ascii=False)
+    return estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+
+
+def truncate_text(text: str, max_tokens: int) -> str:
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    return f"{text[:max_chars]}\n[... texto truncado, {len(text) - max_chars} caracteres omitidos]"
+
+
+def truncate_tool_result(result) -> str:
+    """
+    Serialize a tool result for the model within CHAT_TOOL_RESULT_MAX_TOKENS.
+    Lists keep as many leading items as fit and say how many were left out.
+    """
+    max_tokens = settings.CHAT_TOOL_RESULT_MAX_TOKENS
+    content = json.dumps(result, ensure_ascii=False, cls=DjangoJSONEncoder)
+    if estimate_tokens(content) <= max_tokens or not isinstance(result, list):
+        return truncate_text(content, max_tokens)
+
+    kept = []
+    used = 1
+    for item in result:
+        item_tokens = estimate_tokens(json.dumps(item, ensure_ascii=False, cls=DjangoJSONEncoder)) + 1
+        if used + item_tokens > max_tokens:
+            break
+        kept.append(item)
+        used += item_tokens
+    content = json.dumps(kept, ensure_ascii=False, cls=DjangoJSONEncoder)
+    return f"{content}\n[... {len(result) - len(kept)} de {len(result)} elementos omitidos por tamaño]"
+
+
+# ==================== HISTORY ====================
+
+def client_history(conversation_history: list) -> list:
+    """The user and assistant text messages of a history sent by the client (no tool turns are trusted)."""
+    return [
+        {'role': msg['role'], 'content': msg['content']}
+        for msg in conversation_history
+        if msg.get('role') in ['user', 'assistant'] and msg.get('content')
+    ]
+
+
+def split_history(messages: list):
+    """
+    Split a conversation into (older, recent): recent is the newest
+    messages that fit CHAT_HISTORY_TOKEN_BUDGET, starting with a user message
+    (so a tool turn is never cut in half); older is everything before it, to
+    be summarized. The last message (the one being answered) is always kept.
+    """
+    budget = settings.CHAT_HISTORY_TOKEN_BUDGET
+    start = len(messages)
+    used = 0
+    while start > 0:
+        tokens = message_tokens(messages[start - 1])
+        if used + tokens > budget and start < len(messages):
+            break
+        used += tokens
+        start -= 1
+
+    # The kept window must open with a user turn (Anthropic requires it)
+    while start < len(messages) - 1 and messages[start]['role'] != 'user':
+        start += 1
+    return messages[:start], messages[start:]
+
+
+def _prefix_keys(messages: list) -> list:
+    """Cache key of every prefix of the message list: keys[n] covers messages[:n]."""
+    digest = hashlib.sha256()
+    keys = [None]
+    for msg in messages:
+        digest.update(json.dumps([msg['role'], msg['content']], ensure_ascii=False).encode('utf-8'))
+        keys.append(SUMMARY_CACHE_PREFIX + digest.hexdigest())
+    return keys
+
+
+class RollingSummary:
+    """
+    The summary of the older messages of a conversation.
+    Starts from the cached summary of the longest already summarized prefix;
+    `pending` holds the messages still to fold in. When there are any, the
+    caller sends prompt() to the model and passes the answer to save().
+    """
+
+    def __init__(self, older: list):
+        self.keys = _prefix_keys(older)
+        cached = cache.get_many(self.keys[1:]) if older else {}
+        covered = next((n for n in range(len(older), 0, -1) if self.keys[n] in cached), 0)
+        self.summary = cached[self.keys[covered]] if covered else None
+        self.pending = older[covered:]
+
+    def prompt(self) -> list:
+        """System and user messages asking the model to fold the pending messages into the summary."""
+        # Only the newest pending messages that fit the budget are read; a long
+        # backlog the first time a conversation is summarized loses its oldest part
+        lines = []
+        budget = settings.CHAT_HISTORY_TOKEN_BUDGET
+        for msg in reversed(self.pending):
+            if not msg.get('content'):
+                continue  # An assistant turn that only called tools: its results follow
+            role = {'user': 'Usuario', 'tool': 'Resultado de herramienta'}.get(msg['role'], 'Asistente')
+            line = f"{role}: {truncate_text(msg['content'], settings.CHAT_TOOL_RESULT_MAX_TOKENS)}"
+            budget -= estimate_tokens(line)
+            if budget < 0 and lines:
+                break
+            lines.append(line)
+
+        parts = []
+        if self.summary:
+            parts.append(f"Resumen previo:\n{self.summary}")
+        parts.append("Mensajes nuevos:\n" + '\n'.join(reversed(lines)))
+        return [
+            {'role': 'system', 'content': SUMMARY_PROMPT},
+            {'role': 'user', 'content': '\n\n'.join(parts)},
+        ]
+
+    def save(self, summary: str):
+        summary = truncate_text(summary.strip(), settings.CHAT_SUMMARY_MAX_TOKENS)
+        cache.set(self.keys[-1], summary, settings.CHAT_SUMMARY_CACHE_TTL)
+        self.summary = summary
+        self.pending = []
@@ -0,0 +1,157 @@
+"""
+LifeOS Chat Tracing
+Per-request phase timing of the chat pipeline: one span for the context
+build, each LLM call (with its token counts), each tool execution (with its
+SQL query count and time) and the session save. A finished trace is logged
+as one JSON line on the 'lifeos.chat' logger, summarized in the
+Server-Timing header of non-streamed responses and kept in memory for
+/api/chat/traces/.
+"""
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+from django.conf import settings
+from django.db import connection
+from django.http import JsonResponse
+from django.views.decorators.http import require_http_methods
+
+
+logger = logging.getLogger('lifeos.chat')
+
+# Finished traces of this process, newest last
+_recent = deque(maxlen=settings.CHAT_TRACE_HISTORY)
+_recent_lock = threading.Lock()
+
+
+class QueryStats:
+    """Counts the SQL queries of the current thread's connection (a connection.execute_wrapper)."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+
+class Trace:
+    """
+    The spans of one chat request. Spans may be recorded from the tool
+    worker threads, so the list is guarded by a lock.
+    """
+
+    def __init__(self, **attrs):
+        self.id = uuid.uuid4().hex[:16]
+        self.attrs = attrs
+        self.started_at = time.time()
+        self.spans = []
+        self.duration_ms = None
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, sql: bool = False, **attrs):
+        """
+        Time a phase. Yields the span dict, where the caller can add
+        attributes (token counts) before it closes. With sql=True the
+        queries run by this thread meanwhile are counted.
+        """
+        span = {'name': name, 'start_ms': self._elapsed_ms(), **attrs}
+        stats = QueryStats() if sql else None
+        try:
+            with connection.execute_wrapper(stats) if stats else nullcontext():
+                yield span
+        except Exception as e:
+            span['error'] = str(e)
+            raise
+        finally:
+            span['duration_ms'] = round(self._elapsed_ms() - span['start_ms'], 1)
+            if stats:
+                span['sql_queries'] = stats.count
+                span['sql_ms'] = round(stats.seconds * 1000, 1)
+            with self._lock:
+                self.spans.append(span)
+
+    def _elapsed_ms(self) -> float:
+        return round((time.perf_counter() - self._start) * 1000, 1)
+
+    def finish(self, **attrs) -> dict:
+        """Close the trace (once): log it and keep it among the recent traces."""
+        if self.duration_ms is not None:
+            return self.as_dict()
+        self.duration_ms = self._elapsed_ms()
+        self.attrs.update(attrs)
+        trace = self.as_dict()
+        logger.info(json.dumps(trace, ensure_ascii=False, default=str))
+        with _recent_lock:
+            _recent.append(trace)
+        return trace
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span['start_ms'])
+        return {
+            'trace_id': self.id,
+            'started_at': self.started_at,
+            'duration_ms': self.duration_ms,
+            **self.attrs,
+            'spans': spans,
+        }
+
+    def server_timing(self) -> str:
+        """Server-Timing header value: total time per phase (how many spans in desc), then the whole request."""
+        totals = {}
+        with self._lock:
+            for span in self.spans:
+                duration, count = totals.get(span['name'], (0.0, 0))
+                totals[span['name']] = (duration + span['duration_ms'], count + 1)
+        metrics = [f'{name};dur={duration:.1f};desc="{count}"' for name, (duration, count) in totals.items()]
+        metrics.append(f'total;dur={self.duration_ms if self.duration_ms is not None else self._elapsed_ms():.1f}')
+        return ', '.join(metrics)
+
+
+def span(trace, name: str, sql: bool = False, **attrs):
+    """trace.span(), or a no-op when the caller runs without a trace."""
+    if trace is None:
+        return nullcontext({})
+    return trace.span(name, sql=sql, **attrs)
+
+
+def get_recent_traces(limit: int = None) -> list:
+    with _recent_lock:
+        traces = list(_recent)
+    traces.reverse()
+    return traces[:limit] if limit else traces
+
+
+@require_http_methods(["GET"])
+def chat_traces(request):
+    """
+    Recent chat traces of this server process, newest first (DEBUG only).
+    ?trace_id= returns one trace (its id is in the X-Trace-Id response header), ?limit= caps the list.
+    """
+    if not settings.DEBUG:
+        return JsonResponse({'error': 'Not found'}, status=404)
+
+    trace_id = request.GET.get('trace_id')
+    if trace_id:
+        trace = next((t for t in get_recent_traces() if t['trace_id'] == trace_id), None)
+        if trace is None:
+            return JsonResponse({'error': 'Trace not found'}, status=404)
+        return JsonResponse(trace)
+
+    try:
+        limit = int(request.GET.get('limit', 0)) or None
+    except ValueError:
+        return JsonResponse({'error': 'limit must be an integer'}, status=400)
+    return JsonResponse({'traces': get_recent_traces(limit)})
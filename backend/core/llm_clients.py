@@ -0,0 +1,157 @@
+"""
+LLM Client Pool
+Provider clients are expensive to build: each owns an httpx connection pool,
+and a fresh one pays DNS, TCP and TLS setup on its first request. Clients are
+therefore kept in an LRU keyed by (provider, hash of the API key, sync/async)
+and reused across requests, with keep-alive connections, a size limit and
+idle eviction.
+"""
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import httpx
+from django.conf import settings
+
+from core import local_llm
+
+# Provider SDKs are imported once, at startup. Each one is optional: a
+# missing package only disables its providers.
+try:
+    import groq
+except ImportError:
+    groq = None
+
+try:
+    import openai
+except ImportError:
+    openai = None
+
+try:
+    import anthropic
+except ImportError:
+    anthropic = None
+
+
+# provider -> (client type, base_url)
+PROVIDERS = {
+    'groq': ('groq', None),
+    'openai': ('openai', None),
+    'anthropic': ('anthropic', None),
+    'together': ('openai', 'https://api.together.xyz/v1'),
+    'openrouter': ('openai', 'https://openrouter.ai/api/v1'),
+    # Scripted offline stand-ins for load tests (core/local_llm.py)
+    'local': ('openai', None),
+    'local-anthropic': ('anthropic', None),
+}
+LOCAL_PROVIDERS = {'local', 'local-anthropic'}
+DEFAULT_PROVIDER = 'groq'
+
+# client type -> (SDK module, sync client class, async client class)
+SDKS = {
+    'groq': (groq, 'Groq', 'AsyncGroq'),
+    'openai': (openai, 'OpenAI', 'AsyncOpenAI'),
+    'anthropic': (anthropic, 'Anthropic', 'AsyncAnthropic'),
+}
+
+_clients = OrderedDict()  # key -> [client, client_type, last_used]
+_lock = threading.Lock()
+
+
+def _http_client(sdk, use_async: bool, timeout: float):
+    """
+    The connection pool of one provider client, built with the SDK's own
+    httpx client class (each SDK pins its httpx) and our limits.
+    """
+    client_class = sdk.DefaultAsyncHttpxClient if use_async else sdk.DefaultHttpxClient
+    return client_class(
+        limits=httpx.Limits(
+            max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=timeout,
+    )
+
+
+def _create_client(provider: str, api_key: str, use_async: bool):
+    client_type, base_url = PROVIDERS.get(provider, PROVIDERS[DEFAULT_PROVIDER])
+    if provider in LOCAL_PROVIDERS:
+        return local_llm.create_client(client_type, use_async), client_type
+
+    sdk, sync_class, async_class = SDKS[client_type]
+    if sdk is None:
+        raise RuntimeError(f"El SDK de {client_type} no está instalado en el servidor")
+
+    timeout = settings.LLM_PROVIDER_TIMEOUTS.get(provider, settings.LLM_HTTP_TIMEOUT)
+    # Retries are left to core/llm_router.py, which can also fail over to another provider
+    options = {
+        'api_key': api_key,
+        'http_client': _http_client(sdk, use_async, timeout),
+        'timeout': timeout,
+        'max_retries': 0,
+    }
+    if base_url:
+        options['base_url'] = base_url
+    return getattr(sdk, async_class if use_async else sync_class)(**options), client_type
+
+
+def _close(client):
+    """Release a client's connections. Async clients are closed on the running loop, if any."""
+    try:
+        result = client.close()
+        if asyncio.iscoroutine(result):
+            try:
+                asyncio.get_running_loop().create_task(result)
+            except RuntimeError:
+                result.close()  # No loop here: let the connections be collected
+    except Exception:
+        pass
+
+
+def _evict_idle(now: float) -> list:
+    """Drop clients unused for LLM_CLIENT_IDLE_TIMEOUT seconds (oldest first, so stop at the first fresh one)."""
+    evicted = []
+    while _clients:
+        key, entry = next(iter(_clients.items()))
+        if now - entry[2] < settings.LLM_CLIENT_IDLE_TIMEOUT:
+            break
+        evicted.append(_clients.pop(key)[0])
+    return evicted
+
+
+def get_client(provider: str, api_key: str, use_async: bool = False):
+    """
+    Return (client, client_type) for a provider, reusing a pooled client for
+    the same API key. client_type is 'groq', 'openai' or 'anthropic'.
+    """
+    key_hash = hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+    key = (provider if provider in PROVIDERS else DEFAULT_PROVIDER, key_hash, use_async)
+    now = time.monotonic()
+
+    with _lock:
+        evicted = _evict_idle(now)
+        entry = _clients.get(key)
+        if entry is not None:
+            entry[2] = now
+            _clients.move_to_end(key)
+        else:
+            client, client_type = _create_client(provider, api_key, use_async)
+            entry = _clients[key] = [client, client_type, now]
+            while len(_clients) > settings.LLM_CLIENT_CACHE_SIZE:
+                evicted.append(_clients.popitem(last=False)[1][0])
+
+    for client in evicted:
+        _close(client)
+    return entry[0], entry[1]
+
+
+def clear_clients():
+    """Close and forget every pooled client."""
+    with _lock:
+        clients = [entry[0] for entry in _clients.values()]
+        _clients.clear()
+    for client in clients:
+        _close(client)
@@ -0,0 +1,229 @@
+"""
+LLM Rate Limiter
+Keeps the model calls made with one API key within the provider's limits,
+so a burst of chats queues here instead of failing with 429s. Each
+(provider, API key) has a token bucket (requests per minute, with a burst),
+a cap on calls in flight and a bounded wait queue; calls that would wait
+too long are rejected at once with a Retry-After. A 429 from the provider
+drains the bucket, and its Retry-After holds every call of that key until then.
+"""
+import asyncio
+import hashlib
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from email.utils import parsedate_to_datetime
+
+from django.conf import settings
+
+
+# Seconds between checks of an async waiter for a free slot
+ASYNC_POLL_INTERVAL = 0.05
+
+# Limiters kept before idle ones are dropped
+MAX_LIMITERS = 256
+
+_limiters = {}  # (provider, key hash) -> KeyLimiter
+_lock = threading.Lock()
+
+
+class RateLimited(Exception):
+    """A call rejected locally: the key's queue is full or the wait would be too long."""
+
+    status_code = 429
+
+    def __init__(self, provider: str, retry_after: float):
+        self.provider = provider
+        self.retry_after = retry_after
+        super().__init__(f"Demasiadas peticiones a {provider}: inténtalo de nuevo en {max(1, round(retry_after))} s")
+
+
+# ==================== RETRY-AFTER ====================
+
+def retry_after(error: Exception):
+    """
+    Seconds the provider asked to wait before the next call (retry-after-ms or
+    retry-after header, in seconds or as an HTTP date), capped at
+    LLM_RETRY_AFTER_MAX; None when the error does not say.
+    """
+    if isinstance(error, RateLimited):
+        return error.retry_after
+    headers = getattr(getattr(error, 'response', None), 'headers', None)
+    if not headers:
+        return None
+
+    seconds = None
+    try:
+        if headers.get('retry-after-ms'):
+            seconds = float(headers['retry-after-ms']) / 1000
+        elif headers.get('retry-after'):
+            value = headers['retry-after']
+            try:
+                seconds = float(value)
+            except ValueError:
+                seconds = parsedate_to_datetime(value).timestamp() - time.time()
+    except (TypeError, ValueError):
+        return None
+    if seconds is None:
+        return None
+    return min(max(seconds, 0.0), settings.LLM_RETRY_AFTER_MAX)
+
+
+# ==================== LIMITERS ====================
+
+class KeyLimiter:
+    """
+    The limits of one (provider, API key): a token bucket of `rpm` requests
+    per minute holding up to `burst`, at most `concurrency` calls in flight
+    and at most LLM_LIMIT_QUEUE_SIZE callers waiting. rpm None means no rate limit.
+    """
+
+    def __init__(self, provider: str, rpm: float = None, burst: int = None, concurrency: int = None):
+        self.provider = provider
+        self.rate = rpm / 60 if rpm else None  # Tokens per second
+        self.capacity = burst or concurrency or 1
+        self.concurrency = concurrency
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.active = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+
+    def _refill(self, now: float):
+        if self.rate:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _try_acquire(self, now: float):
+        """Take a slot: 0.0 when taken, else seconds until a token is due (None while all slots are busy)."""
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.concurrency and self.active >= self.concurrency:
+            return None
+        self._refill(now)
+        if self.rate and self.tokens < 1:
+            return (1 - self.tokens) / self.rate
+        if self.rate:
+            self.tokens -= 1
+        self.active += 1
+        return 0.0
+
+    def _enqueue(self):
+        if self.waiting >= settings.LLM_LIMIT_QUEUE_SIZE:
+            raise RateLimited(self.provider, self._expected_wait())
+        self.waiting += 1
+
+    def _expected_wait(self) -> float:
+        """Rough wait for a new caller: the block, or the queue ahead drained at the key's rate."""
+        now = time.monotonic()
+        wait = max(0.0, self.blocked_until - now)
+        if self.rate:
+            wait += (self.waiting + 1) / self.rate
+        return max(wait, settings.LLM_RETRY_BACKOFF)
+
+    def acquire(self):
+        """Wait for a slot, up to LLM_LIMIT_QUEUE_TIMEOUT seconds. Raises RateLimited."""
+        deadline = time.monotonic() + settings.LLM_LIMIT_QUEUE_TIMEOUT
+        with self._cond:
+            self._enqueue()
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = self._try_acquire(now)
+                    if wait == 0.0:
+                        return
+                    if now >= deadline or (wait is not None and now + wait > deadline):
+                        raise RateLimited(self.provider, self._expected_wait())
+                    self._cond.wait(min(wait, deadline - now) if wait is not None else deadline - now)
+            finally:
+                self.waiting -= 1
+
+    async def acquire_async(self):
+        """Async counterpart of acquire: waits on the event loop, never on the lock."""
+        deadline = time.monotonic() + settings.LLM_LIMIT_QUEUE_TIMEOUT
+        with self._cond:
+            self._enqueue()
+        try:
+            while True:
+                now = time.monotonic()
+                with self._cond:
+                    wait = self._try_acquire(now)
+                    if wait == 0.0:
+                        return
+                    if now >= deadline or (wait is not None and now + wait > deadline):
+                        raise RateLimited(self.provider, self._expected_wait())
+                await asyncio.sleep(min(wait, deadline - now) if wait is not None else ASYNC_POLL_INTERVAL)
+        finally:
+            with self._cond:
+                self.waiting -= 1
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    def throttle(self, seconds: float = None):
+        """The provider answered 429: drain the bucket, and hold every call for `seconds` if it said so."""
+        with self._cond:
+            self.tokens = 0.0
+            self.updated = time.monotonic()
+            if seconds:
+                self.blocked_until = max(self.blocked_until, self.updated + seconds)
+
+    @property
+    def idle(self) -> bool:
+        return not self.active and not self.waiting
+
+
+def get_limiter(provider: str, api_key: str) -> KeyLimiter:
+    """The limiter of a (provider, API key), with the provider's LLM_RATE_LIMITS."""
+    key = (provider, hashlib.sha256((api_key or '').encode('utf-8')).hexdigest())
+    with _lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            if len(_limiters) >= MAX_LIMITERS:
+                for stale in [k for k, entry in _limiters.items() if entry.idle]:
+                    del _limiters[stale]
+            limits = settings.LLM_RATE_LIMITS.get(provider, settings.LLM_RATE_LIMIT_DEFAULT)
+            limiter = _limiters[key] = KeyLimiter(provider, **(limits or {}))
+        return limiter
+
+
+@contextmanager
+def slot(route):
+    """Hold one call slot of a route's (provider, API key) for the duration of the block."""
+    limiter = get_limiter(route.provider, route.api_key)
+    limiter.acquire()
+    try:
+        yield
+    finally:
+        limiter.release()
+
+
+@asynccontextmanager
+async def slot_async(route):
+    limiter = get_limiter(route.provider, route.api_key)
+    await limiter.acquire_async()
+    try:
+        yield
+    finally:
+        limiter.release()
+
+
+def record_error(route, error: Exception):
+    """Throttle a route's key when the provider rejected a call as rate limited."""
+    if getattr(error, 'status_code', None) == 429 and not isinstance(error, RateLimited):
+        get_limiter(route.provider, route.api_key).throttle(retry_after(error))
+
+
+def get_stats() -> dict:
+    """Calls in flight and waiting per provider, for debugging."""
+    with _lock:
+        limiters = list(_limiters.values())
+    stats = {}
+    for limiter in limiters:
+        entry = stats.setdefault(limiter.provider, {'active': 0, 'waiting': 0})
+        entry['active'] += limiter.active
+        entry['waiting'] += limiter.waiting
+    return stats
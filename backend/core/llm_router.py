@@ -0,0 +1,324 @@
+"""
+LLM Router
+Routes a model call over the providers configured for a request: the one the
+user selected first, then fallbacks running an equivalent model. A call is
+retried with exponential backoff on timeouts, rate limits and server errors
+and then fails over to the next provider. Non-streamed calls are also
+hedged: when the first provider has not answered within its observed p95
+latency, the next one is asked too and the first answer wins.
+Providers that keep failing are skipped for a cool-down period. Every
+attempt first takes a call slot of its (provider, API key) from
+core/llm_limiter.py; a key whose queue is full fails over at once.
+"""
+import asyncio
+import random
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from django.conf import settings
+
+from core import llm_clients, llm_limiter
+
+
+Route = namedtuple('Route', ['provider', 'api_key', 'model'])
+
+# Hedged and retried calls run here, so the request thread can wait on the first answer
+_executor = ThreadPoolExecutor(max_workers=settings.LLM_ROUTER_WORKERS, thread_name_prefix='llm-route')
+
+_latencies = {}  # (provider, model) -> deque of recent call durations in seconds
+_health = {}  # provider -> [consecutive failures, unhealthy until (monotonic)]
+_lock = threading.Lock()
+
+
+# ==================== ROUTES ====================
+
+def get_routes(provider: str, api_key: str, model: str, fallbacks: list = None) -> list:
+    """
+    The routes of a request: the selected provider, the request's own
+    fallbacks ([{provider, api_key, model}]) and then LLM_FALLBACKS.
+    Entries without a key or model, or repeating a provider and key, are skipped.
+    """
+    routes = [Route(provider, api_key, model)]
+    for entry in [*(fallbacks or []), *settings.LLM_FALLBACKS]:
+        route = Route(entry.get('provider'), entry.get('api_key'), entry.get('model'))
+        if not (route.provider and route.api_key and route.model):
+            continue
+        if any((r.provider, r.api_key) == (route.provider, route.api_key) for r in routes):
+            continue
+        routes.append(route)
+    return routes
+
+
+def is_retryable(error: Exception) -> bool:
+    """Timeouts, dropped connections, rate limits (429) and server errors (5xx) are worth another try."""
+    status = getattr(error, 'status_code', None)
+    if status is not None:
+        return status in (408, 409, 429) or status >= 500
+    return any('Timeout' in cls.__name__ or 'Connection' in cls.__name__ for cls in type(error).__mro__)
+
+
+def backoff_delay(attempt: int) -> float:
+    """Seconds to wait before retry number `attempt` (1-based): exponential, with jitter."""
+    return settings.LLM_RETRY_BACKOFF * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+
+
+# ==================== HEALTH AND LATENCY ====================
+
+def _record_success(route: Route, seconds: float):
+    with _lock:
+        window = _latencies.setdefault((route.provider, route.model), deque(maxlen=settings.LLM_LATENCY_WINDOW))
+        window.append(seconds)
+        _health.pop(route.provider, None)
+
+
+def _record_failure(route: Route):
+    with _lock:
+        health = _health.setdefault(route.provider, [0, 0.0])
+        health[0] += 1
+        if health[0] >= settings.LLM_UNHEALTHY_AFTER:
+            health[1] = time.monotonic() + settings.LLM_UNHEALTHY_COOLDOWN
+
+
+def is_healthy(provider: str) -> bool:
+    with _lock:
+        health = _health.get(provider)
+    return health is None or health[1] <= time.monotonic()
+
+
+def hedge_delay(route: Route) -> float:
+    """
+    Seconds to wait for a route before hedging: its p95 latency over the
+    recent window, or LLM_HEDGE_DEFAULT_DELAY until there are enough samples.
+    """
+    with _lock:
+        samples = sorted(_latencies.get((route.provider, route.model), ()))
+    if len(samples) < settings.LLM_HEDGE_MIN_SAMPLES:
+        return settings.LLM_HEDGE_DEFAULT_DELAY
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    return max(settings.LLM_HEDGE_MIN_DELAY, p95)
+
+
+def get_stats() -> dict:
+    """Per-provider p95 latency and health, for debugging."""
+    with _lock:
+        latencies = {key: sorted(window) for key, window in _latencies.items()}
+        health = {provider: list(entry) for provider, entry in _health.items()}
+    return {
+        'latency_p95': {
+            f'{provider}/{model}': samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+            for (provider, model), samples in latencies.items() if samples
+        },
+        'unhealthy': [provider for provider in health if not is_healthy(provider)],
+    }
+
+
+# ==================== ROUTER ====================
+
+class Router:
+    """
+    The routes of one chat request. fn(client, client_type, model) is the
+    model call; clients come from the pool of llm_clients, whose per-provider
+    timeout bounds each attempt.
+    """
+
+    def __init__(self, routes: list, use_async: bool = False):
+        self.routes = routes
+        self.use_async = use_async
+
+    @property
+    def primary(self) -> Route:
+        return self.routes[0]
+
+    def ordered_routes(self) -> list:
+        """Healthy routes first, keeping the configured order."""
+        healthy = [route for route in self.routes if is_healthy(route.provider)]
+        return healthy + [route for route in self.routes if route not in healthy]
+
+    def client(self, route: Route):
+        return llm_clients.get_client(route.provider, route.api_key, use_async=self.use_async)
+
+    def _attempt(self, route: Route, fn, delay: float):
+        if delay:
+            time.sleep(delay)
+        with llm_limiter.slot(route):
+            client, client_type = self.client(route)
+            start = time.monotonic()
+            result = fn(client, client_type, route.model)
+        return result, time.monotonic() - start
+
+    def _failed(self, route: Route, error: Exception) -> bool:
+        """
+        Record a failed attempt. Returns whether the route may be retried:
+        a call rejected by our own limiter is not, it fails over instead.
+        """
+        if isinstance(error, llm_limiter.RateLimited):
+            return False
+        _record_failure(route)
+        llm_limiter.record_error(route, error)
+        return is_retryable(error)
+
+    def call(self, fn):
+        """
+        Run a non-streamed call with retries, failover and hedging.
+        Returns (route, result) of the first successful attempt; losing
+        attempts run to completion in the background and are discarded.
+        """
+        routes = self.ordered_routes()
+        next_route = 1
+        running = {}  # future -> (route, attempt)
+        last_error = None
+
+        def submit(route, attempt=0):
+            delay = backoff_delay(attempt) if attempt else 0.0
+            running[_executor.submit(self._attempt, route, fn, delay)] = (route, attempt)
+            return time.monotonic() + delay + hedge_delay(route)
+
+        hedge_at = submit(routes[0])
+        while running:
+            timeout = max(0.0, hedge_at - time.monotonic()) if next_route < len(routes) else None
+            done, _ = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                # Still no answer at the deadline: ask the next provider too
+                hedge_at = submit(routes[next_route])
+                next_route += 1
+                continue
+
+            for future in done:
+                route, attempt = running.pop(future)
+                try:
+                    result, seconds = future.result()
+                except Exception as e:
+                    last_error = e
+                    if self._failed(route, e) and attempt < settings.LLM_RETRIES:
+                        hedge_at = submit(route, attempt + 1)
+                    elif is_retryable(e) and not running and next_route < len(routes):
+                        hedge_at = submit(routes[next_route])
+                        next_route += 1
+                    continue
+                _record_success(route, seconds)
+                return route, result
+        raise last_error
+
+    def _stream_attempt(self, route: Route, fn):
+        """fn's stream on a route, holding a call slot of its key until the stream ends."""
+        with llm_limiter.slot(route):
+            client, client_type = self.client(route)
+            return (yield from fn(client, client_type, route.model))
+
+    def stream(self, fn):
+        """
+        Run a streamed call: fn returns a generator of events. Streams are not
+        hedged, but a failure before the first event is retried and fails over.
+        A generator returning (route, the stream's return value).
+        """
+        last_error = None
+        for route in self.ordered_routes():
+            for attempt in range(settings.LLM_RETRIES + 1):
+                if attempt:
+                    time.sleep(backoff_delay(attempt))
+                start = time.monotonic()
+                events = self._stream_attempt(route, fn)
+                emitted = False
+                try:
+                    while True:
+                        event = next(events)
+                        emitted = True
+                        yield event
+                except StopIteration as finished:
+                    _record_success(route, time.monotonic() - start)
+                    return route, finished.value
+                except Exception as e:
+                    retryable = self._failed(route, e)
+                    if emitted or not is_retryable(e):
+                        raise
+                    last_error = e
+                    if not retryable:
+                        break
+        raise last_error
+
+    async def _attempt_async(self, route: Route, fn, delay: float):
+        if delay:
+            await asyncio.sleep(delay)
+        async with llm_limiter.slot_async(route):
+            client, client_type = self.client(route)
+            start = time.monotonic()
+            result = await fn(client, client_type, route.model)
+        return result, time.monotonic() - start
+
+    async def _stream_attempt_async(self, route: Route, fn):
+        async with llm_limiter.slot_async(route):
+            client, client_type = self.client(route)
+            async for event in fn(client, client_type, route.model):
+                yield event
+
+    async def call_async(self, fn):
+        """Async counterpart of call: fn returns a coroutine. Losing attempts are cancelled."""
+        routes = self.ordered_routes()
+        next_route = 1
+        running = {}  # task -> (route, attempt)
+        last_error = None
+
+        def submit(route, attempt=0):
+            delay = backoff_delay(attempt) if attempt else 0.0
+            running[asyncio.ensure_future(self._attempt_async(route, fn, delay))] = (route, attempt)
+            return time.monotonic() + delay + hedge_delay(route)
+
+        hedge_at = submit(routes[0])
+        try:
+            while running:
+                timeout = max(0.0, hedge_at - time.monotonic()) if next_route < len(routes) else None
+                done, _ = await asyncio.wait(list(running), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedge_at = submit(routes[next_route])
+                    next_route += 1
+                    continue
+
+                for task in done:
+                    route, attempt = running.pop(task)
+                    try:
+                        result, seconds = task.result()
+                    except Exception as e:
+                        last_error = e
+                        if self._failed(route, e) and attempt < settings.LLM_RETRIES:
+                            hedge_at = submit(route, attempt + 1)
+                        elif is_retryable(e) and not running and next_route < len(routes):
+                            hedge_at = submit(routes[next_route])
+                            next_route += 1
+                        continue
+                    _record_success(route, seconds)
+                    return route, result
+            raise last_error
+        finally:
+            for task in running:
+                task.cancel()
+
+    async def stream_async(self, fn):
+        """
+        Async counterpart of stream: fn returns an async generator of events.
+        Yields its events, then ('route', route) once the stream has finished.
+        """
+        last_error = None
+        for route in self.ordered_routes():
+            for attempt in range(settings.LLM_RETRIES + 1):
+                if attempt:
+                    await asyncio.sleep(backoff_delay(attempt))
+                start = time.monotonic()
+                emitted = False
+                try:
+                    async for event in self._stream_attempt_async(route, fn):
+                        emitted = True
+                        yield event
+                except Exception as e:
+                    retryable = self._failed(route, e)
+                    if emitted or not is_retryable(e):
+                        raise
+                    last_error = e
+                    if not retryable:
+                        break
+                    continue
+                _record_success(route, time.monotonic() - start)
+                yield 'route', route
+                return
+        raise last_error
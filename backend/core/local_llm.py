@@ -0,0 +1,381 @@
+"""
+Local LLM Stand-in
+A deterministic provider for load testing and profiling the chat loop
+offline: no network, no API costs, no provider noise. It speaks the client
+interfaces the chat code calls (OpenAI-compatible chat completions,
+Anthropic messages and Gemini generate_content, sync and async, streamed or
+not) and answers from scripts: the last user message picks a script by
+regex, and the number of assistant turns since that message picks the step,
+so a script plays a whole tool-calling sequence and concurrent
+conversations never share state.
+
+Providers 'local' (OpenAI format) and 'local-anthropic' in core/llm_clients.py;
+mcp_server/chat_client.py uses LocalGemini when LIFEOS_LOCAL_LLM is set.
+"""
+import asyncio
+import json
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+from django.conf import settings
+
+from services.tool_pages import estimate_tokens
+
+
+# Answer to calls without tools (the conversation summary)
+SUMMARY_TEXT = "Resumen local: el usuario conversó con LifeOS AI sobre sus datos."
+
+# Answer once a script has no steps left
+FINAL_TEXT = "Listo."
+
+_scripts = None
+_scripts_lock = threading.Lock()
+
+
+# ==================== SCRIPTS ====================
+
+def get_scripts() -> list:
+    """LOCAL_LLM_SCRIPTS, or the JSON file LOCAL_LLM_SCRIPT_FILE when set, with compiled patterns."""
+    global _scripts
+    with _scripts_lock:
+        if _scripts is None:
+            scripts = settings.LOCAL_LLM_SCRIPTS
+            if settings.LOCAL_LLM_SCRIPT_FILE:
+                with open(settings.LOCAL_LLM_SCRIPT_FILE, encoding='utf-8') as f:
+                    scripts = json.load(f)
+            _scripts = [(re.compile(script.get('match') or '', re.IGNORECASE), script['turns']) for script in scripts]
+        return _scripts
+
+
+def reset_scripts():
+    """Forget the loaded scripts (after changing the settings or the file)."""
+    global _scripts
+    with _scripts_lock:
+        _scripts = None
+
+
+def next_step(user_text: str, position: int, with_tools: bool = True) -> dict:
+    """
+    The script step answering a conversation: {'content': text} or
+    {'tool_calls': [{'name', 'arguments'}]}, optionally with 'latency',
+    plus its 'position' (tool call ids are built from it).
+    """
+    if not with_tools:
+        return {'content': SUMMARY_TEXT, 'position': position}
+    turns = next((turns for pattern, turns in get_scripts() if pattern.search(user_text)), [])
+    step = turns[position] if position < len(turns) else {'content': FINAL_TEXT}
+    return {**step, 'position': position}
+
+
+def script_position(messages: list, role_of, is_user_text, assistant_role: str):
+    """(text of the last user text message, assistant turns after it) of a conversation in any format."""
+    user_text = ''
+    position = 0
+    for message in messages:
+        if role_of(message) == assistant_role:
+            position += 1
+        elif is_user_text(message):
+            user_text = is_user_text(message)
+            position = 0
+    return user_text, position
+
+
+def _text_of(content) -> str:
+    """Text of a message content: a string, or the text blocks/parts of a list."""
+    if isinstance(content, str):
+        return content
+    texts = []
+    for block in content or []:
+        text = block.get('text') if isinstance(block, dict) else getattr(block, 'text', None)
+        if text:
+            texts.append(text)
+    return ' '.join(texts)
+
+
+def _latency(step: dict) -> float:
+    return step.get('latency', settings.LOCAL_LLM_LATENCY)
+
+
+def _chunks(text: str) -> list:
+    """Split an answer into word-sized stream chunks."""
+    return re.findall(r'\S+\s*', text) or ['']
+
+
+def _usage(request, output) -> tuple:
+    """Deterministic (input, output) token counts."""
+    return (
+        estimate_tokens(json.dumps(request, ensure_ascii=False, default=str)),
+        estimate_tokens(json.dumps(output, ensure_ascii=False, default=str)),
+    )
+
+
+# ==================== OPENAI FORMAT ====================
+
+def _openai_step(messages: list, tools) -> dict:
+    user_text, position = script_position(
+        messages,
+        lambda m: m.get('role'),
+        lambda m: m.get('role') == 'user' and _text_of(m.get('content')),
+        'assistant'
+    )
+    return next_step(user_text, position, bool(tools))
+
+
+def _openai_tool_calls(step: dict) -> list:
+    return [
+        SimpleNamespace(
+            index=index,
+            id=f"local_call_{step['position']}_{index}",
+            type='function',
+            function=SimpleNamespace(name=call['name'], arguments=json.dumps(call.get('arguments', {}), ensure_ascii=False))
+        )
+        for index, call in enumerate(step.get('tool_calls', []))
+    ]
+
+
+def _openai_usage(messages, step) -> SimpleNamespace:
+    prompt_tokens, completion_tokens = _usage(messages, step)
+    return SimpleNamespace(
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        total_tokens=prompt_tokens + completion_tokens,
+        prompt_tokens_details=SimpleNamespace(cached_tokens=0)
+    )
+
+
+def _openai_response(messages: list, step: dict):
+    message = SimpleNamespace(role='assistant', content=step.get('content'), tool_calls=_openai_tool_calls(step) or None)
+    finish_reason = 'tool_calls' if message.tool_calls else 'stop'
+    return SimpleNamespace(
+        choices=[SimpleNamespace(index=0, message=message, finish_reason=finish_reason)],
+        usage=_openai_usage(messages, step)
+    )
+
+
+def _openai_chunks(messages: list, step: dict) -> list:
+    """Stream chunks: the text word by word, then the tool calls, then a last chunk with the usage."""
+    chunks = [
+        SimpleNamespace(choices=[SimpleNamespace(index=0, delta=SimpleNamespace(content=text, tool_calls=None))], usage=None)
+        for text in _chunks(step['content'])
+    ] if step.get('content') else []
+    tool_calls = _openai_tool_calls(step)
+    if tool_calls:
+        chunks.append(SimpleNamespace(choices=[SimpleNamespace(index=0, delta=SimpleNamespace(content=None, tool_calls=tool_calls))], usage=None))
+    chunks.append(SimpleNamespace(choices=[], usage=_openai_usage(messages, step)))
+    return chunks
+
+
+class LocalOpenAI:
+    """Stand-in for an OpenAI-compatible client: client.chat.completions.create(...)."""
+
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model: str, messages: list, tools: list = None, stream: bool = False, **kwargs):
+        step = _openai_step(messages, tools)
+        time.sleep(_latency(step))
+        if not stream:
+            return _openai_response(messages, step)
+        return self._stream(_openai_chunks(messages, step))
+
+    @staticmethod
+    def _stream(chunks):
+        for index, chunk in enumerate(chunks):
+            if index:
+                time.sleep(settings.LOCAL_LLM_TOKEN_LATENCY)
+            yield chunk
+
+    def close(self):
+        pass
+
+
+class AsyncLocalOpenAI(LocalOpenAI):
+    """Async stand-in for an OpenAI-compatible client."""
+
+    async def create(self, model: str, messages: list, tools: list = None, stream: bool = False, **kwargs):
+        step = _openai_step(messages, tools)
+        await asyncio.sleep(_latency(step))
+        if not stream:
+            return _openai_response(messages, step)
+        return self._stream_async(_openai_chunks(messages, step))
+
+    @staticmethod
+    async def _stream_async(chunks):
+        for index, chunk in enumerate(chunks):
+            if index:
+                await asyncio.sleep(settings.LOCAL_LLM_TOKEN_LATENCY)
+            yield chunk
+
+    async def close(self):
+        pass
+
+
+# ==================== ANTHROPIC FORMAT ====================
+
+def _anthropic_step(messages: list, tools) -> dict:
+    user_text, position = script_position(
+        messages,
+        lambda m: m.get('role'),
+        lambda m: m.get('role') == 'user' and _text_of(m.get('content')),
+        'assistant'
+    )
+    return next_step(user_text, position, bool(tools))
+
+
+def _anthropic_message(system, messages: list, step: dict):
+    content = [SimpleNamespace(type='text', text=step['content'])] if step.get('content') else []
+    content.extend(
+        SimpleNamespace(type='tool_use', id=f"local_toolu_{step['position']}_{index}", name=call['name'], input=call.get('arguments', {}))
+        for index, call in enumerate(step.get('tool_calls', []))
+    )
+    input_tokens, output_tokens = _usage([system, messages], step)
+    return SimpleNamespace(
+        role='assistant',
+        content=content,
+        stop_reason='tool_use' if step.get('tool_calls') else 'end_turn',
+        usage=SimpleNamespace(
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            cache_read_input_tokens=0,
+            cache_creation_input_tokens=0
+        )
+    )
+
+
+class _LocalAnthropicStream:
+    """messages.stream(...) context manager: text_stream, then get_final_message()."""
+
+    def __init__(self, message, texts: list):
+        self.message = message
+        self.texts = texts
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    @property
+    def text_stream(self):
+        for index, text in enumerate(self.texts):
+            if index:
+                time.sleep(settings.LOCAL_LLM_TOKEN_LATENCY)
+            yield text
+
+    def get_final_message(self):
+        return self.message
+
+
+class _AsyncLocalAnthropicStream(_LocalAnthropicStream):
+
+    async def __aenter__(self):
+        await asyncio.sleep(self.latency)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    @property
+    async def text_stream(self):
+        for index, text in enumerate(self.texts):
+            if index:
+                await asyncio.sleep(settings.LOCAL_LLM_TOKEN_LATENCY)
+            yield text
+
+    async def get_final_message(self):
+        return self.message
+
+
+class LocalAnthropic:
+    """Stand-in for the Anthropic client: client.messages.create(...) and client.messages.stream(...)."""
+
+    def __init__(self):
+        self.messages = SimpleNamespace(create=self.create, stream=self.stream)
+
+    def create(self, model: str, max_tokens: int, messages: list, system=None, tools: list = None, **kwargs):
+        step = _anthropic_step(messages, tools)
+        time.sleep(_latency(step))
+        return _anthropic_message(system, messages, step)
+
+    def stream(self, model: str, max_tokens: int, messages: list, system=None, tools: list = None, **kwargs):
+        step = _anthropic_step(messages, tools)
+        time.sleep(_latency(step))
+        texts = _chunks(step['content']) if step.get('content') else []
+        return _LocalAnthropicStream(_anthropic_message(system, messages, step), texts)
+
+    def close(self):
+        pass
+
+
+class AsyncLocalAnthropic(LocalAnthropic):
+    """Async stand-in for the Anthropic client."""
+
+    async def create(self, model: str, max_tokens: int, messages: list, system=None, tools: list = None, **kwargs):
+        step = _anthropic_step(messages, tools)
+        await asyncio.sleep(_latency(step))
+        return _anthropic_message(system, messages, step)
+
+    def stream(self, model: str, max_tokens: int, messages: list, system=None, tools: list = None, **kwargs):
+        # Entering the returned context manager waits for the latency, like opening the real stream
+        step = _anthropic_step(messages, tools)
+        texts = _chunks(step['content']) if step.get('content') else []
+        stream = _AsyncLocalAnthropicStream(_anthropic_message(system, messages, step), texts)
+        stream.latency = _latency(step)
+        return stream
+
+    async def close(self):
+        pass
+
+
+# ==================== GEMINI FORMAT ====================
+
+def _gemini_role(content) -> str:
+    return content.get('role') if isinstance(content, dict) else getattr(content, 'role', None)
+
+
+def _gemini_user_text(content) -> str:
+    if _gemini_role(content) != 'user':
+        return ''
+    parts = content.get('parts') if isinstance(content, dict) else getattr(content, 'parts', None)
+    return _text_of(parts)
+
+
+class LocalGemini:
+    """Stand-in for the google-genai client: client.models.generate_content(...)."""
+
+    def __init__(self):
+        self.models = SimpleNamespace(generate_content=self.generate_content)
+
+    def generate_content(self, model: str, contents: list, config=None, **kwargs):
+        user_text, position = script_position(contents, _gemini_role, _gemini_user_text, 'model')
+        step = next_step(user_text, position, bool(config and config.get('tools')))
+        time.sleep(_latency(step))
+
+        parts = [SimpleNamespace(text=step['content'], function_call=None)] if step.get('content') else []
+        parts.extend(
+            SimpleNamespace(text=None, function_call=SimpleNamespace(name=call['name'], args=call.get('arguments', {})))
+            for call in step.get('tool_calls', [])
+        )
+        prompt_tokens, output_tokens = _usage(contents, step)
+        return SimpleNamespace(
+            candidates=[SimpleNamespace(content=SimpleNamespace(role='model', parts=parts))],
+            usage_metadata=SimpleNamespace(prompt_token_count=prompt_tokens, candidates_token_count=output_tokens)
+        )
+
+
+# ==================== CLIENTS ====================
+
+CLIENT_CLASSES = {
+    'openai': (LocalOpenAI, AsyncLocalOpenAI),
+    'anthropic': (LocalAnthropic, AsyncLocalAnthropic),
+}
+
+
+def create_client(client_type: str, use_async: bool = False):
+    """A local client answering in the format of `client_type` ('openai' or 'anthropic')."""
+    if not settings.LOCAL_LLM_ENABLED:
+        raise RuntimeError("El proveedor local no está habilitado en el servidor (LOCAL_LLM_ENABLED)")
+    sync_class, async_class = CLIENT_CLASSES[client_type]
+    return async_class() if use_async else sync_class()
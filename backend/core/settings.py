@@ -43,6 +43,9 @@ INSTALLED_APPS = [
     'finance',
     'journal',
     'projects',
+    'backup',
+    'jobs',
+    'chat',
 ]
 
 MIDDLEWARE = [
@@ -83,10 +86,131 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # WAL: exports read every table in one long transaction, which must not block writers meanwhile
+            'init_command': 'PRAGMA journal_mode=WAL;',
+        },
     }
 }
 
 
+# Physical SQLite snapshots (manage.py snapshot_db, /api/backup/snapshots/)
+BACKUP_SNAPSHOT_DIR = BASE_DIR / 'snapshots'
+BACKUP_SNAPSHOT_KEEP = 14  # Newest snapshots kept by the retention policy
+
+# Deduplicated logical snapshots (manage.py chunk_snapshot)
+BACKUP_CHUNK_STORE_DIR = BASE_DIR / 'chunk_store'
+BACKUP_CHUNK_STORE_KEEP = 30
+
+# Chat tool execution (/api/chat/ and the async /api/chat/async/ served by core/asgi.py)
+CHAT_TOOL_WORKERS = 8  # Threads running service-layer tools for all concurrent chats
+CHAT_TOOL_TIMEOUT = 15  # Seconds a read-only tool may take before the model is told it failed
+
+# Chat context budget (core/chat_context.py). Tokens are estimated locally, ~4 characters each.
+CHAT_HISTORY_TOKEN_BUDGET = 3000  # Recent messages sent verbatim; older ones are summarized
+CHAT_TOOL_RESULT_MAX_TOKENS = 1500  # Larger tool outputs are truncated before they reach the model
+CHAT_SUMMARY_MAX_TOKENS = 300  # Length of the rolling summary of older messages
+CHAT_SUMMARY_CACHE_TTL = 24 * 60 * 60
+
+# Cache of answers to repeated read-only questions (core/chat_cache.py), valid while the data they read is unchanged
+CHAT_RESPONSE_CACHE = False  # Default of a request's "cache" flag
+CHAT_RESPONSE_CACHE_TTL = 24 * 60 * 60
+
+# Server-side chat sessions (services/chat_session_service.py, /api/chat/sessions/)
+CHAT_SESSION_MAX_MESSAGES = 500  # Newest messages kept per session; older ones are deleted
+CHAT_SESSION_TTL_DAYS = 30  # Sessions idle for longer are deleted
+
+# Chat request tracing (core/chat_trace.py): JSON lines on the 'lifeos.chat' logger
+CHAT_TRACE_HISTORY = 200  # Recent traces kept in memory for /api/chat/traces/ (DEBUG only)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'lifeos.chat': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
+# Paginated list tools of the chat API and the MCP server (services/tool_pages.py)
+TOOL_PAGE_DEFAULT_LIMIT = 20
+TOOL_PAGE_MAX_LIMIT = 100
+TOOL_PAGE_MAX_TOKENS = 1200  # Items past this output budget are summarized and left for the next page
+
+# Pooled LLM provider clients (core/llm_clients.py)
+LLM_CLIENT_CACHE_SIZE = 32  # Clients kept, one per (provider, API key, sync/async)
+LLM_CLIENT_IDLE_TIMEOUT = 30 * 60  # Seconds unused before a client is closed
+LLM_HTTP_MAX_CONNECTIONS = 20  # Per client
+LLM_HTTP_MAX_KEEPALIVE = 10
+LLM_HTTP_KEEPALIVE_EXPIRY = 60  # Seconds an idle connection stays open
+LLM_HTTP_TIMEOUT = 120  # Seconds for one provider request
+LLM_PROVIDER_TIMEOUTS = {'groq': 30, 'together': 60, 'openrouter': 60}  # Per-provider overrides of LLM_HTTP_TIMEOUT
+
+# Retries, failover and hedging across providers (core/llm_router.py)
+LLM_ROUTER_WORKERS = 16  # Threads running hedged model calls for all concurrent chats
+LLM_RETRIES = 2  # Extra attempts on a provider for timeouts, 429 and 5xx
+LLM_RETRY_BACKOFF = 0.5  # Seconds before the first retry, doubled for each next one (with jitter)
+LLM_HEDGE_DEFAULT_DELAY = 8.0  # Seconds before hedging while a provider has too few latency samples
+LLM_HEDGE_MIN_DELAY = 1.0  # Never hedge earlier than this, however fast the p95
+LLM_HEDGE_MIN_SAMPLES = 20
+LLM_LATENCY_WINDOW = 200  # Recent call durations kept per provider and model for the p95
+LLM_UNHEALTHY_AFTER = 3  # Consecutive failures before a provider is skipped...
+LLM_UNHEALTHY_COOLDOWN = 60  # ...for this many seconds
+# Server-side fallbacks tried after the ones a request sends: [{'provider', 'model', 'api_key'}]
+LLM_FALLBACKS = []
+
+# Per (provider, API key) limits of model calls (core/llm_limiter.py): requests per minute (None: no
+# rate limit), bucket size for bursts (default: concurrency) and calls in flight
+LLM_RATE_LIMITS = {
+    'groq': {'rpm': 30, 'burst': 5, 'concurrency': 5},
+    'anthropic': {'rpm': 50, 'burst': 5, 'concurrency': 5},
+    'local': {'rpm': None, 'concurrency': 64},
+    'local-anthropic': {'rpm': None, 'concurrency': 64},
+}
+LLM_RATE_LIMIT_DEFAULT = {'rpm': 60, 'burst': 10, 'concurrency': 10}
+LLM_LIMIT_QUEUE_SIZE = 32  # Calls waiting per key; more are rejected with a 429 at once
+LLM_LIMIT_QUEUE_TIMEOUT = 30  # Seconds a call may wait for a slot before it is rejected (or fails over)
+LLM_RETRY_AFTER_MAX = 60  # Cap on a provider's Retry-After, in seconds
+
+# Scripted offline LLM for load testing the chat loop (core/local_llm.py), providers 'local' and 'local-anthropic'.
+# The first script whose 'match' regex finds the user's message plays its turns in order, one per model call:
+# {'tool_calls': [{'name', 'arguments'}]} or {'content'}, each with an optional 'latency' in seconds.
+LOCAL_LLM_ENABLED = DEBUG
+LOCAL_LLM_LATENCY = 0.5  # Seconds before each answer
+LOCAL_LLM_TOKEN_LATENCY = 0.02  # Seconds between streamed chunks
+LOCAL_LLM_SCRIPT_FILE = None  # JSON file with a list of scripts replacing LOCAL_LLM_SCRIPTS
+LOCAL_LLM_SCRIPTS = [
+    {'match': r'resumen|c[oó]mo va mi d[ií]a', 'turns': [
+        {'tool_calls': [{'name': 'get_daily_summary', 'arguments': {}}]},
+        {'content': 'Este es el resumen de tu día: revisa tus tareas pendientes y tus finanzas del mes.'},
+    ]},
+    {'match': r'gast|finanz|presupuesto|dinero', 'turns': [
+        {'tool_calls': [
+            {'name': 'get_financial_summary', 'arguments': {}},
+            {'name': 'check_budget_alerts', 'arguments': {}},
+        ]},
+        {'content': 'Este mes llevas estos ingresos y gastos, y estas son tus alertas de presupuesto.'},
+    ]},
+    {'match': r'tarea', 'turns': [
+        {'tool_calls': [{'name': 'get_all_tasks', 'arguments': {}}]},
+        {'tool_calls': [{'name': 'get_overdue_tasks', 'arguments': {}}]},
+        {'content': 'Estas son tus tareas, con las atrasadas primero.'},
+    ]},
+    {'match': r'', 'turns': [
+        {'content': '¡Hola! Soy LifeOS AI. ¿En qué te ayudo con tus tareas, finanzas o diario?'},
+    ]},
+]
+
+# Background jobs (/api/jobs/)
+JOBS_MAX_WORKERS = 2
+JOBS_RESULT_DIR = BASE_DIR / 'job_results'
+JOBS_RESULT_TTL = 24 * 60 * 60  # Seconds a result file stays downloadable
+JOBS_HEARTBEAT_INTERVAL = 2  # Seconds between heartbeats (and progress saves) of a process's jobs
+JOBS_STALE_AFTER = 60  # Seconds without a heartbeat before a job's process is taken for dead
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
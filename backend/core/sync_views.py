@@ -0,0 +1,51 @@
+from django.http import JsonResponse
+from django.views.decorators.http import require_http_methods
+from django.views.decorators.csrf import csrf_exempt
+import json
+
+from services import sync_service
+from services.backup_service import ExactJSONEncoder
+
+
+def _read_request(request):
+    data = json.loads(request.body)
+    if data.get('table') not in sync_service.TABLE_MODELS:
+        raise ValueError(f"Unknown table: {data.get('table')}")
+    return data
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def sync_digests(request):
+    """
+    Merkle digests of id ranges of one table, used by `manage.py sync_instance`.
+    Body: {"table": "tasks", "ranges": [[lo, hi], ...]} (hi null: unbounded).
+    Ranges with few rows also list their [id, row hash] pairs.
+    """
+    try:
+        data = _read_request(request)
+        ranges = [(int(lo), None if hi is None else int(hi)) for lo, hi in data.get('ranges', [])]
+        return JsonResponse({'ranges': sync_service.digest_ranges(data['table'], ranges)})
+    except (ValueError, TypeError) as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=400)
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def sync_rows(request):
+    """
+    Raw rows of one table by id, with full datetime precision.
+    Body: {"table": "tasks", "ids": [1, 2, ...]}
+    """
+    try:
+        data = _read_request(request)
+        ids = [int(model_id) for model_id in data.get('ids', [])]
+        return JsonResponse({'rows': sync_service.get_rows(data['table'], ids)}, encoder=ExactJSONEncoder)
+    except (ValueError, TypeError) as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=400)
@@ -17,7 +17,10 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from core.chat_api import chat_api
-from core.backup_views import export_all_data, import_all_data
+from core.chat_async import chat_api_async
+from core.chat_trace import chat_traces
+from core.backup_views import export_all_data, import_all_data, snapshots, download_snapshot
+from core.sync_views import sync_digests, sync_rows
 from core.models_api import get_models
 
 urlpatterns = [
@@ -26,9 +29,17 @@ urlpatterns = [
     path('api/', include('finance.urls')),
     path('api/', include('journal.urls')),
     path('api/', include('projects.urls')),
+    path('api/', include('jobs.urls')),
+    path('api/', include('chat.urls')),
     path('api/chat/', chat_api, name='chat_api'),
+    path('api/chat/async/', chat_api_async, name='chat_api_async'),
+    path('api/chat/traces/', chat_traces, name='chat_traces'),
     path('api/backup/export/', export_all_data, name='backup_export'),
     path('api/backup/import/', import_all_data, name='backup_import'),
+    path('api/backup/snapshots/', snapshots, name='backup_snapshots'),
+    path('api/backup/snapshots/<str:name>/', download_snapshot, name='backup_snapshot_download'),
+    path('api/sync/digests/', sync_digests, name='sync_digests'),
+    path('api/sync/rows/', sync_rows, name='sync_rows'),
     path('api/models/<str:provider>/', get_models, name='get_models'),
 ]
 
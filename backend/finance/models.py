@@ -8,6 +8,7 @@ class FinanceCategory(models.Model):
     icon = models.CharField(max_length=50, blank=True, default='')  # For frontend icon name
     color = models.CharField(max_length=7, default='#6B7280')  # Hex color
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name_plural = "Finance Categories"
@@ -43,6 +44,7 @@ class Transaction(models.Model):
     )
     date = models.DateField()
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-date', '-created_at']
@@ -66,6 +68,7 @@ class Budget(models.Model):
     month = models.PositiveIntegerField()  # 1-12
     year = models.PositiveIntegerField()
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ['category', 'month', 'year']
@@ -117,6 +120,7 @@ class SavingsGoal(models.Model):
     deadline = models.DateField(null=True, blank=True)
     is_completed = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
@@ -0,0 +1,24 @@
+from django.urls import reverse
+from rest_framework import serializers
+from .models import Job
+from services import jobs_service
+
+class JobSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+    message = serializers.SerializerMethodField()
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        exclude = ['result_file']
+
+    def get_progress(self, obj):
+        return jobs_service.get_progress(obj)['progress']
+
+    def get_message(self, obj):
+        return jobs_service.get_progress(obj)['message']
+
+    def get_download_url(self, obj):
+        if obj.status != 'SUCCEEDED' or not obj.result_file:
+            return None
+        return reverse('job-download', args=[obj.id])
@@ -0,0 +1,30 @@
+from django.http import FileResponse
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from .models import Job
+from .serializers import JobSerializer
+from services import jobs_service
+from services.jobs_service import JobError
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Background jobs: poll a job for its status and progress, then download its result."""
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        kind = self.request.query_params.get('kind')
+        if kind:
+            queryset = queryset.filter(kind=kind)
+        return queryset
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        job = self.get_object()
+        try:
+            path = jobs_service.get_result_path(job)
+        except JobError as e:
+            return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
+        filename = job.result_file.split('-', 1)[1]
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=filename)
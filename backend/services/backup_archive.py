@@ -0,0 +1,216 @@
+"""
+Backup Archive Module
+Compressed multi-file backup format: a zip holding one NDJSON file per table
+and a manifest with the backup metadata, row counts and checksums.
+Both writing and reading stream row by row; legacy JSON backups stay readable.
+"""
+import hashlib
+import io
+import json
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from services import backup_service
+from services.backup_stream import BackupStreamParser, BackupFormatError, CHUNK_SIZE
+
+
+ARCHIVE_FORMAT = 'lifeos-archive'
+ARCHIVE_CONTENT_TYPE = 'application/zip'
+ARCHIVE_CONTENT_TYPES = ('application/zip', 'application/x-zip-compressed')
+MANIFEST_NAME = 'manifest.json'
+
+# 'deflate' is gzip's algorithm and opens with any unzip tool; 'xz' (LZMA) is smaller but slower
+COMPRESSIONS = {
+    'deflate': zipfile.ZIP_DEFLATED,
+    'xz': zipfile.ZIP_LZMA,
+}
+DEFAULT_COMPRESSION = 'deflate'
+
+# Parallel checksum workers when validating an uploaded archive
+VALIDATION_WORKERS = 4
+
+_ZIP_MAGIC = b'PK\x03\x04'
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, non-seekable sink that collects the zip bytes until they are drained."""
+
+    def __init__(self):
+        self._chunks = []
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        self.size = 0
+        return data
+
+
+# ==================== WRITING ====================
+
+def write_archive(
+    header: Dict[str, Any],
+    tables: Iterable[Tuple[str, Iterable[Dict[str, Any]]]],
+    compression: str = DEFAULT_COMPRESSION,
+    chunk_size: int = CHUNK_SIZE
+) -> Iterator[bytes]:
+    """
+    Yield the bytes of a backup archive as it is written.
+    `tables` are (table key, rows) pairs, written in order as <key>.ndjson;
+    the manifest goes last since counts and checksums are only known then.
+    """
+    sink = _ChunkSink()
+    manifest = {'format': ARCHIVE_FORMAT, **header, 'tables': {}}
+
+    with zipfile.ZipFile(sink, 'w', compression=COMPRESSIONS[compression]) as archive:
+        for key, rows in tables:
+            name = f'{key}.ndjson'
+            digest = hashlib.sha256()
+            count = 0
+            with archive.open(name, 'w') as member:
+                for row in rows:
+                    line = (json.dumps(row, ensure_ascii=False, cls=DjangoJSONEncoder) + '\n').encode('utf-8')
+                    member.write(line)
+                    digest.update(line)
+                    count += 1
+                    if sink.size >= chunk_size:
+                        yield sink.drain()
+            manifest['tables'][key] = {'file': name, 'rows': count, 'sha256': digest.hexdigest()}
+            yield sink.drain()
+
+        archive.writestr(MANIFEST_NAME, json.dumps(manifest, indent=2, ensure_ascii=False, cls=DjangoJSONEncoder))
+    yield sink.drain()
+
+
+def iter_backup_archive(
+    since: Optional[datetime] = None,
+    compression: str = DEFAULT_COMPRESSION,
+    scope: Optional[List[str]] = None
+) -> Iterator[bytes]:
+    """
+    Stream a full (or, with `since`, delta) backup of every table (or the tables in `scope`) as an archive.
+    Like export_all, every table is read in one transaction, held until the
+    last byte: a write meanwhile cannot leave rows pointing at rows the archive lacks.
+    """
+    with transaction.atomic():
+        header = backup_service.export_header(since, scope)
+        tables = (
+            (key, backup_service.iter_table(key, since))
+            for key, _ in backup_service.TABLES
+            if scope is None or key in scope
+        )
+        yield from write_archive(header, tables, compression=compression)
+
+
+# ==================== READING ====================
+
+class BackupArchiveReader:
+    """
+    Reads a backup archive from a file path.
+    Exposes the same interface as BackupStreamParser: `meta` and iter_rows().
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        try:
+            with zipfile.ZipFile(path) as archive:
+                manifest = json.loads(archive.read(MANIFEST_NAME))
+        except zipfile.BadZipFile:
+            raise BackupFormatError('Invalid backup archive: not a zip file')
+        except KeyError:
+            raise BackupFormatError(f'Invalid backup archive: missing {MANIFEST_NAME}')
+        if manifest.get('format') != ARCHIVE_FORMAT or not isinstance(manifest.get('tables'), dict):
+            raise BackupFormatError('Invalid backup archive: unknown manifest format')
+
+        self.tables: Dict[str, Dict[str, Any]] = manifest['tables']
+        self.meta: Dict[str, Any] = {key: value for key, value in manifest.items() if key != 'tables'}
+
+    def _check_table(self, key: str, info: Dict[str, Any]):
+        """Verify one member's row count and checksum. Uses its own zip handle, so it is thread-safe."""
+        digest = hashlib.sha256()
+        count = 0
+        try:
+            with zipfile.ZipFile(self.path) as archive, archive.open(info['file']) as member:
+                for line in member:
+                    digest.update(line)
+                    count += 1
+        except KeyError:
+            raise BackupFormatError(f'Invalid backup archive: missing {info["file"]}')
+        if count != info.get('rows') or digest.hexdigest() != info.get('sha256'):
+            raise BackupFormatError(f'Invalid backup archive: checksum mismatch in "{key}"')
+
+    def validate(self, workers: int = VALIDATION_WORKERS):
+        """
+        Check every table file against the manifest before anything is loaded.
+        Tables are checked in parallel; decompression and hashing release the GIL.
+        """
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(self._check_table, key, info) for key, info in self.tables.items()]
+            for future in futures:
+                future.result()
+
+    def iter_rows(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Yield (table key, row) pairs, table by table in manifest order."""
+        with zipfile.ZipFile(self.path) as archive:
+            for key, info in self.tables.items():
+                with archive.open(info['file']) as member:
+                    for line in member:
+                        if line.strip():
+                            yield key, json.loads(line)
+
+
+class _PrefixedStream:
+    """Replays bytes already read from a stream before reading the rest of it."""
+
+    def __init__(self, prefix: bytes, stream):
+        self.prefix = prefix
+        self.stream = stream
+
+    def read(self, size: int = -1) -> bytes:
+        if self.prefix:
+            data = self.prefix if size < 0 else self.prefix[:size]
+            self.prefix = self.prefix[len(data):]
+            return data
+        return self.stream.read(size)
+
+
+def is_archive_content_type(content_type: Optional[str]) -> bool:
+    return (content_type or '').split(';')[0].strip().lower() in ARCHIVE_CONTENT_TYPES
+
+
+@contextmanager
+def open_backup(stream, content_type: Optional[str] = None):
+    """
+    Open an uploaded backup in either format and yield a reader for it.
+    An archive is recognized by its content type or by the zip magic bytes.
+    Archives are spooled to a temporary file (zip needs random access) and
+    validated against their manifest before being handed over.
+    """
+    prefix = stream.read(len(_ZIP_MAGIC))
+    stream = _PrefixedStream(prefix, stream)
+    if prefix != _ZIP_MAGIC and not is_archive_content_type(content_type):
+        yield BackupStreamParser(stream)
+        return
+
+    with tempfile.NamedTemporaryFile(suffix='.zip') as spool:
+        shutil.copyfileobj(stream, spool, CHUNK_SIZE)
+        spool.flush()
+        reader = BackupArchiveReader(spool.name)
+        reader.validate()
+        yield reader
@@ -0,0 +1,145 @@
+"""
+Backup Stream Module
+Incremental parser for backup documents read from a file-like stream.
+Rows are yielded one at a time so an import never holds the whole backup in memory.
+"""
+import codecs
+import json
+from typing import Any, Dict, Iterator, Tuple
+
+
+CHUNK_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+
+
+class BackupFormatError(ValueError):
+    """The stream is valid JSON but not a backup document."""
+
+
+class BackupStreamParser:
+    """
+    Walks a backup document of the form {"version": ..., "data": {"table": [row, ...]}}.
+    Top-level metadata is collected into `meta`; table rows are yielded by iter_rows().
+    """
+
+    def __init__(self, stream, chunk_size: int = CHUNK_SIZE):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.meta: Dict[str, Any] = {}
+        self.has_data = False
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    # ---------- buffer handling ----------
+
+    def _fill(self) -> bool:
+        """Read the next chunk into the buffer. Returns False at end of stream."""
+        if self._eof:
+            return False
+        # Drop what has already been consumed
+        if self._pos:
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+        chunk = self.stream.read(self.chunk_size)
+        if not chunk:
+            self._eof = True
+            self._buffer += self._utf8.decode(b'', final=True)
+            return False
+        if isinstance(chunk, bytes):
+            chunk = self._utf8.decode(chunk)
+        self._buffer += chunk
+        return True
+
+    def _peek(self) -> str:
+        """Return the next non-whitespace character without consuming it ('' at EOF)."""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ''
+
+    def _expect(self, char: str):
+        found = self._peek()
+        if found != char:
+            raise json.JSONDecodeError(f"Expecting '{char}'", self._buffer, self._pos)
+        self._pos += 1
+
+    def _value(self) -> Any:
+        """Decode one complete JSON value, reading more input until it is available."""
+        self._peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buffer, self._pos)
+                # A number at the very end of the buffer may still be incomplete
+                if end < len(self._buffer) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._fill()
+
+    def _members(self) -> Iterator[str]:
+        """Iterate over the keys of the object at the cursor, leaving it on each value."""
+        self._expect('{')
+        if self._peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            key = self._value()
+            if not isinstance(key, str):
+                raise json.JSONDecodeError('Expecting property name', self._buffer, self._pos)
+            self._expect(':')
+            yield key
+            if self._peek() == ',':
+                self._pos += 1
+                continue
+            self._expect('}')
+            return
+
+    def _items(self) -> Iterator[Any]:
+        """Iterate over the elements of the array at the cursor."""
+        self._expect('[')
+        if self._peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self._value()
+            if self._peek() == ',':
+                self._pos += 1
+                continue
+            self._expect(']')
+            return
+
+    # ---------- public API ----------
+
+    def iter_rows(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Yield (table key, row) pairs in file order."""
+        if self._peek() != '{':
+            raise BackupFormatError('Invalid backup file format: expected a JSON object')
+        for key in self._members():
+            if key != 'data':
+                self.meta[key] = self._value()
+                continue
+            self.has_data = True
+            if self._peek() != '{':
+                raise BackupFormatError('Invalid backup file format: "data" must be an object')
+            for table in self._members():
+                if self._peek() != '[':
+                    # Unknown scalar entries are skipped
+                    self._value()
+                    continue
+                for row in self._items():
+                    if not isinstance(row, dict):
+                        raise BackupFormatError(f'Invalid row in "{table}": expected an object')
+                    yield table, row
+        if self._peek():
+            raise json.JSONDecodeError('Extra data', self._buffer, self._pos)
+        if not self.has_data:
+            raise BackupFormatError('Invalid backup file format: missing "data" key')
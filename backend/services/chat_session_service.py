@@ -0,0 +1,103 @@
+"""
+Chat Session Service Module
+Server-side store of chat conversations. A request names its session and
+sends only the new message; the context is assembled from the stored
+history, tool calls and tool results included. Sessions are bounded by
+CHAT_SESSION_MAX_MESSAGES and pruned after CHAT_SESSION_TTL_DAYS idle.
+"""
+import uuid
+from datetime import timedelta
+from typing import Optional, List, Dict, Any
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from chat.models import ChatSession, ChatMessage
+
+
+# Length of the session title taken from its first user message
+TITLE_LENGTH = 60
+
+
+# ==================== SESSIONS ====================
+
+def get_or_create_session(session_id: Optional[uuid.UUID] = None) -> ChatSession:
+    """The session with this id, or a new one (also when the id was pruned)."""
+    if session_id is None:
+        return ChatSession.objects.create()
+    session, _ = ChatSession.objects.get_or_create(id=session_id)
+    return session
+
+
+def get_all_sessions() -> List[ChatSession]:
+    return list(ChatSession.objects.all())
+
+
+def delete_session(session_id: uuid.UUID) -> bool:
+    deleted, _ = ChatSession.objects.filter(id=session_id).delete()
+    return deleted > 0
+
+
+def prune_sessions() -> int:
+    """Delete sessions idle for more than CHAT_SESSION_TTL_DAYS. Returns how many."""
+    cutoff = timezone.now() - timedelta(days=settings.CHAT_SESSION_TTL_DAYS)
+    sessions = ChatSession.objects.filter(updated_at__lt=cutoff)
+    count = sessions.count()
+    if count:
+        sessions.delete()
+    return count
+
+
+# ==================== MESSAGES ====================
+
+def message_to_dict(message: ChatMessage) -> Dict[str, Any]:
+    """A stored message as an OpenAI-format chat message."""
+    if message.role == 'tool':
+        return {'role': 'tool', 'tool_call_id': message.tool_call_id, 'content': message.content}
+    if message.tool_calls:
+        return {'role': message.role, 'content': message.content or None, 'tool_calls': message.tool_calls}
+    return {'role': message.role, 'content': message.content}
+
+
+def get_history(session: ChatSession) -> List[Dict[str, Any]]:
+    """
+    The stored messages of a session, oldest first, in OpenAI format.
+    Starts at a user message: trimming may have cut a tool turn in half.
+    """
+    messages = [message_to_dict(m) for m in session.messages.all()]
+    start = next((i for i, msg in enumerate(messages) if msg['role'] == 'user'), len(messages))
+    return messages[start:]
+
+
+def save_messages(session: ChatSession, messages: List[Dict[str, Any]]):
+    """
+    Append OpenAI-format messages (a user message and the turns that
+    answered it) to a session, then apply the retention limits.
+    """
+    with transaction.atomic():
+        ChatMessage.objects.bulk_create([
+            ChatMessage(
+                session=session,
+                role=msg['role'],
+                content=msg.get('content') or '',
+                tool_calls=msg.get('tool_calls') or None,
+                tool_call_id=msg.get('tool_call_id', '')
+            )
+            for msg in messages
+        ])
+
+        if not session.title:
+            first = next((msg['content'] for msg in messages if msg['role'] == 'user' and msg.get('content')), '')
+            session.title = first[:TITLE_LENGTH]
+        session.save()  # Bumps updated_at
+
+        # Keep the newest CHAT_SESSION_MAX_MESSAGES of the session
+        boundary = (
+            session.messages.order_by('-id')
+            .values_list('id', flat=True)[settings.CHAT_SESSION_MAX_MESSAGES:settings.CHAT_SESSION_MAX_MESSAGES + 1]
+        )
+        if boundary:
+            session.messages.filter(id__lte=boundary[0]).delete()
+
+    prune_sessions()
@@ -0,0 +1,257 @@
+"""
+Chunk Store Module
+Deduplicated backup snapshots. Every table export is cut into content-defined
+chunks that are stored once under their SHA-256; a snapshot is only a small
+manifest listing the chunks of each table. Unchanged data maps to chunks that
+already exist, so a daily snapshot costs roughly the size of the day's changes.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, List, Dict, Any, Iterator, Iterable, Set, Tuple
+
+from django.conf import settings
+from django.db import transaction
+
+from services import backup_service
+from services.backup_service import ExactJSONEncoder
+from services.backup_stream import BackupFormatError
+
+
+STORE_FORMAT = 'lifeos-chunks'
+
+# Chunk sizes in bytes of NDJSON. Boundaries are picked by content between these bounds.
+MIN_CHUNK_SIZE = 16 * 1024
+MAX_CHUNK_SIZE = 256 * 1024
+# A row ends a chunk when the low bits of its hash are zero: 1 row in 64
+BOUNDARY_MASK = 0x3F
+
+# lifeos-<date>-<time>[-<microseconds>][-<label>] (names before microseconds were added still match)
+SNAPSHOT_PATTERN = re.compile(r'^lifeos-\d{8}-\d{6}(-\d{6})?(-[a-z-]+)?$')
+
+# Snapshot writes and garbage collection must not interleave
+_store_lock = threading.Lock()
+
+
+# ==================== PATHS ====================
+
+def get_store_dir() -> Path:
+    directory = Path(settings.BACKUP_CHUNK_STORE_DIR)
+    (directory / 'chunks').mkdir(parents=True, exist_ok=True)
+    (directory / 'snapshots').mkdir(parents=True, exist_ok=True)
+    return directory
+
+
+def get_chunk_path(digest: str) -> Path:
+    # Fan out over 256 subdirectories to keep directory listings short
+    return get_store_dir() / 'chunks' / digest[:2] / digest
+
+
+def get_manifest_path(name: str) -> Path:
+    if not SNAPSHOT_PATTERN.match(name):
+        raise BackupFormatError(f'Invalid snapshot name: {name}')
+    return get_store_dir() / 'snapshots' / f'{name}.json'
+
+
+def _write_atomic(path: Path, data: bytes, replace: bool = True):
+    """Write a file under a temporary name, then move it into place. With replace=False an existing file raises FileExistsError."""
+    partial = path.with_name(path.name + '.partial')
+    with open(partial, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    if replace:
+        os.replace(partial, path)
+        return
+    try:
+        os.link(partial, path)
+    finally:
+        partial.unlink(missing_ok=True)
+
+
+# ==================== CHUNKING ====================
+
+def iter_chunks(lines: Iterable[bytes]) -> Iterator[bytes]:
+    """
+    Group NDJSON lines into content-defined chunks.
+    A boundary falls after any line whose hash matches BOUNDARY_MASK, so an
+    inserted or edited row only changes the chunk it lands in; the chunks
+    after it keep the same boundaries and the same digests.
+    """
+    chunk = []
+    size = 0
+    for line in lines:
+        chunk.append(line)
+        size += len(line)
+        at_boundary = size >= MIN_CHUNK_SIZE and zlib.crc32(line) & BOUNDARY_MASK == 0
+        if at_boundary or size >= MAX_CHUNK_SIZE:
+            yield b''.join(chunk)
+            chunk = []
+            size = 0
+    if chunk:
+        yield b''.join(chunk)
+
+
+def put_chunk(data: bytes) -> Tuple[str, int]:
+    """Store a chunk unless it already exists. Returns (digest, bytes written)."""
+    digest = hashlib.sha256(data).hexdigest()
+    path = get_chunk_path(digest)
+    if path.exists():
+        return digest, 0
+    path.parent.mkdir(exist_ok=True)
+    compressed = zlib.compress(data)
+    _write_atomic(path, compressed)
+    return digest, len(compressed)
+
+
+def get_chunk(digest: str) -> bytes:
+    """Read a chunk back, checking it against its digest."""
+    try:
+        data = zlib.decompress(get_chunk_path(digest).read_bytes())
+    except FileNotFoundError:
+        raise BackupFormatError(f'Missing chunk {digest}')
+    if hashlib.sha256(data).hexdigest() != digest:
+        raise BackupFormatError(f'Corrupt chunk {digest}')
+    return data
+
+
+def _row_lines(rows: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    for row in rows:
+        # Sorted keys and full datetime precision: the same row always serializes to the same bytes
+        # and restores exactly
+        yield (json.dumps(row, ensure_ascii=False, sort_keys=True, cls=ExactJSONEncoder) + '\n').encode('utf-8')
+
+
+# ==================== SNAPSHOTS ====================
+
+def create_snapshot(label: str = '') -> Dict[str, Any]:
+    """
+    Export every table into the store and write the snapshot manifest.
+    Returns the snapshot info with how many bytes of new chunks it added.
+    """
+    suffix = f'-{label}' if label else ''
+    name = f"lifeos-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}{suffix}"
+
+    # One transaction: every table is read from the same state of the database
+    with _store_lock, transaction.atomic():
+        manifest = {'format': STORE_FORMAT, 'name': name, **backup_service.export_header(), 'tables': {}}
+        stats = {'chunks': 0, 'new_chunks': 0, 'new_bytes': 0}
+        for key, _ in backup_service.TABLES:
+            digests = []
+            rows = 0
+            lines = _row_lines(backup_service.iter_table(key))
+
+            def counted():
+                nonlocal rows
+                for line in lines:
+                    rows += 1
+                    yield line
+
+            for chunk in iter_chunks(counted()):
+                digest, written = put_chunk(chunk)
+                digests.append(digest)
+                stats['chunks'] += 1
+                if written:
+                    stats['new_chunks'] += 1
+                    stats['new_bytes'] += written
+            manifest['tables'][key] = {'rows': rows, 'chunks': digests}
+
+        # The manifest goes last: a snapshot exists only once all its chunks do
+        try:
+            _write_atomic(get_manifest_path(name), json.dumps(manifest, indent=2).encode('utf-8'), replace=False)
+        except FileExistsError:
+            raise BackupFormatError(f'Snapshot already exists: {name}')
+
+    return {'name': name, **stats}
+
+
+def read_manifest(name: str) -> Dict[str, Any]:
+    path = get_manifest_path(name)
+    if not path.exists():
+        raise BackupFormatError(f'Snapshot not found: {name}')
+    manifest = json.loads(path.read_text())
+    if manifest.get('format') != STORE_FORMAT:
+        raise BackupFormatError('Invalid snapshot manifest')
+    return manifest
+
+
+def list_snapshots() -> List[Dict[str, Any]]:
+    """List the snapshots, newest first."""
+    names = sorted(
+        (path.stem for path in (get_store_dir() / 'snapshots').glob('*.json') if SNAPSHOT_PATTERN.match(path.stem)),
+        reverse=True
+    )
+    snapshots = []
+    for name in names:
+        manifest = read_manifest(name)
+        snapshots.append({
+            'name': name,
+            'export_date': manifest['export_date'],
+            'rows': sum(table['rows'] for table in manifest['tables'].values()),
+            'chunks': sum(len(table['chunks']) for table in manifest['tables'].values()),
+        })
+    return snapshots
+
+
+class ChunkSnapshotReader:
+    """
+    Reads a stored snapshot.
+    Exposes the same interface as BackupStreamParser: `meta` and iter_rows(),
+    so it can be restored with backup_service.import_backup().
+    """
+
+    def __init__(self, name: str):
+        manifest = read_manifest(name)
+        self.tables: Dict[str, Dict[str, Any]] = manifest['tables']
+        self.meta: Dict[str, Any] = {key: value for key, value in manifest.items() if key not in ('tables', 'format', 'name')}
+
+    def iter_rows(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        for key, info in self.tables.items():
+            for digest in info['chunks']:
+                for line in get_chunk(digest).splitlines():
+                    yield key, json.loads(line)
+
+
+def restore_snapshot(name: str) -> Dict[str, int]:
+    """Replace all data with a stored snapshot."""
+    return backup_service.import_backup(ChunkSnapshotReader(name))
+
+
+# ==================== RETENTION ====================
+
+def prune_snapshots(keep: Optional[int] = None) -> List[str]:
+    """
+    Retention policy: keep the newest `keep` manifests and delete the rest.
+    Their chunks stay on disk until collect_garbage() runs.
+    """
+    keep = settings.BACKUP_CHUNK_STORE_KEEP if keep is None else keep
+    deleted = []
+    with _store_lock:
+        for info in list_snapshots()[keep:]:
+            get_manifest_path(info['name']).unlink(missing_ok=True)
+            deleted.append(info['name'])
+    return deleted
+
+
+def collect_garbage() -> Dict[str, int]:
+    """Delete every chunk no remaining manifest refers to (mark and sweep)."""
+    with _store_lock:
+        referenced: Set[str] = set()
+        for info in list_snapshots():
+            for table in read_manifest(info['name'])['tables'].values():
+                referenced.update(table['chunks'])
+
+        removed = 0
+        freed = 0
+        for path in (get_store_dir() / 'chunks').glob('*/*'):
+            if path.name not in referenced:
+                freed += path.stat().st_size
+                path.unlink(missing_ok=True)
+                removed += 1
+
+    return {'referenced_chunks': len(referenced), 'removed_chunks': removed, 'freed_bytes': freed}
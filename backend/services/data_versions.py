@@ -0,0 +1,52 @@
+"""
+Data Versions Module
+A version token per data domain ('tasks', 'finance', 'journal', 'projects'),
+replaced whenever a row of the domain is written, so caches of derived
+answers can tell whether the data behind them changed. The tokens are rows
+of the database itself (chat.DataVersion), replaced in the transaction of
+the write: every process and management command sees the same versions,
+committed together with the data. ORM saves and deletes bump through the
+signals of chat/signals.py; bulk writes that skip signals (backup imports
+and merges) and snapshot restores bump explicitly.
+"""
+import uuid
+from typing import Dict, Iterable
+
+from django.db import DEFAULT_DB_ALIAS
+
+from chat.models import DataVersion
+
+
+DOMAINS = ('tasks', 'finance', 'journal', 'projects')
+
+
+# ==================== VERSIONS ====================
+
+def get_versions(domains: Iterable[str] = DOMAINS, using: str = DEFAULT_DB_ALIAS) -> Dict[str, str]:
+    """The current version token of each domain ('' for a domain never written)."""
+    domains = list(domains)
+    stored = dict(DataVersion.objects.using(using).filter(domain__in=domains).values_list('domain', 'version'))
+    return {domain: stored.get(domain, '') for domain in domains}
+
+
+def bump(domains: Iterable[str], using: str = DEFAULT_DB_ALIAS):
+    """
+    Give the domains a new version token, in the current transaction (if
+    any): a reader never pairs the new version with data that has not been
+    committed yet, nor the old one with data that has.
+    """
+    domains = [domain for domain in dict.fromkeys(domains) if domain in DOMAINS]
+    if not domains:
+        return
+    version = uuid.uuid4().hex
+    updated = DataVersion.objects.using(using).filter(domain__in=domains).update(version=version)
+    if updated < len(domains):
+        DataVersion.objects.using(using).bulk_create(
+            [DataVersion(domain=domain, version=version) for domain in domains],
+            ignore_conflicts=True
+        )
+
+
+def bump_models(models: Iterable, using: str = DEFAULT_DB_ALIAS):
+    """Bump the domains of the given models (their app labels)."""
+    bump((model._meta.app_label for model in models), using)
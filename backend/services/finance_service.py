@@ -6,7 +6,7 @@ Can be used by both Django ViewSets and future MCP server.
 from decimal import Decimal
 from datetime import date
 from typing import Optional, List, Dict, Any
-from django.db.models import Sum
+from django.db.models import Sum, QuerySet
 
 from finance.models import Transaction, FinanceCategory, Budget, SavingsGoal
 
@@ -26,6 +26,28 @@ def get_transactions_by_month(year: int, month: int) -> List[Transaction]:
     ))
 
 
+def filter_transactions(
+    transaction_type: Optional[str] = None,
+    query: Optional[str] = None,
+    category_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None
+) -> QuerySet:
+    """Transactions matching the given filters, newest first, as a lazy queryset."""
+    transactions = Transaction.objects.select_related('category')
+    if transaction_type:
+        transactions = transactions.filter(type=transaction_type)
+    if query:
+        transactions = transactions.filter(title__icontains=query)
+    if category_id:
+        transactions = transactions.filter(category_id=category_id)
+    if date_from:
+        transactions = transactions.filter(date__gte=date_from)
+    if date_to:
+        transactions = transactions.filter(date__lte=date_to)
+    return transactions
+
+
 def create_transaction(
     title: str,
     amount: float,
@@ -148,6 +170,16 @@ def get_all_savings_goals() -> List[SavingsGoal]:
     return list(SavingsGoal.objects.all())
 
 
+def filter_savings_goals(query: Optional[str] = None, completed: Optional[bool] = None) -> QuerySet:
+    """Savings goals matching the given filters, as a lazy queryset."""
+    goals = SavingsGoal.objects.all()
+    if query:
+        goals = goals.filter(name__icontains=query)
+    if completed is not None:
+        goals = goals.filter(is_completed=completed)
+    return goals
+
+
 def create_savings_goal(
     name: str,
     target_amount: float,
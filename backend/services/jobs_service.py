@@ -0,0 +1,254 @@
+"""
+Jobs Service Module
+In-process background job runner for work that outlives a request
+(backup exports and imports, rebuilds, rollups).
+Jobs are rows in the jobs table and run on a shared thread pool; handlers
+are plain functions registered by kind, so any app can add its own.
+Each job records the process that owns it, which keeps a heartbeat on it;
+a job whose heartbeat stops (its process died) is failed by any other.
+"""
+import os
+import shutil
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+from typing import Optional, List, Dict, Any, Callable
+
+from django.conf import settings
+from django.db import close_old_connections, DatabaseError
+from django.db.models import Q
+from django.utils import timezone
+
+from jobs.models import Job
+
+
+# Upload bodies are copied to disk in chunks of this size
+SPOOL_CHUNK_SIZE = 64 * 1024
+
+ACTIVE_STATUSES = ['PENDING', 'RUNNING']
+
+_handlers: Dict[str, Callable] = {}
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_owner: Optional[str] = None
+
+# Jobs queued or running in this process, by id
+_owned: set = set()
+
+# Live progress of this process's running jobs, by job id. A handler often
+# reports from inside a transaction whose writes no other request can see,
+# so the heartbeat thread copies it to the job rows from its own connection.
+_progress: Dict[int, Dict[str, Any]] = {}
+_saved_progress: Dict[int, Dict[str, Any]] = {}
+
+
+class JobError(Exception):
+    """A job could not be submitted or its result is unavailable."""
+
+
+class JobContext:
+    """Handed to a handler: its job, a progress reporter and the result file helpers."""
+
+    def __init__(self, job: Job):
+        self.job = job
+        self.params = job.params
+        self.result_file = ''
+
+    def progress(self, percent: float, message: str = ''):
+        report_progress(self.job.id, percent, message)
+
+    def result_path(self, filename: str) -> Path:
+        """Path where the handler writes its downloadable output."""
+        self.result_file = f'{self.job.id}-{filename}'
+        return get_result_dir() / self.result_file
+
+
+# ==================== REGISTRY ====================
+
+def register(kind: str):
+    """
+    Decorator registering a job handler: fn(ctx: JobContext) -> result dict.
+    Whatever it returns is stored as the job result; an exception fails the job.
+    """
+    def decorator(fn: Callable) -> Callable:
+        _handlers[kind] = fn
+        return fn
+    return decorator
+
+
+def get_handler(kind: str) -> Callable:
+    if kind not in _handlers:
+        raise JobError(f'Unknown job kind: {kind}')
+    return _handlers[kind]
+
+
+# ==================== RUNNER ====================
+
+def get_owner() -> str:
+    """This process, as recorded on its jobs: host, pid and a random tag (pids are reused across restarts)."""
+    global _owner
+    if _owner is None or _owner.split(':')[1] != str(os.getpid()):
+        _owner = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+    return _owner
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Shared worker pool and its heartbeat thread, created on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Jobs left running by a process that is gone will never finish
+            fail_interrupted_jobs()
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.JOBS_MAX_WORKERS,
+                thread_name_prefix='lifeos-job'
+            )
+            threading.Thread(target=_heartbeat_loop, name='lifeos-job-heartbeat', daemon=True).start()
+        return _executor
+
+
+def fail_interrupted_jobs() -> int:
+    """
+    Mark queued or running jobs as failed when their owner stopped beating
+    for JOBS_STALE_AFTER seconds: the process running them is gone. Jobs
+    of live processes, this one or any other, are left alone.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.JOBS_STALE_AFTER)
+    return Job.objects.filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, created_at__lt=cutoff),
+        status__in=ACTIVE_STATUSES
+    ).exclude(id__in=list(_owned)).update(
+        status='FAILED',
+        error='Interrupted: the server process running it stopped',
+        finished_at=timezone.now()
+    )
+
+
+def beat() -> None:
+    """Mark this process's jobs alive and save the progress they reported since the last beat."""
+    owned = list(_owned)
+    if not owned:
+        return
+    Job.objects.filter(id__in=owned, status__in=ACTIVE_STATUSES).update(heartbeat_at=timezone.now())
+    for job_id, live in list(_progress.items()):
+        if _saved_progress.get(job_id) != live:
+            Job.objects.filter(id=job_id, status='RUNNING').update(**live)
+            _saved_progress[job_id] = live
+
+
+def _heartbeat_loop() -> None:
+    while True:
+        time.sleep(settings.JOBS_HEARTBEAT_INTERVAL)
+        try:
+            beat()
+            fail_interrupted_jobs()
+        except DatabaseError:
+            pass  # Database locked by a long write: try again on the next beat
+        finally:
+            close_old_connections()
+
+
+def submit(kind: str, params: Optional[Dict[str, Any]] = None) -> Job:
+    """Create a job and queue it on the worker pool. Returns the pending job."""
+    get_handler(kind)
+    executor = get_executor()
+    prune_results()
+    job = Job.objects.create(kind=kind, params=params or {}, owner=get_owner(), heartbeat_at=timezone.now())
+    _owned.add(job.id)
+    executor.submit(run_job, job.id)
+    return job
+
+
+def run_job(job_id: int) -> None:
+    """Execute one job in the current thread, recording its outcome."""
+    try:
+        job = Job.objects.get(id=job_id)
+        ctx = JobContext(job)
+        now = timezone.now()
+        Job.objects.filter(id=job_id).update(status='RUNNING', started_at=now, heartbeat_at=now)
+        try:
+            result = get_handler(job.kind)(ctx)
+        except Exception as e:
+            Job.objects.filter(id=job_id).update(
+                status='FAILED',
+                error=str(e) or e.__class__.__name__,
+                message=_progress.get(job_id, {}).get('message', ''),
+                finished_at=timezone.now()
+            )
+            return
+        Job.objects.filter(id=job_id).update(
+            status='SUCCEEDED',
+            progress=100,
+            message='',
+            result=result,
+            result_file=ctx.result_file,
+            finished_at=timezone.now()
+        )
+    finally:
+        _owned.discard(job_id)
+        _progress.pop(job_id, None)
+        _saved_progress.pop(job_id, None)
+        # Worker threads keep their own connection; don't let it go stale
+        close_old_connections()
+
+
+def report_progress(job_id: int, percent: float, message: str = '') -> None:
+    _progress[job_id] = {'progress': max(0, min(99, int(percent))), 'message': message}
+
+
+def get_progress(job: Job) -> Dict[str, Any]:
+    """
+    Current progress of a job: live when it runs in this process, else as
+    last saved by its owner's heartbeat (at most JOBS_HEARTBEAT_INTERVAL old).
+    """
+    live = _progress.get(job.id)
+    if live and job.status == 'RUNNING':
+        return live
+    return {'progress': job.progress, 'message': job.message}
+
+
+# ==================== RESULT FILES ====================
+
+def get_result_dir() -> Path:
+    """Directory holding job output and spooled uploads, created on first use."""
+    directory = Path(settings.JOBS_RESULT_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory
+
+
+def get_result_path(job: Job) -> Path:
+    if job.status != 'SUCCEEDED' or not job.result_file:
+        raise JobError('Job has no result file')
+    path = get_result_dir() / job.result_file
+    if not path.exists():
+        raise JobError('Result file has expired')
+    return path
+
+
+def save_upload(stream, suffix: str = '') -> str:
+    """Copy a request body to the result directory so a job can read it later. Returns the file name."""
+    name = f'upload-{uuid.uuid4().hex}{suffix}'
+    with open(get_result_dir() / name, 'wb') as f:
+        shutil.copyfileobj(stream, f, SPOOL_CHUNK_SIZE)
+    return name
+
+
+def prune_results(max_age: Optional[int] = None) -> List[str]:
+    """Delete result files and leftover uploads older than JOBS_RESULT_TTL seconds."""
+    max_age = settings.JOBS_RESULT_TTL if max_age is None else max_age
+    cutoff = time.time() - max_age
+    deleted = []
+    for path in get_result_dir().iterdir():
+        if path.is_file() and path.stat().st_mtime < cutoff:
+            path.unlink(missing_ok=True)
+            deleted.append(path.name)
+    return deleted
+
+
+def remove_file(name: str) -> None:
+    if name:
+        (get_result_dir() / os.path.basename(name)).unlink(missing_ok=True)
@@ -5,7 +5,7 @@ Can be used by both Django ViewSets and future MCP server.
 """
 from datetime import date
 from typing import Optional, List, Dict, Any
-from django.db.models import Avg
+from django.db.models import Avg, Q, QuerySet
 
 from journal.models import Entry, Category
 
@@ -27,6 +27,25 @@ def get_entries_by_project(project_id: int) -> List[Entry]:
     return list(Entry.objects.filter(project_id=project_id))
 
 
+def filter_entries(
+    query: Optional[str] = None,
+    category_id: Optional[int] = None,
+    project_id: Optional[int] = None,
+    date_from: Optional[date] = None
+) -> QuerySet:
+    """Entries matching the given filters, newest first, as a lazy queryset."""
+    entries = Entry.objects.all()
+    if query:
+        entries = entries.filter(Q(title__icontains=query) | Q(content__icontains=query))
+    if category_id:
+        entries = entries.filter(category_id=category_id)
+    if project_id:
+        entries = entries.filter(project_id=project_id)
+    if date_from:
+        entries = entries.filter(date__gte=date_from)
+    return entries
+
+
 def create_entry(
     title: str,
     content: str,
@@ -90,6 +109,14 @@ def get_all_categories() -> List[Category]:
     return list(Category.objects.all())
 
 
+def filter_categories(query: Optional[str] = None) -> QuerySet:
+    """Journal categories, optionally filtered by name."""
+    categories = Category.objects.all()
+    if query:
+        categories = categories.filter(name__icontains=query)
+    return categories
+
+
 def create_category(name: str) -> Category:
     """Create a new journal category."""
     return Category.objects.create(name=name)
@@ -5,6 +5,7 @@ Can be used by both Django ViewSets and future MCP server.
 """
 from typing import Optional, List, Dict, Any
 from datetime import date, datetime
+from django.db.models import QuerySet
 
 from projects.models import Project, Objective
 
@@ -21,6 +22,16 @@ def get_active_projects() -> List[Project]:
     return list(Project.objects.filter(is_active=True))
 
 
+def filter_projects(query: Optional[str] = None, active: Optional[bool] = None) -> QuerySet:
+    """Projects matching the given filters, as a lazy queryset."""
+    projects = Project.objects.all()
+    if query:
+        projects = projects.filter(name__icontains=query)
+    if active is not None:
+        projects = projects.filter(is_active=active)
+    return projects
+
+
 def get_project_with_stats(project_id: int) -> Optional[Dict[str, Any]]:
     """Get a project with linked item counts."""
     try:
@@ -177,19 +188,28 @@ def search_across_project(project_id: int, query: str) -> Optional[Dict[str, Lis
 
 # ==================== OBJECTIVES ====================
 
+def objective_to_dict(o: Objective) -> Dict[str, Any]:
+    return {
+        'id': o.id,
+        'title': o.title,
+        'description': o.description,
+        'deadline': str(o.deadline) if o.deadline else None,
+        'status': o.status
+    }
+
+
 def get_project_objectives(project_id: int) -> List[Dict[str, Any]]:
     """Get all objectives for a project."""
     objectives = Objective.objects.filter(project_id=project_id)
-    return [
-        {
-            'id': o.id,
-            'title': o.title,
-            'description': o.description,
-            'deadline': str(o.deadline) if o.deadline else None,
-            'status': o.status
-        }
-        for o in objectives
-    ]
+    return [objective_to_dict(o) for o in objectives]
+
+
+def filter_objectives(project_id: int, status: Optional[str] = None) -> QuerySet:
+    """Objectives of a project, optionally by status, as a lazy queryset."""
+    objectives = Objective.objects.filter(project_id=project_id)
+    if status:
+        objectives = objectives.filter(status=status)
+    return objectives
 
 
 def create_objective(
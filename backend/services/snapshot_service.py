@@ -0,0 +1,213 @@
+"""
+Snapshot Service Module
+Physical backups of the SQLite database through sqlite3's online backup API.
+A snapshot is a consistent .sqlite3 copy taken in page-stepped increments,
+so writers are only blocked for one step at a time, never for the whole copy.
+"""
+import os
+import re
+import shutil
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, List, Dict, Any
+
+from django.conf import settings
+from django.db import connection, connections, DatabaseError
+from django.db.migrations.loader import MigrationLoader
+
+from services import data_versions
+
+
+# Pages copied per backup step (4 KiB pages: 1 MiB per step)
+PAGES_PER_STEP = 256
+
+# Pause between steps so queued writers can take the database lock
+STEP_PAUSE = 0.001
+
+# lifeos-<date>-<time>[-<microseconds>][-<label>].sqlite3 (names before microseconds were added still match)
+SNAPSHOT_PATTERN = re.compile(r'^lifeos-\d{8}-\d{6}(-\d{6})?(-[a-z-]+)?\.sqlite3$')
+
+
+class SnapshotError(Exception):
+    """A snapshot could not be taken, verified or restored."""
+
+
+# ==================== PATHS ====================
+
+def get_snapshot_dir() -> Path:
+    """Directory holding the snapshots, created on first use."""
+    directory = Path(settings.BACKUP_SNAPSHOT_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory
+
+
+def get_database_path() -> Path:
+    """Path of the live SQLite database file."""
+    if connection.vendor != 'sqlite':
+        raise SnapshotError('Snapshots require the SQLite database backend')
+    name = str(connection.settings_dict['NAME'])
+    if name == ':memory:' or 'mode=memory' in name:
+        raise SnapshotError('Cannot snapshot an in-memory database')
+    return Path(name)
+
+
+def get_snapshot_path(name: str) -> Path:
+    """Resolve a snapshot name, rejecting anything that is not a snapshot file."""
+    if not SNAPSHOT_PATTERN.match(name):
+        raise SnapshotError(f'Invalid snapshot name: {name}')
+    path = get_snapshot_dir() / name
+    if not path.exists():
+        raise SnapshotError(f'Snapshot not found: {name}')
+    return path
+
+
+def _fsync(path: Path):
+    with open(path, 'rb+') as f:
+        os.fsync(f.fileno())
+
+
+def _snapshot_info(path: Path) -> Dict[str, Any]:
+    stat = path.stat()
+    return {
+        'name': path.name,
+        'size': stat.st_size,
+        'created_at': datetime.fromtimestamp(stat.st_mtime).isoformat(),
+    }
+
+
+# ==================== SNAPSHOTS ====================
+
+def create_snapshot(label: str = '') -> Dict[str, Any]:
+    """
+    Copy the live database into a new snapshot file.
+    The copy is written under a temporary name, integrity-checked and fsynced,
+    then linked into place, so a listed snapshot is always complete. An
+    existing snapshot is never overwritten.
+    """
+    source_path = get_database_path()
+    suffix = f'-{label}' if label else ''
+    name = f"lifeos-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}{suffix}.sqlite3"
+    path = get_snapshot_dir() / name
+    partial = path.with_name(name + '.partial')
+
+    def pause(status, remaining, total):
+        if remaining:
+            time.sleep(STEP_PAUSE)
+
+    # A dedicated read-only connection: the copy never runs inside a request's transaction
+    source = sqlite3.connect(f'file:{source_path}?mode=ro', uri=True)
+    target = sqlite3.connect(partial)
+    try:
+        source.backup(target, pages=PAGES_PER_STEP, progress=pause)
+        result = target.execute('PRAGMA integrity_check').fetchone()[0]
+    finally:
+        target.close()
+        source.close()
+
+    if result != 'ok':
+        partial.unlink(missing_ok=True)
+        raise SnapshotError(f'Snapshot failed integrity check: {result}')
+
+    _fsync(partial)
+    try:
+        # Unlike a rename, a link fails instead of replacing a snapshot with the same name
+        os.link(partial, path)
+    except FileExistsError:
+        raise SnapshotError(f'Snapshot already exists: {name}')
+    finally:
+        partial.unlink(missing_ok=True)
+    return _snapshot_info(path)
+
+
+def list_snapshots() -> List[Dict[str, Any]]:
+    """List the snapshots, newest first."""
+    paths = [path for path in get_snapshot_dir().iterdir() if SNAPSHOT_PATTERN.match(path.name)]
+    return [_snapshot_info(path) for path in sorted(paths, key=lambda p: p.name, reverse=True)]
+
+
+def prune_snapshots(keep: Optional[int] = None) -> List[str]:
+    """
+    Retention policy: keep the newest `keep` snapshots and delete the rest.
+    Returns the deleted names.
+    """
+    keep = settings.BACKUP_SNAPSHOT_KEEP if keep is None else keep
+    deleted = []
+    for info in list_snapshots()[keep:]:
+        (get_snapshot_dir() / info['name']).unlink(missing_ok=True)
+        deleted.append(info['name'])
+    return deleted
+
+
+# ==================== RESTORE ====================
+
+def verify_snapshot(path: Path) -> Dict[str, Any]:
+    """
+    Check that a snapshot is safe to restore: the file passes SQLite's
+    integrity check and was not made by a newer schema than this code knows.
+    Returns the migrations the snapshot still needs.
+    """
+    try:
+        snapshot = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+        try:
+            result = snapshot.execute('PRAGMA integrity_check').fetchone()[0]
+            applied = set(snapshot.execute('SELECT app, name FROM django_migrations').fetchall())
+        finally:
+            snapshot.close()
+    except sqlite3.DatabaseError as e:
+        raise SnapshotError(f'Snapshot is not a LifeOS database: {e}')
+
+    if result != 'ok':
+        raise SnapshotError(f'Snapshot failed integrity check: {result}')
+
+    known = set(MigrationLoader(None, ignore_no_migrations=True).disk_migrations)
+    unknown = applied - known
+    if unknown:
+        raise SnapshotError(f'Snapshot was made by a newer version (unknown migrations: {sorted(unknown)})')
+
+    return {'pending_migrations': sorted(f'{app}.{name}' for app, name in known - applied)}
+
+
+def _bump_data_versions() -> None:
+    """
+    Answers cached from the replaced data must not match the restored data.
+    A snapshot older than the versions table has none: migrate creates it
+    empty, which no cached entry matches either. Runs after the swap, so it
+    must never fail the restore and hide the pre-restore snapshot.
+    """
+    try:
+        if 'chat_dataversion' in connection.introspection.table_names():
+            data_versions.bump(data_versions.DOMAINS)
+    except DatabaseError:
+        pass
+
+
+def restore_snapshot(name: str) -> Dict[str, Any]:
+    """
+    Replace the live database with a verified snapshot.
+    The current database is snapshotted first ('pre-restore') so the swap can be undone.
+    The file is swapped with an atomic rename; other processes holding the old file
+    open (a running server) must be restarted afterwards.
+    """
+    path = get_snapshot_path(name)
+    verification = verify_snapshot(path)
+    safety = create_snapshot(label='pre-restore')
+
+    live = get_database_path()
+    incoming = live.with_name(live.name + '.restore')
+    shutil.copyfile(path, incoming)
+    _fsync(incoming)
+
+    connections.close_all()
+    os.replace(incoming, live)
+    # A leftover journal would be replayed onto the restored file
+    for leftover in ('-wal', '-shm', '-journal'):
+        live.with_name(live.name + leftover).unlink(missing_ok=True)
+    _bump_data_versions()
+
+    return {
+        'restored': name,
+        'pre_restore_snapshot': safety['name'],
+        **verification,
+    }
@@ -0,0 +1,501 @@
+"""
+Sync Service Module
+Reconciles two LifeOS instances without a full export/import.
+Each table is viewed as a Merkle tree over id ranges: a range digest covers
+the (id, row hash) pairs inside it. Both sides compare range digests level
+by level and only descend into ranges that differ, so finding k changed rows
+costs O(k · log n) transferred digests and only those rows are sent.
+The digests of the tree nodes are stored (backup.models.DigestNode); a
+written row flags its leaf stale, so a walk only rehashes the rows of the
+leaves that changed and unchanged ranges cost one lookup.
+"""
+import bisect
+import hashlib
+import json
+import os
+from itertools import chain
+from typing import Optional, List, Dict, Any, Iterable, Iterator, Tuple
+
+from django.db import connections, transaction, OperationalError, DEFAULT_DB_ALIAS
+from django.db.models import Q
+
+from backup.models import DigestNode
+from services import backup_service
+from services.backup_service import ExactJSONEncoder, TABLE_MODELS
+
+
+# A range with at most this many rows is sent as its row hashes instead of being split
+LEAF_ROWS = 64
+
+# Sub-ranges per level when a range differs
+FANOUT = 16
+
+# Rows per request when transferring rows
+TRANSFER_BATCH = 500
+
+PEER_DATABASE_ALIAS = 'sync_peer'
+
+# Ids per leaf of the digest tree: a leaf never holds more than LEAF_ROWS rows
+LEAF_SPAN = LEAF_ROWS
+
+# The top node of the tree, (MAX_LEVEL, 0), covers every id (below 2**63)
+MAX_LEVEL = 15
+
+# Level of the node recording that a table's tree has been built
+BUILT_LEVEL = MAX_LEVEL + 1
+
+
+# ==================== DIGESTS ====================
+
+def row_hash(row: Dict[str, Any]) -> str:
+    """Content hash of one exported row (every column, full precision)."""
+    data = json.dumps(row, sort_keys=True, ensure_ascii=False, cls=ExactJSONEncoder)
+    return hashlib.blake2b(data.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _get_model(key: str):
+    if key not in TABLE_MODELS:
+        raise ValueError(f'Unknown table: {key}')
+    return TABLE_MODELS[key]
+
+
+def _get_export_rows(model, condition: Q, using: str) -> Iterator[Dict[str, Any]]:
+    queryset = model.objects.using(using).filter(condition).order_by('pk')
+    return queryset.values(*backup_service.get_export_fields(model)).iterator(chunk_size=backup_service.EXPORT_CHUNK_SIZE)
+
+
+def _range_result(lo: int, hi: Optional[int], count: int, digest: str, max_id: Optional[int], rows) -> Dict[str, Any]:
+    result = {'lo': lo, 'hi': hi, 'count': count, 'digest': digest, 'max_id': max_id}
+    if count <= LEAF_ROWS:
+        result['rows'] = rows
+    return result
+
+
+def digest_ranges(key: str, ranges: List[Tuple[int, Optional[int]]], using: str = DEFAULT_DB_ALIAS) -> List[Dict[str, Any]]:
+    """
+    Digest each [lo, hi) id range of a table (hi None: unbounded).
+    Ranges that are nodes of the digest tree (what diff_table asks for) come
+    from the stored digests; any other range is read and hashed, all in one
+    query. Small ranges also carry their (id, hash) pairs, so the caller can
+    diff them without another round trip.
+    """
+    model = _get_model(key)
+    if not ranges:
+        return []
+
+    results = None
+    try:
+        # One snapshot for the whole walk; storing the nodes computed from it fails
+        # (and is skipped) if a write committed meanwhile
+        with transaction.atomic(using=using):
+            tree = DigestTree(key, using)
+            nodes = {index: _tree_node(lo, hi) for index, (lo, hi) in enumerate(ranges)}
+            found = tree.get([node for node in nodes.values() if node])
+            flat = _digest_flat(model, [item for index, item in enumerate(ranges) if not nodes[index]], using)
+            results = []
+            for index, (lo, hi) in enumerate(ranges):
+                if nodes[index]:
+                    node = found[nodes[index]]
+                    results.append(_range_result(lo, hi, node['count'], node['digest'], node['max_id'], node['rows']))
+                else:
+                    results.append(flat.pop(0))
+            tree.save()
+    except OperationalError:
+        if results is None:
+            raise
+    return results
+
+
+def _digest_flat(model, ranges: List[Tuple[int, Optional[int]]], using: str) -> List[Dict[str, Any]]:
+    """Digest ranges that are not tree nodes by reading and hashing their rows."""
+    if not ranges:
+        return []
+    # Only the rows inside the requested ranges are read and hashed
+    condition = Q()
+    for range_lo, range_hi in ranges:
+        condition |= Q(pk__gte=range_lo) if range_hi is None else Q(pk__gte=range_lo, pk__lt=range_hi)
+
+    ids = []
+    hashes = []
+    for row in _get_export_rows(model, condition, using):
+        ids.append(row['id'])
+        hashes.append(row_hash(row))
+
+    results = []
+    for range_lo, range_hi in ranges:
+        start = bisect.bisect_left(ids, range_lo)
+        end = len(ids) if range_hi is None else bisect.bisect_left(ids, range_hi)
+        pairs = [[ids[position], hashes[position]] for position in range(start, end)]
+        results.append(_range_result(range_lo, range_hi, end - start, _leaf_digest(pairs), ids[end - 1] if end > start else None, pairs))
+    return results
+
+
+# ==================== DIGEST TREE ====================
+
+def _span(level: int) -> int:
+    return LEAF_SPAN * FANOUT ** level
+
+
+def _tree_node(lo: int, hi: Optional[int]) -> Optional[Tuple[int, int]]:
+    """The (level, index) of the tree node covering exactly [lo, hi), if any. (0, None) is the top node."""
+    if (lo, hi) == (0, None):
+        return MAX_LEVEL, 0
+    if hi is None:
+        return None
+    for level in range(MAX_LEVEL + 1):
+        if hi - lo == _span(level) and lo % _span(level) == 0:
+            return level, lo // _span(level)
+    return None
+
+
+def _covering_span(max_id: int) -> int:
+    """Span of the lowest tree node holding every id up to max_id."""
+    level = 0
+    while _span(level) <= max_id:
+        level += 1
+    return _span(level)
+
+
+def _leaf_digest(pairs: List[List]) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    for model_id, hashed in pairs:
+        digest.update(f'{model_id}:{hashed};'.encode())
+    return digest.hexdigest()
+
+
+def _leaf(pairs: List[List]) -> Dict[str, Any]:
+    return {'count': len(pairs), 'digest': _leaf_digest(pairs), 'max_id': pairs[-1][0] if pairs else None, 'rows': pairs}
+
+
+def _parent(children: List[Tuple[int, Dict[str, Any]]]) -> Dict[str, Any]:
+    """A node from its non-empty (index, node) children, in index order."""
+    digest = hashlib.blake2b(digest_size=16)
+    for index, child in children:
+        digest.update(f'{index}:{child["digest"]};'.encode())
+    count = sum(child['count'] for _, child in children)
+    return {
+        'count': count,
+        'digest': digest.hexdigest(),
+        'max_id': children[-1][1]['max_id'] if children else None,
+        'rows': list(chain.from_iterable(child['rows'] for _, child in children)) if count <= LEAF_ROWS else None,
+    }
+
+
+class DigestTree:
+    """
+    The stored digest tree of one table: leaves digest the rows of LEAF_SPAN
+    ids, every other node the digests of its FANOUT children. Only non-empty
+    nodes are stored. Built from every row on first use (and after imports
+    or migrations reset it); afterwards a write only flags its leaf stale, and
+    a node is recomputed only when a stale leaf lies under it.
+    """
+
+    def __init__(self, key: str, using: str = DEFAULT_DB_ALIAS):
+        self.key = key
+        self.using = using
+        self.model = _get_model(key)
+        self.nodes = DigestNode.objects.using(using).filter(table=key)
+        self.computed: Dict[Tuple[int, int], Dict[str, Any]] = {}
+        self.built = self.nodes.filter(level=BUILT_LEVEL).exists()
+        if self.built:
+            self.stale_leaves = sorted(self.nodes.filter(level=0, stale=True).values_list('index', flat=True))
+        else:
+            self.stale_leaves = []
+            self._build()
+
+    def _build(self):
+        leaves: Dict[int, List[List]] = {}
+        for row in _get_export_rows(self.model, Q(), self.using):
+            leaves.setdefault(row['id'] // LEAF_SPAN, []).append([row['id'], row_hash(row)])
+        level_nodes = {index: _leaf(pairs) for index, pairs in leaves.items()}
+        for level in range(MAX_LEVEL + 1):
+            if level:
+                groups: Dict[int, List] = {}
+                for index in sorted(level_nodes):
+                    groups.setdefault(index // FANOUT, []).append((index, level_nodes[index]))
+                level_nodes = {index: _parent(children) for index, children in groups.items()}
+            self.computed.update({(level, index): node for index, node in level_nodes.items()})
+
+    def _stale_leaves_under(self, level: int, index: int) -> List[int]:
+        leaves_per_node = FANOUT ** level
+        start = bisect.bisect_left(self.stale_leaves, index * leaves_per_node)
+        end = bisect.bisect_left(self.stale_leaves, (index + 1) * leaves_per_node)
+        return self.stale_leaves[start:end]
+
+    def get(self, wanted: List[Tuple[int, int]]) -> Dict[Tuple[int, int], Dict[str, Any]]:
+        """The nodes at the given (level, index) positions, recomputing stale ones."""
+        found = {}
+        stored = []
+        for position in wanted:
+            if position in self.computed:
+                found[position] = self.computed[position]
+            elif self._stale_leaves_under(*position):
+                found[position] = self._refresh(*position)
+            elif self.built:
+                stored.append(position)
+        if stored:
+            levels: Dict[int, List[int]] = {}
+            for level, index in stored:
+                levels.setdefault(level, []).append(index)
+            condition = Q()
+            for level, indexes in levels.items():
+                condition |= Q(level=level, index__in=indexes)
+            found.update({(record.level, record.index): self._as_node(record) for record in self.nodes.filter(condition)})
+        for position in wanted:
+            found.setdefault(position, _parent([]))  # Nothing stored: no rows there
+        return found
+
+    @staticmethod
+    def _as_node(record: DigestNode) -> Dict[str, Any]:
+        return {'count': record.count, 'digest': record.digest, 'max_id': record.max_id, 'rows': record.rows}
+
+    def _refresh(self, level: int, index: int) -> Dict[str, Any]:
+        lo = index * _span(level)
+        if level == 0:
+            rows = _get_export_rows(self.model, Q(pk__gte=lo, pk__lt=lo + LEAF_SPAN), self.using)
+            node = _leaf([[row['id'], row_hash(row)] for row in rows])
+        else:
+            # Stored children are up to date unless a stale leaf lies under them;
+            # a stale leaf may also start a child that has no node yet
+            records = {
+                record.index: record
+                for record in self.nodes.filter(level=level - 1, index__gte=index * FANOUT, index__lt=(index + 1) * FANOUT)
+            }
+            stale = {leaf // FANOUT ** (level - 1) for leaf in self._stale_leaves_under(level, index)}
+            children = []
+            for child_index in sorted(set(records) | stale):
+                if child_index in stale:
+                    child = self._refresh(level - 1, child_index)
+                else:
+                    child = self._as_node(records[child_index])
+                if child['count']:
+                    children.append((child_index, child))
+            node = _parent(children)
+        self.computed[(level, index)] = node
+        return node
+
+    def save(self):
+        """Store the nodes computed so far; emptied ones are dropped."""
+        if not self.computed:
+            return
+        if not self.built:
+            self.nodes.delete()
+        empty = [position for position, node in self.computed.items() if not node['count']]
+        for level, index in empty:
+            self.nodes.filter(level=level, index=index).delete()
+        records = [
+            DigestNode(table=self.key, level=level, index=index, stale=False, **node)
+            for (level, index), node in self.computed.items() if node['count']
+        ]
+        if not self.built:
+            records.append(DigestNode(table=self.key, level=BUILT_LEVEL, index=0))
+        DigestNode.objects.using(self.using).bulk_create(
+            records,
+            batch_size=backup_service.IMPORT_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['table', 'level', 'index'],
+            update_fields=['count', 'max_id', 'digest', 'rows', 'stale'],
+        )
+        self.built = True
+        self.computed = {}
+
+
+def mark_stale(key: str, ids: Iterable[int], using: str = DEFAULT_DB_ALIAS) -> None:
+    """Flag the leaves holding the given rows for recomputation: call after writing them."""
+    leaves = {model_id // LEAF_SPAN for model_id in ids if model_id is not None}
+    if leaves:
+        DigestNode.objects.using(using).bulk_create(
+            [DigestNode(table=key, level=0, index=index, stale=True) for index in sorted(leaves)],
+            batch_size=backup_service.IMPORT_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['table', 'level', 'index'],
+            update_fields=['stale'],
+        )
+
+
+def reset_digests(keys: Iterable[str], using: str = DEFAULT_DB_ALIAS) -> None:
+    """Drop the trees of the given tables (after writes too broad to track); they are rebuilt on next use."""
+    DigestNode.objects.using(using).filter(table__in=list(keys)).delete()
+
+
+def get_rows(key: str, ids: Iterable[int], using: str = DEFAULT_DB_ALIAS) -> List[Dict[str, Any]]:
+    """Export the raw columns of the given rows."""
+    model = _get_model(key)
+    return list(
+        model.objects.using(using).filter(pk__in=list(ids)).order_by('pk')
+        .values(*backup_service.get_export_fields(model))
+    )
+
+
+def _split(lo: int, hi: int) -> List[Tuple[int, int]]:
+    step = max(1, -(-(hi - lo) // FANOUT))
+    return [(start, min(start + step, hi)) for start in range(lo, hi, step)]
+
+
+def diff_table(key: str, peer, using: str = DEFAULT_DB_ALIAS) -> Dict[str, Any]:
+    """
+    Walk the local and remote trees of a table, breadth first.
+    Every level is one request to the peer. Returns the ids only the remote
+    has, only the local side has, and present on both with different content.
+    """
+    diff = {'remote_only': [], 'local_only': [], 'differing': [], 'round_trips': 0}
+    pending: List[Tuple[int, Optional[int]]] = [(0, None)]
+
+    while pending:
+        remote = peer.digests(key, pending)
+        local = digest_ranges(key, pending, using)
+        diff['round_trips'] += 1
+        pending = []
+
+        for theirs, ours in zip(remote, local):
+            if theirs['digest'] == ours['digest']:
+                continue
+
+            if theirs['count'] == 0:
+                # Nothing to descend into on the remote side
+                diff['local_only'].extend(_ids_in_range(key, ours['lo'], ours['hi'], using))
+                continue
+
+            if 'rows' in theirs and 'rows' in ours:
+                their_rows = dict(theirs['rows'])
+                our_rows = dict(ours['rows'])
+                for model_id, remote_hash in their_rows.items():
+                    if model_id not in our_rows:
+                        diff['remote_only'].append(model_id)
+                    elif our_rows[model_id] != remote_hash:
+                        diff['differing'].append(model_id)
+                diff['local_only'].extend(model_id for model_id in our_rows if model_id not in their_rows)
+                continue
+
+            hi = theirs['hi']
+            if hi is None:
+                # Descend from the lowest tree node holding every id of either side
+                hi = _covering_span(max(theirs['max_id'] or 0, ours['max_id'] or 0))
+            pending.extend(_split(theirs['lo'], hi))
+
+    return diff
+
+
+def _ids_in_range(key: str, lo: int, hi: Optional[int], using: str) -> List[int]:
+    queryset = _get_model(key).objects.using(using).filter(pk__gte=lo)
+    if hi is not None:
+        queryset = queryset.filter(pk__lt=hi)
+    return list(queryset.values_list('id', flat=True))
+
+
+# ==================== PEERS ====================
+
+class LocalPeer:
+    """Another LifeOS database reachable from this process (a Django database alias)."""
+
+    def __init__(self, using: str):
+        self.using = using
+
+    def digests(self, key: str, ranges) -> List[Dict[str, Any]]:
+        return digest_ranges(key, ranges, self.using)
+
+    def rows(self, key: str, ids: List[int]) -> List[Dict[str, Any]]:
+        return get_rows(key, ids, self.using)
+
+    def push(self, rows: Dict[str, List[Dict[str, Any]]], dry_run: bool = False) -> Dict[str, Any]:
+        items = chain.from_iterable(((key, row) for row in table_rows) for key, table_rows in rows.items())
+        return backup_service.merge_rows(items, dry_run=dry_run, scope=list(rows), using=self.using)
+
+
+class HttpPeer:
+    """A LifeOS server reached over its sync and backup endpoints."""
+
+    def __init__(self, base_url: str, timeout: int = 60):
+        import requests
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def _post(self, path: str, payload: Dict[str, Any], params: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        response = self.session.post(
+            f'{self.base_url}{path}',
+            params=params,
+            data=json.dumps(payload, cls=ExactJSONEncoder),
+            headers={'Content-Type': 'application/json'},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def digests(self, key: str, ranges) -> List[Dict[str, Any]]:
+        return self._post('/api/sync/digests/', {'table': key, 'ranges': ranges})['ranges']
+
+    def rows(self, key: str, ids: List[int]) -> List[Dict[str, Any]]:
+        return self._post('/api/sync/rows/', {'table': key, 'ids': ids})['rows']
+
+    def push(self, rows: Dict[str, List[Dict[str, Any]]], dry_run: bool = False) -> Dict[str, Any]:
+        # A merge import of a backup document holding only the rows to send
+        params = {'mode': 'merge', 'tables': ','.join(rows)}
+        if dry_run:
+            params['dry_run'] = '1'
+        return self._post('/api/backup/import/', {'version': backup_service.BACKUP_VERSION, 'data': rows}, params)['stats']
+
+
+def open_peer(remote: str):
+    """A peer for an http(s) URL, or for the path of another LifeOS SQLite database."""
+    if remote.startswith(('http://', 'https://')):
+        return HttpPeer(remote)
+    # Connecting would silently create an empty database at a mistyped path
+    if not os.path.isfile(remote):
+        raise ValueError(f'No database file at {remote}')
+    if PEER_DATABASE_ALIAS not in connections.databases:
+        connections.databases[PEER_DATABASE_ALIAS] = {**connections.databases[DEFAULT_DB_ALIAS], 'NAME': remote}
+    return LocalPeer(PEER_DATABASE_ALIAS)
+
+
+# ==================== SYNC ====================
+
+def sync(
+    peer,
+    scope: Optional[List[str]] = None,
+    direction: str = 'both',
+    dry_run: bool = False,
+    using: str = DEFAULT_DB_ALIAS
+) -> Dict[str, Any]:
+    """
+    Reconcile the local database with a peer.
+    direction='pull' copies the remote's new and changed rows here, 'push' sends
+    ours there, 'both' does both. Rows on both sides go through the merge rules:
+    with updated_at the newer copy wins; tables without it take the remote copy.
+    Deletions are not propagated: rows on one side only are copied, never removed.
+    """
+    if direction not in ('pull', 'push', 'both'):
+        raise ValueError(f'Invalid sync direction: {direction}')
+    keys = scope or [key for key, _ in backup_service.TABLES]
+
+    tables = {}
+    pull_rows = {}
+    push_rows = {}
+    for key in keys:
+        diff = diff_table(key, peer, using)
+        tracked = backup_service.has_change_tracking(TABLE_MODELS[key])
+        tables[key] = {
+            'remote_only': len(diff['remote_only']),
+            'local_only': len(diff['local_only']),
+            'differing': len(diff['differing']),
+            'round_trips': diff['round_trips'],
+        }
+        if direction in ('pull', 'both'):
+            ids = diff['remote_only'] + diff['differing']
+            pull_rows[key] = list(chain.from_iterable(
+                peer.rows(key, ids[start:start + TRANSFER_BATCH]) for start in range(0, len(ids), TRANSFER_BATCH)
+            ))
+        if direction in ('push', 'both'):
+            # Untracked tables have no way to tell which copy is newer: in 'both', the remote wins
+            ids = diff['local_only'] + (diff['differing'] if tracked or direction == 'push' else [])
+            push_rows[key] = get_rows(key, ids, using)
+
+    # Rows are read on both sides before either is written, so a row updated
+    # on both sides is settled by the merge rules and not swapped.
+    result = {'tables': tables}
+    if any(pull_rows.values()):
+        items = chain.from_iterable(((key, row) for row in rows) for key, rows in pull_rows.items())
+        result['pulled'] = backup_service.merge_rows(items, dry_run=dry_run, scope=list(pull_rows), using=using)
+    if any(push_rows.values()):
+        result['pushed'] = peer.push({key: rows for key, rows in push_rows.items() if rows}, dry_run=dry_run)
+    return result
@@ -5,6 +5,7 @@ Can be used by both Django ViewSets and future MCP server.
 """
 from datetime import datetime, date
 from typing import Optional, List, Dict, Any
+from django.db.models import QuerySet
 
 from tasks.models import Task
 
@@ -26,6 +27,28 @@ def get_tasks_by_project(project_id: int) -> List[Task]:
     return list(Task.objects.filter(project_id=project_id))
 
 
+def filter_tasks(
+    status: Optional[str] = None,
+    query: Optional[str] = None,
+    project_id: Optional[int] = None,
+    overdue: bool = False
+) -> QuerySet:
+    """
+    Tasks matching the given filters, as a lazy queryset (for paginated listings).
+    overdue: only open tasks past their due date.
+    """
+    tasks = Task.objects.all()
+    if status:
+        tasks = tasks.filter(status=status)
+    if query:
+        tasks = tasks.filter(title__icontains=query)
+    if project_id:
+        tasks = tasks.filter(project_id=project_id)
+    if overdue:
+        tasks = tasks.filter(due_date__lt=date.today(), status__in=['INBOX', 'TODO'])
+    return tasks
+
+
 def create_task(
     title: str,
     description: str = '',
@@ -0,0 +1,112 @@
+"""
+Tool Pages Module
+Bounded, paginated output for the list tools of the chat API and the MCP
+server. A page holds at most `limit` items plus the totals to ask for the
+next one, and is kept within an output token budget: items that do not fit
+are replaced by a compact summary (counts, sums, id range) of what was left out.
+"""
+import json
+from collections import Counter
+from typing import Optional, List, Dict, Any, Callable, Iterable, Union
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import QuerySet
+
+
+# A token is roughly 4 characters of text in English and Spanish
+CHARS_PER_TOKEN = 4
+
+# Room kept in the budget for the page totals and the overflow summary
+PAGE_OVERHEAD_TOKENS = 200
+
+# String fields with more distinct values than this are not counted in the summary
+SUMMARY_MAX_DISTINCT = 10
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of a text, without a tokenizer."""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, ensure_ascii=False, cls=DjangoJSONEncoder)
+
+
+def clamp_page(limit: Optional[int] = None, offset: Optional[int] = None):
+    """Bound the limit/offset the model asked for."""
+    limit = settings.TOOL_PAGE_DEFAULT_LIMIT if not limit else limit
+    return max(1, min(limit, settings.TOOL_PAGE_MAX_LIMIT)), max(0, offset or 0)
+
+
+# ==================== PAGES ====================
+
+def get_page(
+    source: Union[QuerySet, List[Any]],
+    serialize: Callable[[Any], Dict[str, Any]],
+    limit: Optional[int] = None,
+    offset: Optional[int] = None,
+    max_tokens: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    One page of a queryset (only the page's rows are read) or a list.
+    Returns {total, offset, limit, has_more, items} and, when more items
+    exist, next_offset. Serialized items beyond the token budget are moved
+    into an 'omitted' summary and left for the next page.
+    """
+    limit, offset = clamp_page(limit, offset)
+    if isinstance(source, QuerySet):
+        total = source.count()
+        rows = list(source[offset:offset + limit])
+    else:
+        total = len(source)
+        rows = source[offset:offset + limit]
+
+    items = [serialize(row) for row in rows]
+    items, omitted = fit_items(items, max_tokens or settings.TOOL_PAGE_MAX_TOKENS)
+
+    page = {'total': total, 'offset': offset, 'limit': limit, 'has_more': offset + len(items) < total, 'items': items}
+    if page['has_more']:
+        page['next_offset'] = offset + len(items)
+    if omitted:
+        page['omitted'] = summarize_items(omitted)
+    return page
+
+
+def fit_items(items: List[Dict[str, Any]], max_tokens: int):
+    """Split items into (the leading ones that fit the budget, the rest). At least one item is kept."""
+    budget = max_tokens - PAGE_OVERHEAD_TOKENS
+    used = 0
+    for index, item in enumerate(items):
+        used += estimate_tokens(_dumps(item)) + 1
+        if used > budget and index > 0:
+            return items[:index], items[index:]
+    return items, []
+
+
+def summarize_items(items: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Compact description of serialized items: how many, their id range,
+    sum/min/max of numeric fields and value counts of categorical fields.
+    """
+    items = list(items)
+    summary: Dict[str, Any] = {'count': len(items)}
+    ids = [item['id'] for item in items if isinstance(item.get('id'), int)]
+    if ids:
+        summary['id_range'] = [min(ids), max(ids)]
+
+    fields = {}
+    keys = dict.fromkeys(key for item in items for key in item if key != 'id')
+    for key in keys:
+        values = [item[key] for item in items if item.get(key) is not None]
+        if not values:
+            continue
+        if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+            fields[key] = {'sum': round(sum(values), 2), 'min': min(values), 'max': max(values)}
+        elif all(isinstance(v, (str, bool)) for v in values):
+            counts = Counter(values)
+            if len(counts) <= SUMMARY_MAX_DISTINCT:
+                fields[key] = {str(value): count for value, count in counts.most_common()}
+    if fields:
+        summary['fields'] = fields
+    return summary
@@ -5,14 +5,36 @@ import { API_URL } from './config';
  * Export and Import data for portability
  */
 
-export const exportAllData = async () => {
-    const response = await fetch(`${API_URL}/backup/export/`);
+/**
+ * Export a backup.
+ * Pass the watermark of a previous export as `since` to get only what changed.
+ * options.archive: download the compressed zip archive instead of plain JSON
+ * options.domains: only export these domains (tasks, projects, journal, finance)
+ */
+export const exportAllData = async (since, { archive = false, domains = [] } = {}) => {
+    const params = new URLSearchParams();
+    if (since) params.set('since', since);
+    if (domains.length) params.set('domain', domains.join(','));
+    const query = params.toString() ? `?${params}` : '';
+    const response = await fetch(`${API_URL}/backup/export/${query}`, {
+        headers: { Accept: archive ? 'application/zip' : 'application/json' },
+    });
     if (!response.ok) throw new Error('Failed to export data');
     return response.blob();
 };
 
-export const importAllData = async (jsonData) => {
-    const response = await fetch(`${API_URL}/backup/import/`, {
+/**
+ * Import a backup.
+ * options.mode: 'replace' (default) wipes existing data, 'merge' upserts by id,
+ *               'delta' applies a delta export (changes and deletions)
+ * options.dryRun: with 'merge' or 'delta', only report the counts
+ * options.domains: only restore these domains, leaving the others untouched
+ */
+export const importAllData = async (jsonData, { mode = 'replace', dryRun = false, domains = [] } = {}) => {
+    const params = new URLSearchParams({ mode });
+    if (dryRun) params.set('dry_run', '1');
+    if (domains.length) params.set('domain', domains.join(','));
+    const response = await fetch(`${API_URL}/backup/import/?${params}`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify(jsonData),
@@ -23,3 +45,37 @@ export const importAllData = async (jsonData) => {
     }
     return response.json();
 };
+
+/**
+ * Background jobs
+ * Large exports/imports can run as jobs (?async=1): poll getJob until its
+ * status is SUCCEEDED or FAILED, then fetch download_url for export results.
+ */
+export const startExportJob = async (since, { archive = false } = {}) => {
+    const params = new URLSearchParams({ async: '1', format: archive ? 'archive' : 'json' });
+    if (since) params.set('since', since);
+    const response = await fetch(`${API_URL}/backup/export/?${params}`);
+    if (!response.ok) throw new Error('Failed to start export');
+    return (await response.json()).job;
+};
+
+export const startImportJob = async (file, { mode = 'replace', dryRun = false } = {}) => {
+    const params = new URLSearchParams({ async: '1', mode });
+    if (dryRun) params.set('dry_run', '1');
+    const response = await fetch(`${API_URL}/backup/import/?${params}`, {
+        method: 'POST',
+        headers: { 'Content-Type': file.type || 'application/json' },
+        body: file,
+    });
+    if (!response.ok) {
+        const error = await response.json();
+        throw new Error(error.error || 'Failed to start import');
+    }
+    return (await response.json()).job;
+};
+
+export const getJob = async (id) => {
+    const response = await fetch(`${API_URL}/jobs/${id}/`);
+    if (!response.ok) throw new Error('Failed to fetch job');
+    return response.json();
+};
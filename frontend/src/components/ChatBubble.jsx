@@ -12,6 +12,8 @@ export function ChatBubble({ darkMode }) {
         }
     ]);
     const [isLoading, setIsLoading] = useState(false);
+    // Server-side conversation: only the new message is sent, the backend keeps the history
+    const [sessionId, setSessionId] = useState(null);
     const messagesEndRef = useRef(null);
     const inputRef = useRef(null);
 
@@ -94,11 +96,7 @@ export function ChatBubble({ darkMode }) {
         const userMessage = message.trim();
         setMessage('');
 
-        // Build conversation history for context (excluding system messages and errors)
         const currentMessages = [...messages, { role: 'user', content: userMessage }];
-        const conversationHistory = currentMessages
-            .filter(m => !m.isError && m.role !== 'system')
-            .map(m => ({ role: m.role, content: m.content }));
 
         setMessages(currentMessages);
         setIsLoading(true);
@@ -109,7 +107,7 @@ export function ChatBubble({ darkMode }) {
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({
                     message: userMessage,
-                    conversation_history: conversationHistory,
+                    session_id: sessionId,
                     provider: settings.provider,
                     api_key: settings.apiKey,
                     model: settings.model
@@ -126,6 +124,7 @@ export function ChatBubble({ darkMode }) {
                     isError: true
                 }]);
             } else {
+                setSessionId(data.session_id);
                 setMessages(prev => [...prev, {
                     role: 'assistant',
                     content: data.response,
@@ -21,13 +21,16 @@ django.setup()
 from dotenv import load_dotenv
 load_dotenv()
 
-from google import genai
-
 # Import our services directly for tool execution
 from services import finance_service, tasks_service, journal_service, projects_service
 
-# Initialize Gemini client
-client = genai.Client(api_key=os.getenv('GOOGLE_API_KEY'))
+# Initialize Gemini client (LIFEOS_LOCAL_LLM=1 answers from the scripts of core/local_llm.py, offline)
+if os.getenv('LIFEOS_LOCAL_LLM'):
+    from core.local_llm import LocalGemini
+    client = LocalGemini()
+else:
+    from google import genai
+    client = genai.Client(api_key=os.getenv('GOOGLE_API_KEY'))
 
 # Define tools as Gemini function declarations
 TOOLS = [
@@ -246,6 +249,17 @@ TOOLS = [
 ]
 
 
+# Gemini request config with the function declarations, built once
+GENERATE_CONFIG = {
+    "tools": [{
+        "function_declarations": [
+            {"name": tool["name"], "description": tool["description"], "parameters": tool["parameters"]}
+            for tool in TOOLS
+        ]
+    }]
+}
+
+
 def execute_tool(name: str, args: dict) -> dict:
     """Execute a tool and return the result."""
     today = date.today()
@@ -426,15 +440,6 @@ IMPORTANTE:
 def chat(user_message: str) -> str:
     """Process a user message and return AI response with tool calls."""
     
-    # Create function declarations for Gemini
-    function_declarations = []
-    for tool in TOOLS:
-        function_declarations.append({
-            "name": tool["name"],
-            "description": tool["description"],
-            "parameters": tool["parameters"]
-        })
-    
     # First call to Gemini
     response = client.models.generate_content(
         model="gemini-2.0-flash",
@@ -443,9 +448,7 @@ def chat(user_message: str) -> str:
             {"role": "model", "parts": [{"text": "Entendido. Soy LifeOS AI y estoy listo para ayudarte a gestionar tu vida personal."}]},
             {"role": "user", "parts": [{"text": user_message}]}
         ],
-        config={
-            "tools": [{"function_declarations": function_declarations}]
-        }
+        config=GENERATE_CONFIG
     )
     
     # Check if there are function calls
@@ -481,9 +484,7 @@ def chat(user_message: str) -> str:
                     {"role": "model", "parts": function_calls},
                     {"role": "user", "parts": function_responses}
                 ],
-                config={
-                    "tools": [{"function_declarations": function_declarations}]
-                }
+                config=GENERATE_CONFIG
             )
             
             if final_response.candidates and final_response.candidates[0].content.parts:
@@ -6,7 +6,7 @@ Exposes all LifeOS services as MCP tools for AI agent integration.
 import os
 import sys
 from datetime import date, datetime
-from typing import Optional, List, Dict, Any
+from typing import Optional, Dict, Any
 
 # Add backend to path for Django imports
 backend_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'backend')
@@ -25,7 +25,7 @@ load_dotenv()
 from mcp.server.fastmcp import FastMCP
 
 # Import our services
-from services import finance_service, tasks_service, journal_service, projects_service
+from services import finance_service, tasks_service, journal_service, projects_service, tool_pages
 
 # Initialize MCP server
 mcp = FastMCP("LifeOS")
@@ -52,23 +52,43 @@ def get_financial_summary(year: int = None, month: int = None) -> Dict[str, Any]
 
 
 @mcp.tool()
-def get_all_transactions() -> List[Dict[str, Any]]:
-    """Get all financial transactions."""
+def get_all_transactions(
+    limit: int = None,
+    offset: int = 0,
+    transaction_type: str = None,
+    query: str = None,
+    category_id: int = None,
+    date_from: str = None,
+    date_to: str = None
+) -> Dict[str, Any]:
+    """
+    Get financial transactions, newest first, one page at a time.
+    Optional filters: transaction_type ('INCOME' or 'EXPENSE'), query (in the title),
+    category_id, date_from and date_to (YYYY-MM-DD).
+    Returns total, has_more, next_offset and items.
+    """
     try:
-        transactions = finance_service.get_all_transactions()
-        return [
-            {
+        transactions = finance_service.filter_transactions(
+            transaction_type=transaction_type,
+            query=query,
+            category_id=category_id,
+            date_from=date_from,
+            date_to=date_to
+        )
+        return tool_pages.get_page(
+            transactions,
+            lambda tx: {
                 'id': tx.id,
                 'title': tx.title,
                 'amount': float(tx.amount),
                 'type': tx.type,
                 'date': str(tx.date),
                 'category': tx.category.name if tx.category else None
-            }
-            for tx in transactions
-        ]
+            },
+            limit, offset
+        )
     except Exception as e:
-        return [{"error": str(e)}]
+        return {"error": str(e)}
 
 
 @mcp.tool()
@@ -91,38 +111,43 @@ def add_transaction(title: str, amount: float, transaction_type: str, category_i
 
 
 @mcp.tool()
-def get_budget_status() -> List[Dict[str, Any]]:
+def get_budget_status(limit: int = None, offset: int = 0, query: str = None) -> Dict[str, Any]:
     """
     Get current month's budget status with spent amounts and percentages.
-    Returns list of budgets with category name, amount, spent, and percentage.
+    Returns a page of budgets with category name, amount, spent, and percentage.
+    query filters by category name.
     """
     today = date.today()
-    return finance_service.get_budgets_for_month(today.year, today.month)
+    budgets = finance_service.get_budgets_for_month(today.year, today.month)
+    if query:
+        budgets = [b for b in budgets if query.lower() in b['category_name'].lower()]
+    return tool_pages.get_page(budgets, dict, limit, offset)
 
 
 @mcp.tool()
-def check_budget_alerts() -> List[Dict[str, Any]]:
+def check_budget_alerts(limit: int = None, offset: int = 0) -> Dict[str, Any]:
     """
     Check for budget alerts. Returns warnings for budgets over 70% and critical alerts for over 90%.
     """
-    return finance_service.check_budget_alerts()
+    return tool_pages.get_page(finance_service.check_budget_alerts(), dict, limit, offset)
 
 
 @mcp.tool()
-def get_savings_goals() -> List[Dict[str, Any]]:
-    """Get all savings goals with progress."""
-    goals = finance_service.get_all_savings_goals()
-    return [
-        {
+def get_savings_goals(limit: int = None, offset: int = 0, query: str = None, completed: bool = None) -> Dict[str, Any]:
+    """Get savings goals with progress, optionally filtered by name (query) and completion."""
+    goals = finance_service.filter_savings_goals(query=query, completed=completed)
+    return tool_pages.get_page(
+        goals,
+        lambda g: {
             'id': g.id,
             'name': g.name,
             'target': float(g.target_amount),
             'current': float(g.current_amount),
             'percentage': g.get_percentage(),
             'completed': g.is_completed
-        }
-        for g in goals
-    ]
+        },
+        limit, offset
+    )
 
 
 @mcp.tool()
@@ -152,42 +177,48 @@ def get_savings_progress() -> Dict[str, Any]:
 # ==================== TASKS TOOLS ====================
 
 @mcp.tool()
-def get_all_tasks() -> List[Dict[str, Any]]:
-    """Get all tasks."""
+def get_all_tasks(limit: int = None, offset: int = 0, status: str = None, query: str = None, project_id: int = None) -> Dict[str, Any]:
+    """
+    Get tasks one page at a time. Optional filters: status ('INBOX', 'TODO' or 'DONE'),
+    query (in the title or description) and project_id.
+    Returns total, has_more, next_offset and items.
+    """
     try:
-        tasks = tasks_service.get_all_tasks()
-        return [
-            {
+        tasks = tasks_service.filter_tasks(status=status, query=query, project_id=project_id)
+        return tool_pages.get_page(
+            tasks,
+            lambda t: {
                 'id': t.id,
                 'title': t.title,
                 'status': t.status,
                 'due_date': str(t.due_date) if t.due_date else None,
                 'project_id': t.project_id
-            }
-            for t in tasks
-        ]
+            },
+            limit, offset
+        )
     except Exception as e:
-        return [{"error": str(e)}]
+        return {"error": str(e)}
 
 
 @mcp.tool()
-def get_tasks_by_status(status: str) -> List[Dict[str, Any]]:
+def get_tasks_by_status(status: str, limit: int = None, offset: int = 0, query: str = None) -> Dict[str, Any]:
     """
-    Get tasks by status. 
+    Get tasks by status, one page at a time.
     status must be 'INBOX', 'TODO', or 'DONE'.
     """
     try:
-        tasks = tasks_service.get_tasks_by_status(status)
-        return [
-            {
+        tasks = tasks_service.filter_tasks(status=status, query=query)
+        return tool_pages.get_page(
+            tasks,
+            lambda t: {
                 'id': t.id,
                 'title': t.title,
                 'due_date': str(t.due_date) if t.due_date else None
-            }
-            for t in tasks
-        ]
+            },
+            limit, offset
+        )
     except Exception as e:
-        return [{"error": str(e)}]
+        return {"error": str(e)}
 
 
 @mcp.tool()
@@ -280,18 +311,20 @@ def update_task(task_id: int, title: str = None, description: str = None, due_da
 
 
 @mcp.tool()
-def get_overdue_tasks() -> List[Dict[str, Any]]:
-    """Get all overdue tasks (past due date and not done)."""
-    tasks = tasks_service.get_overdue_tasks()
-    return [
-        {
+def get_overdue_tasks(limit: int = None, offset: int = 0, query: str = None) -> Dict[str, Any]:
+    """Get overdue tasks (past due date and not done), one page at a time."""
+    today = date.today()
+    tasks = tasks_service.filter_tasks(query=query, overdue=True)
+    return tool_pages.get_page(
+        tasks,
+        lambda t: {
             'id': t.id,
             'title': t.title,
             'due_date': str(t.due_date),
-            'days_overdue': (date.today() - t.due_date).days
-        }
-        for t in tasks
-    ]
+            'days_overdue': (today - t.due_date).days
+        },
+        limit, offset
+    )
 
 
 @mcp.tool()
@@ -303,22 +336,39 @@ def get_productivity_stats() -> Dict[str, Any]:
 # ==================== JOURNAL TOOLS ====================
 
 @mcp.tool()
-def get_recent_journal_entries(limit: int = 10) -> List[Dict[str, Any]]:
-    """Get recent journal entries."""
+def get_recent_journal_entries(
+    limit: int = 10,
+    offset: int = 0,
+    query: str = None,
+    category_id: int = None,
+    project_id: int = None,
+    date_from: str = None
+) -> Dict[str, Any]:
+    """
+    Get journal entries, newest first, one page at a time.
+    Optional filters: query (in the title or content), category_id, project_id
+    and date_from (YYYY-MM-DD).
+    """
     try:
-        entries = journal_service.get_all_entries()[:limit]
-        return [
-            {
+        entries = journal_service.filter_entries(
+            query=query,
+            category_id=category_id,
+            project_id=project_id,
+            date_from=date_from
+        )
+        return tool_pages.get_page(
+            entries,
+            lambda e: {
                 'id': e.id,
                 'title': e.title,
                 'date': str(e.date),
                 'mood': e.mood,
                 'energy': e.energy
-            }
-            for e in entries
-        ]
+            },
+            limit, offset
+        )
     except Exception as e:
-        return [{"error": str(e)}]
+        return {"error": str(e)}
 
 
 @mcp.tool()
@@ -388,19 +438,20 @@ def detect_mood_patterns() -> Dict[str, Any]:
 # ==================== PROJECTS TOOLS ====================
 
 @mcp.tool()
-def get_all_projects() -> List[Dict[str, Any]]:
-    """Get all projects with their stats."""
-    projects = projects_service.get_all_projects()
-    return [
-        {
+def get_all_projects(limit: int = None, offset: int = 0, query: str = None, active: bool = None) -> Dict[str, Any]:
+    """Get projects with their stats, one page at a time, optionally filtered by name (query) and active state."""
+    projects = projects_service.filter_projects(query=query, active=active)
+    return tool_pages.get_page(
+        projects,
+        lambda p: {
             'id': p.id,
             'name': p.name,
             'color': p.color,
             'is_active': p.is_active,
             'stats': p.get_stats()
-        }
-        for p in projects
-    ]
+        },
+        limit, offset
+    )
 
 
 @mcp.tool()
@@ -513,12 +564,13 @@ def create_project_objective(project_id: int, title: str, description: str = "",
 
 
 @mcp.tool()
-def get_project_objectives(project_id: int) -> List[Dict[str, Any]]:
-    """Get objectives for a project."""
+def get_project_objectives(project_id: int, limit: int = None, offset: int = 0, status: str = None) -> Dict[str, Any]:
+    """Get objectives for a project, one page at a time. status may be 'PENDING' or 'COMPLETED'."""
     try:
-        return projects_service.get_project_objectives(project_id)
+        objectives = projects_service.filter_objectives(project_id, status=status)
+        return tool_pages.get_page(objectives, projects_service.objective_to_dict, limit, offset)
     except Exception as e:
-        return [{"error": str(e)}]
+        return {"error": str(e)}
 
 
 